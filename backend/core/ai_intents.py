@@ -0,0 +1,200 @@
+import re
+import threading
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+@dataclass
+class IntentMatch:
+    intent: str
+    confidence: float
+    source: str  # 'keywords' or 'embedding'
+
+
+class IntentRouter:
+    """Fast local classifier for the chat intents FinanceAI can answer without the LLM.
+
+    Compiled keyword patterns score each intent; strong patterns count fully and
+    weak ones half. A message that matches several intents, or reads as an
+    open-ended question, loses confidence so it escalates to the LLM. When
+    enabled, sentence-embedding similarity against intent exemplars is used as a
+    second opinion for messages the keywords are unsure about.
+    """
+
+    # intent -> (strong patterns, weak patterns); intent names match
+    # FinanceAI._generate_personalized_response
+    INTENT_PATTERNS = {
+        'savings': (
+            [r'\bsav(e|es|ing|ings)\b'],
+            [r'\b(put|set) (money )?aside\b', r'\bpay yourself first\b'],
+        ),
+        'investing': (
+            [r'\binvest(s|ing|ment|ments)?\b'],
+            [r'\b(mutual funds?|index funds?|stocks?|sip|portfolio|elss|reits?)\b'],
+        ),
+        'budget': (
+            [r'\b(spend|spending|spent|expenses?|budget(s|ing)?)\b'],
+            [r'\b(where does my money go|track(ing)? my money)\b'],
+        ),
+        'overspending': (
+            [r'\boverspend(ing|s)?\b', r'\b(spend(ing)?|spent) too much\b', r'\bout of control\b'],
+            [r'\btoo much\b', r'\bcontrol\b'],
+        ),
+        'emergency_fund': (
+            [r'\bemergency( fund)?\b'],
+            [r'\b(safety net|rainy day)\b'],
+        ),
+    }
+
+    # Phrases that mark a question as open-ended, better left to the LLM
+    OPEN_ENDED_PATTERNS = [
+        r'\bwhy\b', r'\bexplain\b', r'\bcompare\b', r'\bdifference between\b',
+        r'\bwhat if\b', r'\bpros and cons\b', r'\bvs\.?\b', r'\bversus\b',
+    ]
+
+    INTENT_EXEMPLARS = {
+        'savings': 'how can I save more money each month',
+        'investing': 'where should I invest my money',
+        'budget': 'how is my spending and budget this month',
+        'overspending': 'I think I am overspending and need to control my expenses',
+        'emergency_fund': 'how big should my emergency fund be',
+    }
+
+    # Beyond this many words a message is unlikely to be a canned question
+    MAX_LOCAL_WORDS = 25
+
+    def __init__(self, threshold=0.8, use_embeddings=False, similarity_threshold=0.6):
+        self.threshold = threshold
+        self.use_embeddings = use_embeddings
+        self.similarity_threshold = similarity_threshold
+        self._patterns = {
+            intent: (
+                [re.compile(pattern, re.IGNORECASE) for pattern in strong],
+                [re.compile(pattern, re.IGNORECASE) for pattern in weak],
+            )
+            for intent, (strong, weak) in self.INTENT_PATTERNS.items()
+        }
+        self._open_ended = re.compile('|'.join(self.OPEN_ENDED_PATTERNS), re.IGNORECASE)
+        self._model = None
+        self._exemplar_embeddings = None
+        self._model_lock = threading.Lock()
+
+    def score(self, message):
+        """Return keyword scores per intent (0..1)"""
+        scores = {}
+        for intent, (strong, weak) in self._patterns.items():
+            score = sum(1.0 for pattern in strong if pattern.search(message))
+            score += sum(0.5 for pattern in weak if pattern.search(message))
+            if score:
+                scores[intent] = min(score, 1.0)
+
+        # "spending too much" is an overspending question, not a budget review
+        if 'overspending' in scores and scores['overspending'] >= 1.0 and 'budget' in scores:
+            del scores['budget']
+        return scores
+
+    def classify(self, message):
+        """Return an IntentMatch when the message can be answered locally, else None"""
+        keyword_match = self._classify_keywords(message)
+        if keyword_match and keyword_match.confidence >= self.threshold:
+            return keyword_match
+
+        if self.use_embeddings:
+            embedding_match = self._classify_embedding(message)
+            if embedding_match and embedding_match.confidence >= self.similarity_threshold:
+                # Don't let the embedding override a different keyword reading
+                if keyword_match is None or keyword_match.intent == embedding_match.intent:
+                    return embedding_match
+        return None
+
+    def _classify_keywords(self, message):
+        scores = self.score(message)
+        if not scores:
+            return None
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        intent, confidence = ranked[0]
+        if len(ranked) > 1:
+            confidence -= ranked[1][1] * 0.5
+        if self._open_ended.search(message):
+            confidence -= 0.3
+        if len(message.split()) > self.MAX_LOCAL_WORDS:
+            confidence -= 0.3
+        return IntentMatch(intent, max(confidence, 0.0), 'keywords')
+
+    def _classify_embedding(self, message):
+        try:
+            model, exemplars = self._load_model()
+        except Exception as e:
+            print(f"Intent embeddings unavailable: {e}")
+            self.use_embeddings = False
+            return None
+
+        import numpy as np
+        embedding = model.encode(message)
+        embedding = embedding / (np.linalg.norm(embedding) or 1.0)
+        similarities = exemplars['matrix'] @ embedding
+        best = int(np.argmax(similarities))
+        return IntentMatch(exemplars['intents'][best], float(similarities[best]), 'embedding')
+
+    def _load_model(self):
+        with self._model_lock:
+            if self._model is None:
+                import numpy as np
+                from sentence_transformers import SentenceTransformer
+                model = SentenceTransformer('all-MiniLM-L6-v2')
+                intents = list(self.INTENT_EXEMPLARS)
+                matrix = model.encode([self.INTENT_EXEMPLARS[intent] for intent in intents])
+                matrix = matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+                self._exemplar_embeddings = {'intents': intents, 'matrix': matrix}
+                self._model = model
+            return self._model, self._exemplar_embeddings
+
+
+ROUTING_STATS_KEYS = {
+    'local': 'chat_routing:local',
+    'llm': 'chat_routing:llm',
+}
+
+
+def record_routing(served_locally):
+    """Count a chat as answered locally or escalated to the LLM"""
+    key = ROUTING_STATS_KEYS['local' if served_locally else 'llm']
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Evicted between add and incr
+        cache.set(key, 1, timeout=None)
+
+
+def get_routing_stats():
+    """Return counts and the fraction of chats served locally"""
+    local = cache.get(ROUTING_STATS_KEYS['local'], 0)
+    llm = cache.get(ROUTING_STATS_KEYS['llm'], 0)
+    total = local + llm
+    return {
+        'local': local,
+        'llm': llm,
+        'total': total,
+        'local_fraction': round(local / total, 4) if total else 0.0,
+    }
+
+
+_intent_router = None
+_intent_router_lock = threading.Lock()
+
+
+def get_intent_router():
+    """Return the process-wide intent router"""
+    global _intent_router
+    with _intent_router_lock:
+        if _intent_router is None:
+            _intent_router = IntentRouter(
+                threshold=getattr(settings, 'CHAT_LOCAL_INTENT_THRESHOLD', 0.8),
+                use_embeddings=getattr(settings, 'CHAT_INTENT_EMBEDDINGS', False),
+                similarity_threshold=getattr(settings, 'CHAT_INTENT_SIMILARITY_THRESHOLD', 0.6),
+            )
+        return _intent_router
@@ -1,20 +1,44 @@
 import os
+import json
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from asgiref.sync import sync_to_async
 from langchain_openai import OpenAI
 from langchain_core.prompts import PromptTemplate
 from django.conf import settings
+from django.db import close_old_connections, connection
 from .models import User, Expense, ChatMessage
+from .ai_intents import get_intent_router, record_routing
+from .ai_ledger import LLMCallTracker
+from .ai_queries import get_query_planner
+from .snapshots import get_spending_snapshot
+from .memory import asked_before, get_conversation_memory, recent_response_heads
 from datetime import datetime, timedelta
 from decimal import Decimal
 
+VALID_CATEGORIES = [choice[0] for choice in Expense.CATEGORY_CHOICES]
+
 class FinanceAI:
     def __init__(self):
-        self.llm = OpenAI(
-            temperature=0.7,
-            api_key=settings.OPENAI_API_KEY
-        )
+        try:
+            base_url = getattr(settings, 'OPENAI_BASE_URL', None)
+            self.llm = OpenAI(
+                temperature=0.7,
+                # The local stand-in server accepts any key
+                api_key=settings.OPENAI_API_KEY or ('local' if base_url else None),
+                base_url=base_url
+            )
+        except Exception as e:
+            # Keep the local fallbacks usable when no provider can be configured
+            print(f"OpenAI client unavailable: {e}")
+            self.llm = None
+    
+    def _track(self, method, user=None):
+        """Ledger/quota instrumentation around one LLM call"""
+        return LLMCallTracker(method, user, self.llm)
     
-    def categorize_expense(self, description):
-        """Categorize expense using LangChain"""
+    def categorize_expense(self, description, user=None):
+        """Categorize expense using LangChain, charged to ``user``'s daily call budget"""
         prompt = PromptTemplate(
             input_variables=["description"],
             template="""
@@ -37,54 +61,90 @@ class FinanceAI:
         )
         
         try:
-            chain = prompt | self.llm
-            result = chain.invoke({"description": description}).strip().lower()
+            with self._track('categorize_expense', user) as call:
+                result = call.invoke(prompt, {"description": description}).strip().lower()
         except:
-            # Fallback categorization
-            description_lower = description.lower()
-            if any(word in description_lower for word in ['restaurant', 'food', 'meal', 'lunch', 'dinner', 'breakfast']):
-                return 'food'
-            elif any(word in description_lower for word in ['uber', 'taxi', 'gas', 'fuel', 'transport']):
-                return 'transportation'
-            elif any(word in description_lower for word in ['store', 'shopping', 'amazon', 'buy']):
-                return 'shopping'
-            elif any(word in description_lower for word in ['movie', 'entertainment', 'game', 'concert']):
-                return 'entertainment'
-            elif any(word in description_lower for word in ['bill', 'utility', 'electric', 'water', 'internet']):
-                return 'bills'
-            elif any(word in description_lower for word in ['doctor', 'hospital', 'pharmacy', 'medical']):
-                return 'healthcare'
-            elif any(word in description_lower for word in ['school', 'education', 'course', 'book']):
-                return 'education'
-            elif any(word in description_lower for word in ['hotel', 'flight', 'travel', 'vacation']):
-                return 'travel'
-            elif any(word in description_lower for word in ['grocery', 'supermarket', 'walmart', 'target']):
-                return 'groceries'
-            else:
-                return 'other'
+            return self._fallback_category(description)
         
         # Validate category
-        valid_categories = ['food', 'transportation', 'shopping', 'entertainment', 
-                          'bills', 'healthcare', 'education', 'travel', 'groceries', 'other']
-        
-        return result if result in valid_categories else 'other'
+        return result if result in VALID_CATEGORIES else 'other'
     
-    def generate_savings_suggestions(self, user):
-        """Generate personalized savings suggestions using LangChain"""
-        # Get user's recent expenses
-        recent_expenses = Expense.objects.filter(
-            user=user,
-            date__gte=datetime.now().date() - timedelta(days=30)
+    def categorize_expenses(self, descriptions, user=None):
+        """Categorize several expense descriptions with a single LangChain call, charged to ``user``"""
+        if not descriptions:
+            return []
+        
+        prompt = PromptTemplate(
+            input_variables=["descriptions"],
+            template="""
+            Categorize each of the following expense descriptions into one of these categories:
+            - food (Food & Dining)
+            - transportation (Transportation)
+            - shopping (Shopping)
+            - entertainment (Entertainment)
+            - bills (Bills & Utilities)
+            - healthcare (Healthcare)
+            - education (Education)
+            - travel (Travel)
+            - groceries (Groceries)
+            - other (Other)
+            
+            Expense descriptions:
+            {descriptions}
+            
+            Return only a JSON array of category names, one per description, in the same order (e.g., ["food", "transportation"]):
+            """
         )
         
-        total_expenses = sum(expense.amount for expense in recent_expenses)
-        expense_categories = {}
+        numbered = "\n".join(f"{i}. {description}" for i, description in enumerate(descriptions, 1))
         
-        for expense in recent_expenses:
-            if expense.category in expense_categories:
-                expense_categories[expense.category] += expense.amount
-            else:
-                expense_categories[expense.category] = expense.amount
+        try:
+            with self._track('categorize_expenses', user) as call:
+                result = json.loads(call.invoke(prompt, {"descriptions": numbered}).strip())
+                if not isinstance(result, list) or len(result) != len(descriptions):
+                    raise ValueError(f"expected {len(descriptions)} categories, got {result!r}")
+        except Exception as e:
+            print(f"OpenAI batch categorization failed: {e}")
+            return [self._fallback_category(description) for description in descriptions]
+        
+        # Validate each category independently so one bad entry doesn't discard the batch
+        categories = []
+        for category in result:
+            category = str(category).strip().lower()
+            categories.append(category if category in VALID_CATEGORIES else 'other')
+        return categories
+    
+    @staticmethod
+    def _fallback_category(description):
+        """Keyword-based categorization used when the LLM is unavailable"""
+        description_lower = description.lower()
+        if any(word in description_lower for word in ['restaurant', 'food', 'meal', 'lunch', 'dinner', 'breakfast']):
+            return 'food'
+        elif any(word in description_lower for word in ['uber', 'taxi', 'gas', 'fuel', 'transport']):
+            return 'transportation'
+        elif any(word in description_lower for word in ['store', 'shopping', 'amazon', 'buy']):
+            return 'shopping'
+        elif any(word in description_lower for word in ['movie', 'entertainment', 'game', 'concert']):
+            return 'entertainment'
+        elif any(word in description_lower for word in ['bill', 'utility', 'electric', 'water', 'internet']):
+            return 'bills'
+        elif any(word in description_lower for word in ['doctor', 'hospital', 'pharmacy', 'medical']):
+            return 'healthcare'
+        elif any(word in description_lower for word in ['school', 'education', 'course', 'book']):
+            return 'education'
+        elif any(word in description_lower for word in ['hotel', 'flight', 'travel', 'vacation']):
+            return 'travel'
+        elif any(word in description_lower for word in ['grocery', 'supermarket', 'walmart', 'target']):
+            return 'groceries'
+        else:
+            return 'other'
+    
+    def _build_savings_prompt(self, user, snapshot=None):
+        """Build the savings prompt and its inputs from the user's recent spending"""
+        # Get user's recent expenses
+        snapshot = snapshot or get_spending_snapshot(user)
+        total_expenses = snapshot.recent_total
+        expense_categories = dict(snapshot.recent_by_category)
         
         # Create context for AI
         expense_summary = ", ".join([f"{cat}: ₹{amount}" for cat, amount in expense_categories.items()])
@@ -111,17 +171,37 @@ class FinanceAI:
         
         income_text = f"${user.monthly_income}" if user.monthly_income else "Not specified (Student)"
         
+        inputs = {
+            "role": user.role,
+            "monthly_income": income_text,
+            "total_expenses": total_expenses,
+            "expense_summary": expense_summary or "No recent expenses"
+        }
+        return prompt, inputs, expense_categories, total_expenses
+    
+    def generate_savings_suggestions(self, user, snapshot=None):
+        """Generate personalized savings suggestions using LangChain"""
+        prompt, inputs, expense_categories, total_expenses = self._build_savings_prompt(user, snapshot)
+        
         try:
-            chain = prompt | self.llm
-            result = chain.invoke({
-                "role": user.role,
-                "monthly_income": income_text,
-                "total_expenses": total_expenses,
-                "expense_summary": expense_summary or "No recent expenses"
-            })
-            
-            import json
-            suggestions = json.loads(result)
+            with self._track('generate_savings_suggestions', user) as call:
+                result = call.invoke(prompt, inputs)
+                
+                suggestions = json.loads(result)
+            return suggestions[:3]  # Ensure max 3 suggestions
+        except Exception as e:
+            print(f"OpenAI savings suggestions failed: {e}")
+            return self._generate_salary_based_suggestions(user, expense_categories, total_expenses)
+    
+    async def agenerate_savings_suggestions(self, user, snapshot=None):
+        """Async variant of generate_savings_suggestions for ASGI views"""
+        prompt, inputs, expense_categories, total_expenses = await sync_to_async(self._build_savings_prompt)(user, snapshot)
+        
+        try:
+            async with self._track('generate_savings_suggestions', user) as call:
+                result = await call.ainvoke(prompt, inputs)
+                
+                suggestions = json.loads(result)
             return suggestions[:3]  # Ensure max 3 suggestions
         except Exception as e:
             print(f"OpenAI savings suggestions failed: {e}")
@@ -267,8 +347,8 @@ class FinanceAI:
                 }
             ]
     
-    def generate_investment_ideas(self, user):
-        """Generate personalized investment ideas using LangChain"""
+    def _build_investment_prompt(self, user):
+        """Build the investment ideas prompt and its inputs"""
         prompt = PromptTemplate(
             input_variables=["role", "monthly_income"],
             template="""
@@ -290,19 +370,50 @@ class FinanceAI:
         
         income_text = f"₹{user.monthly_income}" if user.monthly_income else "Not specified (Student)"
         
+        return prompt, {
+            "role": user.role,
+            "monthly_income": income_text
+        }
+    
+    def generate_investment_ideas(self, user):
+        """Generate personalized investment ideas using LangChain"""
+        prompt, inputs = self._build_investment_prompt(user)
+        
         try:
-            chain = prompt | self.llm
-            result = chain.invoke({
-                "role": user.role,
-                "monthly_income": income_text
-            })
-            
-            import json
-            ideas = json.loads(result)
-            return ideas[:3]  # Ensure max 3 ideas
+            with self._track('generate_investment_ideas', user) as call:
+                result = call.invoke(prompt, inputs)
+                
+                ideas = json.loads(result)
+            return self._with_projections(user, ideas[:3])  # Ensure max 3 ideas
         except Exception as e:
             print(f"OpenAI investment ideas failed: {e}")
-            return self._generate_salary_based_investments(user)
+            return self._with_projections(user, self._generate_salary_based_investments(user))
+    
+    async def agenerate_investment_ideas(self, user):
+        """Async variant of generate_investment_ideas for ASGI views"""
+        prompt, inputs = self._build_investment_prompt(user)
+        
+        try:
+            async with self._track('generate_investment_ideas', user) as call:
+                result = await call.ainvoke(prompt, inputs)
+                
+                ideas = json.loads(result)
+            return self._with_projections(user, ideas[:3])  # Ensure max 3 ideas
+        except Exception as e:
+            print(f"OpenAI investment ideas failed: {e}")
+            return self._with_projections(user, self._generate_salary_based_investments(user))
+    
+    def _with_projections(self, user, ideas):
+        """Attach Monte Carlo p10/p50/p90 balance projections to each investment idea"""
+        monthly_income = float(user.monthly_income) if user.monthly_income else 0
+        # Used when an idea's min_investment has no amount ("Employer dependent")
+        default_monthly_amount = monthly_income * 0.10 if monthly_income else 500
+        try:
+            from .projections import project_ideas
+            project_ideas([idea for idea in ideas if isinstance(idea, dict)], default_monthly_amount)
+        except Exception as e:
+            print(f"Investment projections unavailable: {e}")
+        return ideas
     
     def _generate_salary_based_investments(self, user):
         """Generate salary-specific investment recommendations"""
@@ -456,19 +567,69 @@ class FinanceAI:
                 }
             ]
     
-    def chat_response(self, user, message):
-        """Generate chatbot response using LangChain"""
-        # Get user context
-        recent_expenses = Expense.objects.filter(
-            user=user,
-            date__gte=datetime.now().date() - timedelta(days=30)
-        )
+    def _recent_spending(self, user, snapshot=None):
+        """Total and count of the user's expenses over the last 30 days"""
+        snapshot = snapshot or get_spending_snapshot(user)
+        return snapshot.recent_total, snapshot.recent_count
+    
+    def _answer_locally(self, user, message, snapshot=None):
+        """Answer spending questions and high-confidence intents from user data.
+        
+        Returns None when the message should escalate to the LLM.
+        """
+        response = None
+        query = get_query_planner().parse(message)
+        if query is not None:
+            try:
+                response = self._answer_spending_query(user, message, query)
+            except Exception as e:
+                print(f"Spending query failed: {e}")
+        
+        match = None if response else get_intent_router().classify(message)
+        if match is not None:
+            try:
+                total_expenses, expense_count = self._recent_spending(user, snapshot)
+                response = self._generate_personalized_response(
+                    user, message, total_expenses, expense_count, intent=match.intent
+                )
+            except Exception as e:
+                print(f"Local intent response failed: {e}")
         
-        total_expenses = sum(expense.amount for expense in recent_expenses)
-        expense_count = recent_expenses.count()
+        record_routing(served_locally=bool(response))
+        return response or None
+    
+    def _answer_spending_query(self, user, message, query):
+        """Answer "how much did I spend..." questions with exact numbers from one aggregate query"""
+        planner = get_query_planner()
+        answer = planner.render(query, planner.execute(user, query))
+        
+        if not getattr(settings, 'CHAT_QUERY_LLM_PHRASING', False) or self.llm is None:
+            return answer
+        
+        # Optional: let the LLM reword the templated answer, keeping its figures
+        prompt = PromptTemplate(
+            input_variables=["message", "answer"],
+            template="""
+            You are a helpful personal finance assistant. The user asked: {message}
+            
+            The exact answer from their records is: {answer}
+            
+            Rephrase the answer in one or two friendly sentences. Do not change, round or add any numbers or dates:
+            """
+        )
+        try:
+            with self._track('phrase_spending_query', user) as call:
+                return call.invoke(prompt, {"message": message, "answer": answer}).strip() or answer
+        except Exception as e:
+            print(f"OpenAI query phrasing failed: {e}")
+            return answer
+    
+    def _build_chat_prompt(self, user, message, snapshot=None):
+        """Build the chat prompt and its inputs from the user's recent spending"""
+        total_expenses, expense_count = self._recent_spending(user, snapshot)
         
         prompt = PromptTemplate(
-            input_variables=["role", "monthly_income", "message", "total_expenses", "expense_count"],
+            input_variables=["role", "monthly_income", "message", "total_expenses", "expense_count", "history"],
             template="""
             You are a helpful personal finance assistant. Answer the user's question based on their profile and spending data.
             
@@ -478,6 +639,8 @@ class FinanceAI:
             - Recent Monthly Expenses: ₹{total_expenses}
             - Number of Recent Transactions: {expense_count}
             
+            Conversation So Far: {history}
+            
             User Question: {message}
             
             Provide a helpful, personalized response. Be encouraging and practical. Keep it concise but informative:
@@ -487,32 +650,121 @@ class FinanceAI:
         income_text = f"${user.monthly_income}" if user.monthly_income else "Not specified (Student)"
         
         try:
-            chain = prompt | self.llm
-            response = chain.invoke({
-                "role": user.role,
-                "monthly_income": income_text,
-                "message": message,
-                "total_expenses": total_expenses,
-                "expense_count": expense_count
-            })
+            history = get_conversation_memory(user).summary
+        except Exception as e:
+            print(f"Conversation memory unavailable: {e}")
+            history = ''
+        
+        return prompt, {
+            "role": user.role,
+            "monthly_income": income_text,
+            "message": message,
+            "total_expenses": total_expenses,
+            "expense_count": expense_count,
+            "history": history or "This is the first message"
+        }
+    
+    def chat_response(self, user, message, snapshot=None):
+        """Generate chatbot response using LangChain"""
+        local_response = self._answer_locally(user, message, snapshot)
+        if local_response:
+            return local_response
+        
+        prompt, inputs = self._build_chat_prompt(user, message, snapshot)
+        
+        try:
+            with self._track('chat_response', user) as call:
+                response = call.invoke(prompt, inputs)
             return response.strip()
         except Exception as e:
             print(f"OpenAI chat response failed: {e}")
-            try:
-                return self._generate_personalized_response(user, message, total_expenses, expense_count)
-            except Exception as fallback_error:
-                print(f"Fallback response failed: {fallback_error}")
-                # Ultimate fallback - simple but functional response
-                return f"Hi {user.username}! I'm here to help with your finances. As a {user.role}, I can assist you with budgeting, saving tips, and investment advice. What would you like to know about your financial situation?"
+            return self._fallback_chat_response(user, message, inputs['total_expenses'], inputs['expense_count'])
+    
+    async def achat_response(self, user, message, snapshot=None):
+        """Async variant of chat_response for ASGI views"""
+        local_response = await sync_to_async(self._answer_locally)(user, message, snapshot)
+        if local_response:
+            return local_response
+        
+        prompt, inputs = await sync_to_async(self._build_chat_prompt)(user, message, snapshot)
+        
+        try:
+            async with self._track('chat_response', user) as call:
+                response = await call.ainvoke(prompt, inputs)
+            return response.strip()
+        except Exception as e:
+            print(f"OpenAI chat response failed: {e}")
+            return await sync_to_async(self._fallback_chat_response)(
+                user, message, inputs['total_expenses'], inputs['expense_count']
+            )
     
-    def _generate_personalized_response(self, user, message, total_expenses, expense_count):
+    def stream_chat_response(self, user, message, snapshot=None):
+        """Yield the chatbot response in chunks as the LLM produces them.
+        
+        Falls back to the local personalized response (as a single chunk) when
+        the provider can't stream or fails before the first token.
+        """
+        local_response = self._answer_locally(user, message, snapshot)
+        if local_response:
+            yield local_response
+            return
+        
+        prompt, inputs = self._build_chat_prompt(user, message, snapshot)
+        started = False
+        
+        try:
+            with self._track('stream_chat_response', user) as call:
+                for chunk in call.stream(prompt, inputs):
+                    if not started:
+                        # Completion models tend to open with blank lines
+                        chunk = chunk.lstrip()
+                        if not chunk:
+                            continue
+                        started = True
+                    yield chunk
+                if not started:
+                    call.mark_fallback()
+        except Exception as e:
+            print(f"OpenAI chat stream failed: {e}")
+        
+        if not started:
+            yield self._fallback_chat_response(user, message, inputs['total_expenses'], inputs['expense_count'])
+    
+    def _fallback_chat_response(self, user, message, total_expenses, expense_count):
+        """Answer locally when the LLM is unavailable"""
+        try:
+            return self._generate_personalized_response(user, message, total_expenses, expense_count)
+        except Exception as fallback_error:
+            print(f"Fallback response failed: {fallback_error}")
+            # Ultimate fallback - simple but functional response
+            return f"Hi {user.username}! I'm here to help with your finances. As a {user.role}, I can assist you with budgeting, saving tips, and investment advice. What would you like to know about your financial situation?"
+    
+    @staticmethod
+    def _keyword_intent(message_lower):
+        """Pick the personalized-response intent from plain keyword matches"""
+        if any(word in message_lower for word in ['save', 'saving', 'savings']):
+            return 'savings'
+        elif any(word in message_lower for word in ['invest', 'investment', 'investing']):
+            return 'investing'
+        elif any(word in message_lower for word in ['spending', 'spend', 'expenses', 'budget']):
+            return 'budget'
+        elif any(word in message_lower for word in ['overspend', 'too much', 'control', 'help']):
+            return 'overspending'
+        elif any(word in message_lower for word in ['emergency', 'fund', 'safety']):
+            return 'emergency_fund'
+        return None
+    
+    def _generate_personalized_response(self, user, message, total_expenses, expense_count, intent=None):
         """Generate personalized chat responses with context awareness and anti-repetition"""
         message_lower = message.lower()
+        if intent is None:
+            intent = self._keyword_intent(message_lower)
         monthly_income = float(user.monthly_income) if user.monthly_income else 0
+        # Snapshot totals are Decimal; the suggestions below multiply them by float rates
+        total_expenses = float(total_expenses)
         
         # Get user's recent chat history to avoid repetition
-        recent_chats = ChatMessage.objects.filter(user=user).order_by('-created_at')[:5]
-        previous_topics = [chat.message.lower() for chat in recent_chats]
+        memory = get_conversation_memory(user)
         
         # Personalization based on user context
         name_greeting = f"{user.username}, " if len(user.username) < 15 else ""
@@ -532,12 +784,12 @@ class FinanceAI:
             affordability = "higher-end"
         
         # Anti-repetition: Check if user asked similar questions before
-        asked_savings_before = any('save' in topic or 'saving' in topic for topic in previous_topics)
-        asked_investment_before = any('invest' in topic for topic in previous_topics)
-        asked_spending_before = any('spend' in topic or 'budget' in topic for topic in previous_topics)
+        asked_savings_before = asked_before(memory, 'savings')
+        asked_investment_before = asked_before(memory, 'investing')
+        asked_spending_before = asked_before(memory, 'budget')
         
         # Savings-related questions with personalization and anti-repetition
-        if any(word in message_lower for word in ['save', 'saving', 'savings']):
+        if intent == 'savings':
             if asked_savings_before:
                 # Different approach for repeat questions
                 if user.role == 'student':
@@ -553,7 +805,7 @@ class FinanceAI:
                     return f"{name_greeting}with ₹{total_expenses:.2f} in recent expenses and {income_context}, aim for the 50/30/20 rule. That means ₹{savings_target:.0f}/month in savings - very doable with {affordability} adjustments."
         
         # Investment questions with experience-level adaptation
-        elif any(word in message_lower for word in ['invest', 'investment', 'investing']):
+        elif intent == 'investing':
             if asked_investment_before:
                 # Advanced follow-up for repeat questions
                 if monthly_income > 6000:
@@ -569,7 +821,7 @@ class FinanceAI:
                     return f"Perfect timing to discuss investing! {income_context}, you could comfortably invest ₹{investment_amount:.0f}/month. Start with broad market index funds - they're {affordability} and diversified."
         
         # Spending analysis with personalized insights
-        elif any(word in message_lower for word in ['spending', 'spend', 'expenses', 'budget']):
+        elif intent == 'budget':
             if asked_spending_before:
                 # Different angle for repeat spending questions
                 spending_ratio = (total_expenses / monthly_income * 100) if monthly_income > 0 else 0
@@ -588,7 +840,7 @@ class FinanceAI:
                         return f"Looking at your {expense_count} recent transactions totaling ${total_expenses:.2f}, {name_greeting}your average spend is ${avg_expense:.2f}. {income_context}, focus on tracking patterns rather than strict limits."
         
         # Overspending concerns with role-specific advice
-        elif any(word in message_lower for word in ['overspend', 'too much', 'control', 'help']):
+        elif intent == 'overspending':
             if monthly_income > 0:
                 if total_expenses > monthly_income * 0.8:
                     return f"I understand the concern, {name_greeting}. Spending ₹{total_expenses:.2f} against {income_context} is indeed high. Let's tackle this systematically - start by cutting your largest expense category by 20%."
@@ -598,7 +850,7 @@ class FinanceAI:
                 return f"Feeling overwhelmed by spending is normal, {name_greeting}. {income_context}, focus on needs vs wants. Create a simple rule: wait 24 hours before any non-essential purchase over ₹1,600."
         
         # Emergency fund questions
-        elif any(word in message_lower for word in ['emergency', 'fund', 'safety']):
+        elif intent == 'emergency_fund':
             if monthly_income > 0:
                 target_emergency = monthly_income * 3
                 monthly_save = monthly_income * 0.10
@@ -616,7 +868,7 @@ class FinanceAI:
             ]
             
             # Avoid repeating the same default response
-            used_defaults = [chat.response for chat in recent_chats if any(starter[:20] in chat.response for starter in conversation_starters)]
+            used_defaults = [head for head in recent_response_heads(memory) if any(starter[:20] in head for starter in conversation_starters)]
             available_responses = [resp for resp in conversation_starters if not any(resp[:20] in used for used in used_defaults)]
             
             if available_responses:
@@ -624,8 +876,8 @@ class FinanceAI:
             else:
                 return f"Let's dive into your finances, {name_greeting}! {income_context}, whether it's optimizing your budget, planning investments, or building savings - I'm here to provide personalized guidance."
     
-    def generate_report_summary(self, user, start_date, end_date, report_data):
-        """Generate AI summary for financial report using LangChain"""
+    def _build_report_summary_prompt(self, user, start_date, end_date, report_data):
+        """Build the report summary prompt and its inputs"""
         prompt = PromptTemplate(
             input_variables=["role", "start_date", "end_date", "total_expenses", "category_breakdown", "transaction_count"],
             template="""
@@ -648,16 +900,173 @@ class FinanceAI:
         
         category_text = ", ".join([f"{cat}: ${amount}" for cat, amount in report_data['category_breakdown'].items()])
         
+        return prompt, {
+            "role": user.role,
+            "start_date": start_date,
+            "end_date": end_date,
+            "total_expenses": report_data['total_expenses'],
+            "category_breakdown": category_text,
+            "transaction_count": report_data['transaction_count']
+        }
+    
+    def generate_report_summary(self, user, start_date, end_date, report_data):
+        """Generate AI summary for financial report using LangChain"""
+        prompt, inputs = self._build_report_summary_prompt(user, start_date, end_date, report_data)
+        
         try:
-            chain = prompt | self.llm
-            summary = chain.invoke({
-                "role": user.role,
-                "start_date": start_date,
-                "end_date": end_date,
-                "total_expenses": report_data['total_expenses'],
-                "category_breakdown": category_text,
-                "transaction_count": report_data['transaction_count']
-            })
+            with self._track('generate_report_summary', user) as call:
+                summary = call.invoke(prompt, inputs)
             return summary.strip()
         except:
-            return f"Financial Report Summary: During the period from {start_date} to {end_date}, you had {report_data['transaction_count']} transactions totaling ${report_data['total_expenses']}. Focus on tracking your spending patterns and consider areas where you can optimize your expenses."
\ No newline at end of file
+            return self._fallback_report_summary(start_date, end_date, report_data)
+    
+    async def agenerate_report_summary(self, user, start_date, end_date, report_data):
+        """Async variant of generate_report_summary for ASGI views"""
+        prompt, inputs = self._build_report_summary_prompt(user, start_date, end_date, report_data)
+        
+        try:
+            async with self._track('generate_report_summary', user) as call:
+                summary = await call.ainvoke(prompt, inputs)
+            return summary.strip()
+        except Exception:
+            return self._fallback_report_summary(start_date, end_date, report_data)
+    
+    def _fallback_report_summary(self, start_date, end_date, report_data):
+        return f"Financial Report Summary: During the period from {start_date} to {end_date}, you had {report_data['transaction_count']} transactions totaling ${report_data['total_expenses']}. Focus on tracking your spending patterns and consider areas where you can optimize your expenses."
+
+
+class CategorizationBatcher:
+    """Collects categorization requests from concurrent callers into one LLM prompt.
+    
+    Descriptions submitted within ``window`` seconds of each other (or until
+    ``max_batch_size`` is reached) are categorized together and every caller's
+    future is resolved with its own category. Each user's descriptions go in
+    their own prompt so the call is charged to that user's daily budget.
+    """
+    
+    def __init__(self, window=0.05, max_batch_size=20, max_concurrency=4):
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self.max_concurrency = max_concurrency
+        self._ai = None
+        self._lock = threading.Lock()
+        self._pending = []
+        self._timer = None
+        self._executor = None
+    
+    def submit(self, description, user=None):
+        """Queue a description and return a Future resolving to its category"""
+        future = Future()
+        batch = None
+        with self._lock:
+            self._pending.append((description, user, future))
+            if len(self._pending) >= self.max_batch_size:
+                batch = self._take_pending()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.window, self._flush_on_timer)
+                self._timer.daemon = True
+                self._timer.start()
+        
+        if batch:
+            self._run(batch)
+        return future
+    
+    def categorize(self, description, user=None, timeout=None):
+        """Categorize a single description, blocking until its batch completes"""
+        return self.submit(description, user).result(timeout)
+    
+    def categorize_many(self, descriptions, user=None, timeout=None):
+        """Categorize a list of descriptions, sharing batches with other callers.
+        
+        Lists longer than one batch are split into full batches whose prompts run
+        concurrently, up to ``max_concurrency`` at a time.
+        """
+        descriptions = list(descriptions)
+        if len(descriptions) <= self.max_batch_size:
+            futures = [self.submit(description, user) for description in descriptions]
+            self.flush()
+            return [future.result(timeout) for future in futures]
+        
+        batches = [
+            [(description, user, Future()) for description in descriptions[start:start + self.max_batch_size]]
+            for start in range(0, len(descriptions), self.max_batch_size)
+        ]
+        list(self._get_executor().map(self._run_in_worker, batches))
+        return [future.result(timeout) for batch in batches for _, _, future in batch]
+    
+    def flush(self):
+        """Send whatever is pending right away"""
+        with self._lock:
+            batch = self._take_pending()
+        if batch:
+            self._run(batch)
+    
+    def _flush_on_timer(self):
+        # The ledger and quota queries open a connection on this short-lived thread
+        close_old_connections()
+        try:
+            self.flush()
+        finally:
+            connection.close()
+    
+    def _run_in_worker(self, batch):
+        # Executor threads outlive requests, so they drop stale connections like report jobs do
+        close_old_connections()
+        try:
+            self._run(batch)
+        finally:
+            close_old_connections()
+    
+    def _take_pending(self):
+        batch, self._pending = self._pending, []
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        return batch
+    
+    def _get_ai(self):
+        if self._ai is None:
+            self._ai = FinanceAI()
+        return self._ai
+    
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_concurrency, thread_name_prefix='categorize'
+                )
+        return self._executor
+    
+    def _run(self, batch):
+        by_user = {}
+        for description, user, future in batch:
+            by_user.setdefault(getattr(user, 'pk', None), (user, []))[1].append((description, future))
+        
+        for user, entries in by_user.values():
+            descriptions = [description for description, _ in entries]
+            try:
+                categories = self._get_ai().categorize_expenses(descriptions, user)
+            except Exception as e:
+                print(f"Batch categorization unavailable: {e}")
+                categories = [FinanceAI._fallback_category(description) for description in descriptions]
+            
+            for (_, future), category in zip(entries, categories):
+                if not future.done():
+                    future.set_result(category)
+
+
+_categorization_batcher = None
+_categorization_batcher_lock = threading.Lock()
+
+
+def get_categorization_batcher():
+    """Return the process-wide categorization batcher"""
+    global _categorization_batcher
+    with _categorization_batcher_lock:
+        if _categorization_batcher is None:
+            _categorization_batcher = CategorizationBatcher(
+                window=getattr(settings, 'AI_CATEGORIZATION_BATCH_WINDOW', 0.05),
+                max_batch_size=getattr(settings, 'AI_CATEGORIZATION_BATCH_SIZE', 20),
+                max_concurrency=getattr(settings, 'AI_CATEGORIZATION_MAX_CONCURRENCY', 4),
+            )
+        return _categorization_batcher
@@ -0,0 +1,240 @@
+import time
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .models import LLMCall
+
+LATENCY_BUCKETS_MS = [100, 250, 500, 1000, 2000, 5000, 10000, 30000]
+TOKEN_BUCKETS = [50, 100, 250, 500, 1000, 2000, 4000]
+
+
+class LLMQuotaExceeded(Exception):
+    """The user has used up their daily LLM call budget"""
+
+
+class LLMUnavailable(Exception):
+    """No LLM client is configured, so the caller answers locally"""
+
+
+_encoding = None
+
+
+def count_tokens(text):
+    """Count tokens with tiktoken when available, else approximate (~4 chars per token)"""
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding('cl100k_base')
+        except Exception:
+            _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text))
+    return max(1, len(text) // 4) if text else 0
+
+
+def _quota_key(user_id):
+    return f"llm_calls:{user_id}:{timezone.now().date().isoformat()}"
+
+
+def quota_seed_calls(user_id):
+    """The user's calls today that count against the budget, per the ledger"""
+    return LLMCall.objects.filter(
+        user_id=user_id,
+        created_at__gte=timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    ).exclude(outcome='over_quota')
+
+
+def consume_quota(user):
+    """Count one provider call against the user's daily budget, raising when it's spent"""
+    budget = getattr(settings, 'LLM_DAILY_CALL_BUDGET', 0)
+    if user is None or not budget:
+        return
+
+    key = _quota_key(user.pk)
+    if cache.get(key) is None:
+        # Seed from the ledger so the budget survives cache restarts
+        used_today = quota_seed_calls(user.pk).count()
+        cache.add(key, used_today, timeout=60 * 60 * 24 * 2)
+    try:
+        used = cache.incr(key)
+    except ValueError:
+        used = 1
+        cache.set(key, used, timeout=60 * 60 * 24 * 2)
+    if used > budget:
+        raise LLMQuotaExceeded(f"Daily LLM budget of {budget} calls used up")
+
+
+class LLMCallTracker:
+    """Instruments the LLM calls FinanceAI makes for one operation.
+
+    Use as a (sync or async) context manager around the call *and* the parsing
+    of its result: an exception escaping the block means the caller falls back
+    to its local answer, and is recorded as such in the ledger. Without an LLM
+    client nothing is sent, so nothing is recorded or charged to the quota.
+
+        with LLMCallTracker('chat_response', user, self.llm) as call:
+            response = call.invoke(prompt, inputs)
+    """
+
+    def __init__(self, method, user, llm):
+        self.method = method
+        self.user = user if getattr(user, 'pk', None) else None
+        self.llm = llm
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.latency_ms = 0
+        self.used_fallback = False
+
+    def _check_available(self):
+        if self.llm is None:
+            raise LLMUnavailable("No LLM client configured")
+
+    def _prepare(self, prompt, inputs):
+        self.prompt_tokens = count_tokens(prompt.format(**inputs))
+        return prompt | self.llm
+
+    def _elapsed_ms(self, started):
+        return int((time.perf_counter() - started) * 1000)
+
+    def invoke(self, prompt, inputs):
+        self._check_available()
+        consume_quota(self.user)
+        chain = self._prepare(prompt, inputs)
+        started = time.perf_counter()
+        try:
+            result = chain.invoke(inputs)
+        finally:
+            self.latency_ms = self._elapsed_ms(started)
+        self.completion_tokens = count_tokens(result)
+        return result
+
+    async def ainvoke(self, prompt, inputs):
+        self._check_available()
+        await sync_to_async(consume_quota)(self.user)
+        chain = self._prepare(prompt, inputs)
+        started = time.perf_counter()
+        try:
+            result = await chain.ainvoke(inputs)
+        finally:
+            self.latency_ms = self._elapsed_ms(started)
+        self.completion_tokens = count_tokens(result)
+        return result
+
+    def stream(self, prompt, inputs):
+        self._check_available()
+        consume_quota(self.user)
+        chain = self._prepare(prompt, inputs)
+        started = time.perf_counter()
+        chunks = []
+        try:
+            for chunk in chain.stream(inputs):
+                chunks.append(chunk)
+                yield chunk
+        finally:
+            self.latency_ms = self._elapsed_ms(started)
+            self.completion_tokens = count_tokens(''.join(chunks))
+
+    def mark_fallback(self):
+        """Record that the caller answered locally even though no exception escaped"""
+        self.used_fallback = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._record(exc)
+        return False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await sync_to_async(self._record)(exc)
+        return False
+
+    def _record(self, exc):
+        if self.llm is None:
+            return
+        if isinstance(exc, LLMQuotaExceeded):
+            outcome = 'over_quota'
+        elif exc is not None:
+            outcome = 'error'
+        else:
+            outcome = 'success'
+        try:
+            LLMCall.objects.create(
+                user=self.user,
+                method=self.method,
+                prompt_tokens=self.prompt_tokens,
+                completion_tokens=self.completion_tokens,
+                latency_ms=self.latency_ms,
+                outcome=outcome,
+                used_fallback=self.used_fallback or exc is not None,
+                error=str(exc)[:255] if exc is not None else ''
+            )
+        except Exception as e:
+            # The ledger must never break the AI path it observes
+            print(f"LLM ledger write failed: {e}")
+
+
+def _histogram(rows, field, buckets):
+    """Turn cumulative <= counts into per-bucket counts"""
+    histogram = []
+    previous = 0
+    for bound in buckets:
+        cumulative = rows[f'{field}_le_{bound}']
+        histogram.append({'le': bound, 'count': cumulative - previous})
+        previous = cumulative
+    histogram.append({'le': None, 'count': rows['calls'] - previous})
+    return histogram
+
+
+def get_llm_stats(days=7):
+    """Per-method call counts, outcomes, tokens and latency/token histograms"""
+    since = timezone.now() - timedelta(days=days)
+    annotations = {
+        'calls': Count('id'),
+        'successes': Count('id', filter=Q(outcome='success')),
+        'errors': Count('id', filter=Q(outcome='error')),
+        'over_quota': Count('id', filter=Q(outcome='over_quota')),
+        'fallbacks': Count('id', filter=Q(used_fallback=True)),
+        'prompt_token_total': Sum('prompt_tokens'),
+        'completion_token_total': Sum('completion_tokens'),
+    }
+    for bound in LATENCY_BUCKETS_MS:
+        annotations[f'latency_le_{bound}'] = Count('id', filter=Q(latency_ms__lte=bound))
+    for bound in TOKEN_BUCKETS:
+        annotations[f'prompt_le_{bound}'] = Count('id', filter=Q(prompt_tokens__lte=bound))
+        annotations[f'completion_le_{bound}'] = Count('id', filter=Q(completion_tokens__lte=bound))
+
+    rows = LLMCall.objects.filter(created_at__gte=since).values('method').annotate(**annotations).order_by('method')
+
+    methods = {}
+    for row in rows:
+        methods[row['method']] = {
+            'calls': row['calls'],
+            'outcomes': {
+                'success': row['successes'],
+                'error': row['errors'],
+                'over_quota': row['over_quota'],
+            },
+            'fallbacks': row['fallbacks'],
+            'prompt_tokens': row['prompt_token_total'] or 0,
+            'completion_tokens': row['completion_token_total'] or 0,
+            'latency_ms_histogram': _histogram(row, 'latency', LATENCY_BUCKETS_MS),
+            'prompt_tokens_histogram': _histogram(row, 'prompt', TOKEN_BUCKETS),
+            'completion_tokens_histogram': _histogram(row, 'completion', TOKEN_BUCKETS),
+        }
+
+    return {
+        'period_days': days,
+        'daily_call_budget': getattr(settings, 'LLM_DAILY_CALL_BUDGET', 0),
+        'total_calls': sum(method['calls'] for method in methods.values()),
+        'methods': methods,
+    }
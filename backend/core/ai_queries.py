@@ -0,0 +1,237 @@
+import calendar
+import re
+import threading
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+
+from django.db.models import Avg, Count, Max, Sum
+
+from .models import Expense
+
+
+@dataclass
+class SpendingQuery:
+    start_date: date
+    end_date: date
+    period_label: str
+    metric: str = 'total'  # total, count, average or largest
+    category: str = None
+    merchant: str = None
+
+
+class SpendingQueryPlanner:
+    """Turns spending questions into a single Expense aggregate query.
+
+    Handles questions such as "how much did I spend on transportation last
+    month?" or "how many times did I pay at Starbucks this year?". Messages
+    that aren't about the user's own spending parse to None and go down the
+    normal chat path.
+    """
+
+    QUESTION_PATTERN = re.compile(
+        r"\b(how much|how many|what did i spend|what have i spent|total|average|avg|"
+        r"biggest|largest|most expensive)\b",
+        re.IGNORECASE,
+    )
+    ADVICE_PATTERN = re.compile(
+        r"\b(should|could|can i|ideal|recommend(ed)?|enough)\b",
+        re.IGNORECASE,
+    )
+    SPEND_PATTERN = re.compile(
+        r"\b(spend|spent|spending|pay|paid|expenses?|purchases?|transactions?|cost)\b",
+        re.IGNORECASE,
+    )
+
+    CATEGORY_SYNONYMS = {
+        'food': ['food', 'dining', 'restaurants?', 'eating out', 'takeaway', 'meals?'],
+        'transportation': ['transportation', 'transport', 'commute', 'commuting', 'uber', 'ola',
+                           'taxis?', 'cabs?', 'fuel', 'petrol', 'gas'],
+        'shopping': ['shopping', 'clothes', 'clothing'],
+        'entertainment': ['entertainment', 'movies?', 'concerts?', 'games?', 'streaming'],
+        'bills': ['bills?', 'utilities', 'utility', 'electricity', 'internet', 'rent'],
+        'healthcare': ['healthcare', 'health', 'medical', 'medicine', 'doctors?', 'pharmacy'],
+        'education': ['education', 'tuition', 'courses?', 'books?'],
+        'travel': ['travel', 'trips?', 'flights?', 'hotels?', 'vacations?'],
+        'groceries': ['groceries', 'grocery', 'supermarket'],
+        'other': ['miscellaneous'],
+    }
+
+    MONTHS = {name.lower(): index for index, name in enumerate(calendar.month_name) if name}
+    MONTHS.update({name.lower(): index for index, name in enumerate(calendar.month_abbr) if name})
+
+    # Words that end a merchant name ("at starbucks last month")
+    MERCHANT_STOP_WORDS = {
+        'in', 'on', 'for', 'during', 'since', 'this', 'last', 'past', 'today', 'yesterday',
+        'so', 'far', 'between', 'from', 'to', 'and', 'or', 'the', 'a', 'my',
+        'average', 'avg', 'total', 'everything', 'all',
+    }
+
+    def __init__(self):
+        self._categories = []
+        for category, synonyms in self.CATEGORY_SYNONYMS.items():
+            pattern = re.compile(r'\b(' + '|'.join(synonyms) + r')\b', re.IGNORECASE)
+            self._categories.append((category, pattern))
+        self._merchant = re.compile(r"\b(?:at|from|on)\s+([a-z0-9][\w&'.-]*(?:\s+[a-z0-9][\w&'.-]*){0,2})",
+                                    re.IGNORECASE)
+
+    def parse(self, message, today=None):
+        """Return a SpendingQuery, or None if this isn't a spending question"""
+        if not self.QUESTION_PATTERN.search(message) or self.ADVICE_PATTERN.search(message):
+            return None
+
+        category = self._parse_category(message)
+        if not self.SPEND_PATTERN.search(message) and category is None:
+            return None
+
+        today = today or datetime.now().date()
+        start_date, end_date, period_label = self._parse_period(message, today)
+        return SpendingQuery(
+            start_date=start_date,
+            end_date=end_date,
+            period_label=period_label,
+            metric=self._parse_metric(message),
+            category=category,
+            merchant=None if category else self._parse_merchant(message),
+        )
+
+    def execute(self, user, query):
+        """Answer the query with one aggregate over the user's expenses"""
+        expenses = Expense.objects.filter(
+            user=user,
+            date__gte=query.start_date,
+            date__lte=query.end_date
+        )
+        if query.category:
+            expenses = expenses.filter(category=query.category)
+        if query.merchant:
+            expenses = expenses.filter(description__icontains=query.merchant)
+
+        result = expenses.aggregate(
+            total=Sum('amount'),
+            count=Count('id'),
+            average=Avg('amount'),
+            largest=Max('amount')
+        )
+        return {
+            'total': float(result['total'] or 0),
+            'count': result['count'],
+            'average': float(result['average'] or 0),
+            'largest': float(result['largest'] or 0),
+        }
+
+    def render(self, query, result):
+        """Render the answer from a template"""
+        subject = ''
+        if query.category:
+            subject = f" on {dict(Expense.CATEGORY_CHOICES)[query.category]}"
+        elif query.merchant:
+            subject = f" at {query.merchant}"
+        period = (f"{query.period_label} ({query.start_date.strftime('%d %b %Y')} – "
+                  f"{query.end_date.strftime('%d %b %Y')})")
+
+        if result['count'] == 0:
+            return f"You have no recorded expenses{subject} {period}."
+        if query.metric == 'count':
+            return f"You made {result['count']} transaction{'s' if result['count'] != 1 else ''}{subject} {period}, totaling ₹{result['total']:,.2f}."
+        if query.metric == 'average':
+            return f"Your average expense{subject} {period} was ₹{result['average']:,.2f} across {result['count']} transactions."
+        if query.metric == 'largest':
+            return f"Your largest expense{subject} {period} was ₹{result['largest']:,.2f}, out of ₹{result['total']:,.2f} in total."
+        return f"You spent ₹{result['total']:,.2f}{subject} {period} across {result['count']} transaction{'s' if result['count'] != 1 else ''}."
+
+    def _parse_metric(self, message):
+        message_lower = message.lower()
+        if 'how many' in message_lower:
+            return 'count'
+        if re.search(r'\b(average|avg)\b', message_lower):
+            return 'average'
+        if re.search(r'\b(biggest|largest|most expensive)\b', message_lower):
+            return 'largest'
+        return 'total'
+
+    def _parse_category(self, message):
+        for category, pattern in self._categories:
+            if pattern.search(message):
+                return category
+        return None
+
+    def _parse_merchant(self, message):
+        for match in self._merchant.finditer(message):
+            words = []
+            for word in match.group(1).split():
+                if word.lower() in self.MERCHANT_STOP_WORDS or word.lower() in self.MONTHS:
+                    break
+                words.append(word.strip("?.!,"))
+            if words:
+                return ' '.join(words)
+        return None
+
+    def _parse_period(self, message, today):
+        """Return (start, end, label) for the date range mentioned, defaulting to the last 30 days"""
+        message_lower = message.lower()
+
+        explicit = re.search(r'(\d{4}-\d{2}-\d{2})\s*(?:to|-|until|and)\s*(\d{4}-\d{2}-\d{2})', message_lower)
+        if explicit:
+            try:
+                start = datetime.strptime(explicit.group(1), '%Y-%m-%d').date()
+                end = datetime.strptime(explicit.group(2), '%Y-%m-%d').date()
+                return start, end, 'in that period'
+            except ValueError:
+                pass
+
+        if 'today' in message_lower:
+            return today, today, 'today'
+        if 'yesterday' in message_lower:
+            yesterday = today - timedelta(days=1)
+            return yesterday, yesterday, 'yesterday'
+
+        rolling = re.search(r'\b(?:last|past)\s+(\d+)\s+(day|week|month)s?\b', message_lower)
+        if rolling:
+            amount, unit = int(rolling.group(1)), rolling.group(2)
+            days = {'day': 1, 'week': 7, 'month': 30}[unit] * amount
+            return today - timedelta(days=days - 1), today, f"in the last {amount} {unit}{'s' if amount != 1 else ''}"
+
+        if 'this week' in message_lower:
+            return today - timedelta(days=today.weekday()), today, 'this week'
+        if 'last week' in message_lower:
+            start = today - timedelta(days=today.weekday() + 7)
+            return start, start + timedelta(days=6), 'last week'
+        if 'this month' in message_lower:
+            return today.replace(day=1), today, 'this month'
+        if 'last month' in message_lower:
+            end = today.replace(day=1) - timedelta(days=1)
+            return end.replace(day=1), end, 'last month'
+        if 'this year' in message_lower:
+            return today.replace(month=1, day=1), today, 'this year'
+        if 'last year' in message_lower:
+            year = today.year - 1
+            return date(year, 1, 1), date(year, 12, 31), 'last year'
+
+        month = re.search(r'\b(?:in|during|for|since)\s+(' + '|'.join(self.MONTHS) + r')\b(?:\s+(\d{4}))?',
+                          message_lower)
+        if month:
+            month_number = self.MONTHS[month.group(1)]
+            year = int(month.group(2)) if month.group(2) else today.year
+            if not month.group(2) and month_number > today.month:
+                # "in November" asked in March means last November
+                year -= 1
+            start = date(year, month_number, 1)
+            if month.group(0).startswith('since'):
+                return start, today, f"since {start.strftime('%B %Y')}"
+            end = date(year, month_number, calendar.monthrange(year, month_number)[1])
+            return start, min(end, today), f"in {start.strftime('%B %Y')}"
+
+        return today - timedelta(days=30), today, 'in the last 30 days'
+
+
+_query_planner = None
+_query_planner_lock = threading.Lock()
+
+
+def get_query_planner():
+    """Return the process-wide spending query planner"""
+    global _query_planner
+    with _query_planner_lock:
+        if _query_planner is None:
+            _query_planner = SpendingQueryPlanner()
+        return _query_planner
@@ -0,0 +1,297 @@
+import math
+from datetime import date
+
+import numpy as np
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+from .models import Expense, ExpenseAnomaly, ExpenseCategoryStats
+
+# Same amount and description within this many days counts as a duplicate charge
+DUPLICATE_WINDOW_DAYS = 1
+RECENT_ANOMALIES = 5
+
+
+def _z_threshold():
+    return getattr(settings, 'ANOMALY_Z_THRESHOLD', 3.0)
+
+
+def _min_samples():
+    return getattr(settings, 'ANOMALY_MIN_SAMPLES', 5)
+
+
+def _add(stats, value):
+    stats.count += 1
+    delta = value - stats.mean
+    stats.mean += delta / stats.count
+    stats.m2 += delta * (value - stats.mean)
+
+
+def _remove(stats, value):
+    """Inverse of _add"""
+    if stats.count <= 1:
+        stats.count, stats.mean, stats.m2 = 0, 0.0, 0.0
+        return
+    delta = value - stats.mean
+    stats.count -= 1
+    stats.mean -= delta / stats.count
+    stats.m2 = max(stats.m2 - delta * (value - stats.mean), 0.0)
+
+
+def _merge(stats, other):
+    """Fold ``other``'s values into ``stats`` (Chan et al.'s parallel update)"""
+    count = stats.count + other.count
+    delta = other.mean - stats.mean
+    stats.mean += delta * other.count / count
+    stats.m2 += other.m2 + delta ** 2 * stats.count * other.count / count
+    stats.count = count
+
+
+def z_score(stats, value):
+    """Standard deviations ``value`` lies above the mean; None with too little history"""
+    if stats is None or stats.count < _min_samples() or stats.m2 <= 0:
+        return None
+    return (value - stats.mean) / math.sqrt(stats.m2 / (stats.count - 1))
+
+
+def apply_changes(removed, added):
+    """Fold an Expense write into the per-category stats and flag the added rows that look unusual.
+
+    Runs inside the transaction of the write (see ``expenses_changed``). Each
+    added amount is scored against the stats as they were before it, so a
+    bulk insert is judged row by row as if the rows had arrived one at a time.
+    """
+    keys = {(row.user_id, row.category) for row in (*removed, *added)}
+    if not keys:
+        return
+    stats = {
+        (item.user_id, item.category): item
+        for item in ExpenseCategoryStats.objects.select_for_update().filter(
+            user_id__in={user_id for user_id, _ in keys},
+            category__in={category for _, category in keys}
+        ).order_by('user_id', 'category')
+    }
+
+    for row in removed:
+        item = stats.get((row.user_id, row.category))
+        if item is not None:
+            _remove(item, float(row.amount))
+
+    flags = []
+    for row in sorted(added, key=lambda row: row.id):
+        key = (row.user_id, row.category)
+        item = stats.get(key)
+        if item is None:
+            item = stats[key] = ExpenseCategoryStats(user_id=row.user_id, category=row.category)
+        score = z_score(item, float(row.amount))
+        if score is not None and score >= _z_threshold():
+            flags.append(ExpenseAnomaly(user_id=row.user_id, expense_id=row.id, kind='amount', score=round(score, 2)))
+        _add(item, float(row.amount))
+
+    existing = [item for item in stats.values() if item.pk is not None]
+    ExpenseCategoryStats.objects.bulk_update([item for item in existing if item.count], ['count', 'mean', 'm2'])
+    ExpenseCategoryStats.objects.filter(pk__in=[item.pk for item in existing if not item.count]).delete()
+    for item in stats.values():
+        if item.pk is None and item.count:
+            try:
+                with transaction.atomic():
+                    item.save()
+            except IntegrityError:
+                # A concurrent writer created the row first
+                current = ExpenseCategoryStats.objects.select_for_update().get(
+                    user_id=item.user_id, category=item.category
+                )
+                _merge(current, item)
+                current.save()
+
+    # Updated rows are judged afresh
+    updated = {row.id for row in removed} & {row.id for row in added}
+    if updated:
+        ExpenseAnomaly.objects.filter(expense_id__in=updated, kind='amount').delete()
+    ExpenseAnomaly.objects.bulk_create(flags)
+    _update_duplicate_flags(removed, added)
+
+
+def _normalize(description):
+    return ' '.join((description or '').lower().split())
+
+
+def _shift(day, days):
+    """``day`` moved by ``days``, clamped to the dates Python can represent"""
+    return date.fromordinal(min(max(day.toordinal() + days, 1), date.max.toordinal()))
+
+
+def _duplicate_pairs(pks, user_ids, texts, cents, days):
+    """(duplicate, original) pk arrays for the duplicate charges among the given rows.
+
+    The one duplicate rule, shared by the write path and the rebuild: an expense
+    duplicates the expense just before it in (date, pk) order with the same user,
+    normalized description and amount, if that one is at most
+    DUPLICATE_WINDOW_DAYS earlier. ``days`` are ordinals.
+    """
+    order = np.lexsort((pks, days, cents, texts, user_ids))
+    previous, current = order[:-1], order[1:]
+    duplicates = (
+        (user_ids[previous] == user_ids[current])
+        & (texts[previous] == texts[current])
+        & (cents[previous] == cents[current])
+        & (days[current] - days[previous] <= DUPLICATE_WINDOW_DAYS)
+    )
+    return pks[current[duplicates]], pks[previous[duplicates]]
+
+
+def _update_duplicate_flags(removed, added):
+    """Re-judge the 'duplicate' flags around the changed rows, rewriting only those that differ.
+
+    A write can make the rows after it (within the window) duplicates, or stop
+    them being ones, so every row from the earliest changed date on is judged
+    again; the rows up to a window before that only serve as predecessors.
+    """
+    changed = [*removed, *added]
+    if not changed:
+        return
+    first = min(row.date for row in changed)
+    last = max(row.date for row in changed)
+    rows = list(Expense.objects.filter(
+        user_id__in={row.user_id for row in changed},
+        amount__in={row.amount for row in changed},
+        date__gte=_shift(first, -DUPLICATE_WINDOW_DAYS),
+        date__lte=_shift(last, DUPLICATE_WINDOW_DAYS)
+    ).order_by().values_list('pk', 'user_id', 'date', 'amount', 'description'))
+
+    judged = {pk for pk, _, day, _, _ in rows if day >= first}
+    expected = {}
+    if rows:
+        pks, user_ids, days, amounts, descriptions = zip(*rows)
+        duplicates, originals = _duplicate_pairs(
+            np.array(pks, dtype=np.int64),
+            np.array(user_ids, dtype=np.int64),
+            _codes(_normalize(description) for description in descriptions),
+            np.array([int(amount * 100) for amount in amounts], dtype=np.int64),
+            np.array([day.toordinal() for day in days], dtype=np.int64)
+        )
+        expected = {
+            pk: original for pk, original in zip(duplicates.tolist(), originals.tolist()) if pk in judged
+        }
+
+    user_of = {pk: user_id for pk, user_id, _, _, _ in rows}
+    current = dict(ExpenseAnomaly.objects.filter(
+        kind='duplicate', expense_id__in=judged
+    ).values_list('expense_id', 'duplicate_of_id'))
+    stale = [pk for pk, original in current.items() if expected.get(pk) != original]
+    if stale:
+        ExpenseAnomaly.objects.filter(kind='duplicate', expense_id__in=stale).delete()
+    ExpenseAnomaly.objects.bulk_create([
+        ExpenseAnomaly(user_id=user_of[pk], expense_id=pk, kind='duplicate', duplicate_of_id=original)
+        for pk, original in expected.items() if current.get(pk) != original
+    ])
+
+
+def _codes(values):
+    """Integer code per distinct value, in first-seen order"""
+    codes = {}
+    return np.array([codes.setdefault(value, len(codes)) for value in values], dtype=np.int64)
+
+
+def rebuild_anomalies(user_id=None, batch_size=1000):
+    """Recompute the category stats and every flag from the raw Expense rows.
+
+    Vectorized: each expense is scored against the earlier-dated expenses of its
+    user and category using running sums over rows sorted by (user, category,
+    date). Returns (stats rows, flags) written.
+    """
+    expenses = Expense.objects.order_by()
+    if user_id is not None:
+        expenses = expenses.filter(user_id=user_id)
+    rows = list(expenses.values_list('pk', 'user_id', 'category', 'date', 'amount', 'description').iterator())
+
+    stats, flags = [], []
+    if rows:
+        pks, user_ids, categories, days, amounts, descriptions = zip(*rows)
+        pks = np.array(pks, dtype=np.int64)
+        user_ids = np.array(user_ids, dtype=np.int64)
+        days = np.array([day.toordinal() for day in days], dtype=np.int64)
+        amounts = np.array([float(amount) for amount in amounts])
+        groups = _codes(zip(user_ids.tolist(), categories))
+
+        # Amount outliers
+        order = np.lexsort((pks, days, groups))
+        grouped = groups[order]
+        starts = np.flatnonzero(np.r_[True, grouped[1:] != grouped[:-1]])
+        start_of = np.repeat(starts, np.diff(np.r_[starts, len(order)]))
+        prior = np.arange(len(order)) - start_of
+        # Shift each group by its first amount so the sums of squares don't cancel badly
+        shifted = amounts[order] - amounts[order][start_of]
+        sums = np.cumsum(shifted) - shifted
+        squares = np.cumsum(shifted ** 2) - shifted ** 2
+        sums -= sums[start_of]
+        squares -= squares[start_of]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = sums / prior
+            variance = (squares - prior * mean ** 2) / (prior - 1)
+            scores = (shifted - mean) / np.sqrt(variance)
+        outliers = (prior >= _min_samples()) & (variance > 0) & (scores >= _z_threshold())
+        for position in np.flatnonzero(outliers):
+            index = order[position]
+            flags.append(ExpenseAnomaly(
+                user_id=int(user_ids[index]), expense_id=int(pks[index]), kind='amount',
+                score=round(float(scores[position]), 2)
+            ))
+
+        ends = np.r_[starts[1:], len(order)]
+        counts = ends - starts
+        totals = np.add.reduceat(shifted, starts)
+        group_means = totals / counts
+        m2 = np.maximum(np.add.reduceat(shifted ** 2, starts) - counts * group_means ** 2, 0)
+        for start, count, group_mean, group_m2 in zip(starts, counts, group_means, m2):
+            index = order[start]
+            stats.append(ExpenseCategoryStats(
+                user_id=int(user_ids[index]), category=categories[index], count=int(count),
+                mean=float(amounts[index] + group_mean), m2=float(group_m2)
+            ))
+
+        # Duplicates: the same rule as the write path
+        user_of = dict(zip(pks.tolist(), user_ids.tolist()))
+        duplicates, originals = _duplicate_pairs(
+            pks, user_ids,
+            _codes(_normalize(description) for description in descriptions),
+            np.round(amounts * 100).astype(np.int64),
+            days
+        )
+        for pk, original in zip(duplicates.tolist(), originals.tolist()):
+            flags.append(ExpenseAnomaly(
+                user_id=user_of[pk], expense_id=pk, kind='duplicate', duplicate_of_id=original
+            ))
+
+    existing_stats = ExpenseCategoryStats.objects.all()
+    existing_flags = ExpenseAnomaly.objects.all()
+    if user_id is not None:
+        existing_stats = existing_stats.filter(user_id=user_id)
+        existing_flags = existing_flags.filter(user_id=user_id)
+    with transaction.atomic():
+        existing_stats.delete()
+        existing_flags.delete()
+        ExpenseCategoryStats.objects.bulk_create(stats, batch_size=batch_size)
+        ExpenseAnomaly.objects.bulk_create(flags, batch_size=batch_size)
+    return len(stats), len(flags)
+
+
+def recent_anomalies(user, limit=RECENT_ANOMALIES):
+    """The user's latest flags with their expenses, for the dashboard"""
+    anomalies = ExpenseAnomaly.objects.filter(user=user).select_related('expense')[:limit]
+    return [
+        {
+            'kind': anomaly.kind,
+            'reason': anomaly.get_kind_display(),
+            'score': anomaly.score,
+            'duplicate_of': anomaly.duplicate_of_id,
+            'expense': {
+                'id': anomaly.expense_id,
+                'description': anomaly.expense.description,
+                'amount': float(anomaly.expense.amount),
+                'category': anomaly.expense.category,
+                'date': anomaly.expense.date.strftime('%Y-%m-%d')
+            }
+        }
+        for anomaly in anomalies
+    ]
@@ -0,0 +1,103 @@
+import gzip
+import json
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ChatArchive, ChatMessage
+
+try:
+    import zstandard
+except ImportError:  # gzip from the standard library is always available
+    zstandard = None
+
+DEFAULT_CODEC = 'zstd' if zstandard is not None else 'gzip'
+
+
+def compress(payload, codec=DEFAULT_CODEC):
+    if codec == 'zstd':
+        if zstandard is None:
+            raise ValueError("zstandard is not installed")
+        return zstandard.ZstdCompressor(level=10).compress(payload)
+    return gzip.compress(payload, compresslevel=9)
+
+
+def decompress(data, codec):
+    data = bytes(data)
+    if codec == 'zstd':
+        if zstandard is None:
+            raise ValueError("zstandard is not installed; cannot read zstd archives")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+def _serialize(chat):
+    return json.dumps({
+        'id': chat.id,
+        'message': chat.message,
+        'response': chat.response,
+        'created_at': chat.created_at.isoformat(),
+    }, ensure_ascii=False)
+
+
+def iter_archive_messages(archive):
+    """Yield the archived messages of one blob as dicts, newest first"""
+    lines = decompress(archive.data, archive.codec).decode('utf-8').splitlines()
+    for line in reversed(lines):
+        if line:
+            yield json.loads(line)
+
+
+def _write_archive(user_id, chats, codec):
+    payload = '\n'.join(_serialize(chat) for chat in chats).encode('utf-8')
+    with transaction.atomic():
+        ChatArchive.objects.create(
+            user_id=user_id,
+            period_start=chats[0].created_at,
+            period_end=chats[-1].created_at,
+            message_count=len(chats),
+            codec=codec,
+            data=compress(payload, codec)
+        )
+        ChatMessage.objects.filter(pk__in=[chat.pk for chat in chats]).delete()
+
+
+def compact_user_history(user_id, cutoff, codec=DEFAULT_CODEC, batch_size=2000):
+    """Move the user's chats older than cutoff into per-month archive blobs.
+
+    Works oldest month first, at most batch_size rows per blob, and writes each
+    blob (and deletes its rows) in its own transaction, so memory stays bounded
+    and an interrupted run can simply be restarted. Returns the number of
+    archived messages.
+    """
+    archived = 0
+    old_chats = ChatMessage.objects.filter(user_id=user_id, created_at__lt=cutoff)
+
+    while True:
+        oldest = old_chats.order_by('created_at').values_list('created_at', flat=True).first()
+        if oldest is None:
+            return archived
+
+        month_start = oldest.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        next_month = (month_start + timedelta(days=32)).replace(day=1)
+        chats = list(old_chats.filter(
+            created_at__gte=month_start,
+            created_at__lt=next_month
+        ).order_by('created_at')[:batch_size])
+
+        _write_archive(user_id, chats, codec)
+        archived += len(chats)
+
+
+def compact_chat_history(retention_days, codec=DEFAULT_CODEC, batch_size=2000):
+    """Archive every user's chats older than the retention window; returns {user_id: count}"""
+    cutoff = timezone.now() - timedelta(days=retention_days)
+    user_ids = ChatMessage.objects.filter(
+        created_at__lt=cutoff
+    ).order_by().values_list('user_id', flat=True).distinct()
+
+    results = {}
+    for user_id in list(user_ids):
+        results[user_id] = compact_user_history(user_id, cutoff, codec, batch_size)
+    return results
@@ -0,0 +1,164 @@
+"""Async versions of the LLM-bound endpoints, served when running under ASGI.
+
+DRF 3.14 views are sync-only, so these are plain Django async views that
+authenticate the JWT themselves and return the same JSON payloads as their
+counterparts in views.py.
+"""
+import asyncio
+import json
+from datetime import datetime
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+
+from .models import ChatMessage
+from .serializers import UserSerializer
+from .snapshots import get_spending_snapshot
+
+
+def _csrf_exempt(view):
+    """Mark an async view as CSRF exempt (django.views.decorators.csrf wraps it in a sync function)"""
+    view.csrf_exempt = True
+    return view
+
+
+def _json(data, status=200):
+    return JsonResponse(data, status=status, encoder=JSONEncoder, safe=False)
+
+
+async def _authenticate(request):
+    """Return the JWT-authenticated user or None"""
+    try:
+        result = await sync_to_async(JWTAuthentication().authenticate)(request)
+    except (InvalidToken, AuthenticationFailed):
+        return None
+    return result[0] if result else None
+
+
+def _request_data(request):
+    try:
+        return json.loads(request.body or b'{}')
+    except ValueError:
+        return None
+
+
+def _login_required(view):
+    async def wrapped(request, *args, **kwargs):
+        user = await _authenticate(request)
+        if user is None:
+            return _json({'detail': 'Authentication credentials were not provided.'}, status=401)
+        request.user = user
+        return await view(request, *args, **kwargs)
+    wrapped.__name__ = view.__name__
+    wrapped.__doc__ = view.__doc__
+    return _csrf_exempt(wrapped)
+
+
+@_login_required
+async def dashboard(request):
+    """Get dashboard data with insights"""
+    if request.method != 'GET':
+        return _json({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+    
+    try:
+        from .reports import ReportGenerator
+        snapshot = await sync_to_async(get_spending_snapshot)(request.user)
+        report_generator = ReportGenerator()
+        insights = await sync_to_async(report_generator.get_dashboard_insights)(request.user, snapshot)
+        
+        # Both suggestion prompts go out concurrently
+        try:
+            savings_suggestions, investment_ideas = await asyncio.gather(
+                report_generator.ai.agenerate_savings_suggestions(request.user, snapshot),
+                report_generator.ai.agenerate_investment_ideas(request.user)
+            )
+        except Exception:
+            savings_suggestions = []
+            investment_ideas = []
+        
+        return _json({
+            'user': UserSerializer(request.user).data,
+            'insights': insights,
+            'savings_suggestions': savings_suggestions,
+            'investment_ideas': investment_ideas
+        })
+        
+    except Exception as e:
+        return _json({'error': str(e)}, status=500)
+
+
+@_login_required
+async def chat(request):
+    """AI chatbot endpoint"""
+    if request.method != 'POST':
+        return _json({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+    
+    data = _request_data(request)
+    if data is None:
+        return _json({'error': 'Invalid JSON body'}, status=400)
+    
+    try:
+        message = str(data.get('message', '')).strip()
+        if not message:
+            return _json({'error': 'Message is required'}, status=400)
+        
+        try:
+            from .ai_langchain import FinanceAI
+            ai = FinanceAI()
+            response = await ai.achat_response(request.user, message)
+        except Exception:
+            response = "AI service unavailable. Please try later."
+        
+        chat_message = await ChatMessage.objects.acreate(
+            user=request.user,
+            message=message,
+            response=response
+        )
+        
+        return _json({
+            'message': message,
+            'response': response,
+            'timestamp': chat_message.created_at
+        })
+        
+    except Exception as e:
+        return _json({'error': str(e)}, status=500)
+
+
+@_login_required
+async def generate_report(request):
+    """Generate financial report for date range"""
+    if request.method != 'POST':
+        return _json({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+    
+    data = _request_data(request)
+    if data is None:
+        return _json({'error': 'Invalid JSON body'}, status=400)
+    
+    try:
+        start_date = data.get('start_date')
+        end_date = data.get('end_date')
+        
+        if not start_date or not end_date:
+            return _json({'error': 'Both start_date and end_date are required'}, status=400)
+        
+        try:
+            datetime.strptime(start_date, '%Y-%m-%d')
+            datetime.strptime(end_date, '%Y-%m-%d')
+        except (TypeError, ValueError):
+            return _json({'error': 'Invalid date format. Use YYYY-MM-DD'}, status=400)
+        
+        from .reports import ReportGenerator
+        report_generator = ReportGenerator()
+        report = await report_generator.agenerate_financial_report(
+            request.user, start_date, end_date
+        )
+        
+        return _json(report)
+        
+    except Exception as e:
+        return _json({'error': str(e)}, status=500)
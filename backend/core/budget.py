@@ -0,0 +1,146 @@
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, F, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+from .models import Expense, ExpenseMonthlyRollup, User
+
+ZERO = Decimal('0')
+CENT = Decimal('0.01')
+# budget_status raises a 'near_budget' alert from this share of income spent
+NEAR_BUDGET_PERCENTAGE = 90
+
+
+def _current_month(today=None):
+    return (today or date.today()).replace(day=1)
+
+
+def _from_rollups(month, field, output_field):
+    """Per-user subquery: the month's total of ``field`` across the user's monthly rollup rows"""
+    return Coalesce(
+        Subquery(
+            ExpenseMonthlyRollup.objects.filter(user=OuterRef('pk'), month=month).order_by().values(
+                'user'
+            ).annotate(value=Sum(field)).values('value')[:1]
+        ),
+        Value(0),
+        output_field=output_field
+    )
+
+
+def _counter_updates(month, amount=None, count=None):
+    """UPDATE expressions that add the deltas when the counters are on ``month``, else reset them.
+
+    A reset recomputes the month from the monthly rollups, so expenses dated in the
+    month before it began (future-dated entries) are still counted.
+    """
+    total_field = DecimalField(max_digits=14, decimal_places=2)
+    total = _from_rollups(month, 'total', total_field)
+    transactions = _from_rollups(month, 'count', IntegerField())
+    if amount is not None:
+        total = Case(When(mtd_month=month, then=F('mtd_total') + amount), default=total, output_field=total_field)
+        transactions = Case(
+            When(mtd_month=month, then=F('mtd_count') + count), default=transactions, output_field=IntegerField()
+        )
+    return {'mtd_month': month, 'mtd_total': total, 'mtd_count': transactions}
+
+
+def apply_changes(removed, added, today=None):
+    """Fold an Expense write into the users' month-to-date counters.
+
+    Runs inside the write's transaction after the rollups are updated (see
+    core/signals.py), so a rollover recomputed from the rollups already
+    includes this write.
+    """
+    month = _current_month(today)
+    deltas = defaultdict(lambda: [ZERO, 0])
+    for sign, rows in ((-1, removed), (1, added)):
+        for row in rows:
+            if row.date.replace(day=1) == month:
+                delta = deltas[row.user_id]
+                delta[0] += sign * row.amount
+                delta[1] += sign
+
+    for user_id, (amount, count) in sorted(deltas.items()):
+        if amount or count:
+            User.objects.filter(pk=user_id).update(**_counter_updates(month, amount, count))
+
+
+def month_to_date(user, today=None):
+    """(total, count) spent this month, read off the user row; rolls the counters over in a new month"""
+    month = _current_month(today)
+    if user.mtd_month != month:
+        # exclude() keeps a concurrent write that already rolled over from being counted twice
+        User.objects.filter(pk=user.pk).exclude(mtd_month=month).update(**_counter_updates(month))
+        user.refresh_from_db(fields=['mtd_month', 'mtd_total', 'mtd_count'])
+    return user.mtd_total, user.mtd_count
+
+
+def budget_status(user, today=None):
+    """Month-to-date spend against income, with an over/near-budget alert; None without an income"""
+    if not user.monthly_income:
+        return None
+    spent, count = month_to_date(user, today)
+    income = float(user.monthly_income)
+    remaining_budget = income - float(spent)
+    budget_percentage = float(spent) / income * 100
+
+    alert = None
+    if remaining_budget < 0:
+        alert = 'over_budget'
+    elif budget_percentage >= NEAR_BUDGET_PERCENTAGE:
+        alert = 'near_budget'
+    return {
+        'monthly_income': income,
+        'spent_this_month': float(spent),
+        'remaining_budget': remaining_budget,
+        'budget_percentage': round(budget_percentage, 2),
+        'is_over_budget': remaining_budget < 0,
+        'transaction_count': count,
+        'alert': alert
+    }
+
+
+def _actual_month_to_date(month, user_ids=None):
+    """{user_id: (total, count)} straight from the month's Expense rows"""
+    expenses = Expense.objects.filter(date__gte=month, date__lt=(month + timedelta(days=32)).replace(day=1))
+    if user_ids is not None:
+        expenses = expenses.filter(user_id__in=user_ids)
+    # SQLite sums decimals as floats, so round to the counters' cents before comparing
+    return {
+        row['user_id']: (row['amount'].quantize(CENT), row['transactions'])
+        for row in expenses.values('user_id').annotate(
+            amount=Coalesce(Sum('amount'), Value(0), output_field=DecimalField(max_digits=14, decimal_places=2)),
+            transactions=Count('id')
+        ).order_by()
+    }
+
+
+def find_counter_drift(user_id=None, today=None):
+    """Users whose current-month counters disagree with their Expense rows: [(user_id, counters, actual)]"""
+    month = _current_month(today)
+    users = User.objects.filter(mtd_month=month)
+    if user_id is not None:
+        users = users.filter(pk=user_id)
+    actual = _actual_month_to_date(month, None if user_id is None else [user_id])
+
+    drift = []
+    for pk, total, count in users.values_list('pk', 'mtd_total', 'mtd_count').iterator():
+        expected = actual.get(pk, (ZERO, 0))
+        if (total, count) != expected:
+            drift.append((pk, (total, count), expected))
+    return drift
+
+
+def repair_counters(user_ids, today=None):
+    """Reset the users' counters to their Expense rows, with the rows locked against concurrent writes"""
+    month = _current_month(today)
+    with transaction.atomic():
+        list(User.objects.select_for_update().filter(pk__in=user_ids).order_by('pk').values_list('pk', flat=True))
+        actual = _actual_month_to_date(month, user_ids)
+        for user_id in user_ids:
+            total, count = actual.get(user_id, (ZERO, 0))
+            User.objects.filter(pk=user_id).update(mtd_month=month, mtd_total=total, mtd_count=count)
@@ -0,0 +1,181 @@
+from bisect import bisect_left, bisect_right
+from datetime import date, timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from .cube import category_totals
+from .models import CohortSpendingStats, Expense, ExpenseMonthlyRollup, User
+
+CATEGORIES = [choice[0] for choice in Expense.CATEGORY_CHOICES]
+TOTAL = 'total'
+ALL_INCOMES = 'all'
+UNKNOWN_INCOME = 'unknown'
+# (bracket, exclusive upper bound of monthly income in rupees)
+INCOME_BRACKETS = [
+    ('under_25k', Decimal('25000')),
+    ('25k_50k', Decimal('50000')),
+    ('50k_100k', Decimal('100000')),
+    ('100k_plus', None),
+]
+PERCENTILES = np.arange(101)
+
+
+def income_bracket(monthly_income):
+    if monthly_income is None:
+        return UNKNOWN_INCOME
+    for bracket, upper in INCOME_BRACKETS:
+        if upper is None or monthly_income < upper:
+            return bracket
+
+
+def benchmark_window(today=None):
+    """The last COHORT_WINDOW_MONTHS complete months, as (first day, last day)"""
+    today = today or date.today()
+    end = today.replace(day=1) - timedelta(days=1)
+    start = end.replace(day=1)
+    for _ in range(getattr(settings, 'COHORT_WINDOW_MONTHS', 3) - 1):
+        start = (start - timedelta(days=1)).replace(day=1)
+    return start, end
+
+
+def _month_count(start, end):
+    return (end.year - start.year) * 12 + end.month - start.month + 1
+
+
+def _money(value):
+    return Decimal(str(round(float(value), 2)))
+
+
+def refresh_cohort_stats(today=None):
+    """Recompute the spend distribution of every role × income bracket cohort.
+
+    Every user with expenses in the window becomes one row of a users × categories
+    matrix of average monthly spend, built from the monthly rollups; each cohort's
+    percentiles are then one np.percentile call over its rows. Cohorts smaller than
+    COHORT_MIN_USERS are left out. Returns the number of cohorts stored.
+    """
+    start, end = benchmark_window(today)
+    months = _month_count(start, end)
+    min_users = getattr(settings, 'COHORT_MIN_USERS', 5)
+    column = {category: index for index, category in enumerate(CATEGORIES)}
+
+    index, user_rows, columns, amounts = {}, [], [], []
+    for user_id, category, total in ExpenseMonthlyRollup.objects.filter(
+        month__gte=start, month__lte=end
+    ).order_by().values_list('user_id', 'category', 'total').iterator(chunk_size=5000):
+        user_rows.append(index.setdefault(user_id, len(index)))
+        columns.append(column.get(category, column['other']))
+        amounts.append(float(total))
+
+    # Last column is the all-category total
+    spend = np.zeros((len(index), len(CATEGORIES) + 1))
+    if index:
+        np.add.at(spend, (np.array(user_rows, dtype=np.intp), np.array(columns, dtype=np.intp)), amounts)
+    spend[:, -1] = spend[:, :-1].sum(axis=1)
+    spend /= months
+
+    roles = np.empty(len(index), dtype=object)
+    brackets = np.empty(len(index), dtype=object)
+    for user_id, role, monthly_income in User.objects.values_list('pk', 'role', 'monthly_income').iterator():
+        row = index.get(user_id)
+        if row is not None:
+            roles[row] = role
+            brackets[row] = income_bracket(monthly_income)
+
+    stats = []
+    cohort_count = 0
+    bracket_names = [ALL_INCOMES, UNKNOWN_INCOME] + [bracket for bracket, _ in INCOME_BRACKETS]
+    for role, _ in User.ROLE_CHOICES:
+        in_role = roles == role
+        for bracket in bracket_names:
+            members = in_role if bracket == ALL_INCOMES else in_role & (brackets == bracket)
+            user_count = int(members.sum())
+            if user_count < min_users:
+                continue
+            cohort_count += 1
+            # (101, categories + 1): every percentile of every column at once
+            quantiles = np.percentile(spend[members], PERCENTILES, axis=0)
+            for position, category in enumerate(CATEGORIES + [TOTAL]):
+                values = quantiles[:, position]
+                stats.append(CohortSpendingStats(
+                    role=role,
+                    income_bracket=bracket,
+                    category=category,
+                    period_start=start,
+                    period_end=end,
+                    user_count=user_count,
+                    p25=_money(values[25]),
+                    p50=_money(values[50]),
+                    p75=_money(values[75]),
+                    p90=_money(values[90]),
+                    quantiles=[round(float(value), 2) for value in values]
+                ))
+
+    with transaction.atomic():
+        CohortSpendingStats.objects.all().delete()
+        CohortSpendingStats.objects.bulk_create(stats, batch_size=500)
+    return cohort_count
+
+
+def percentile_of(quantiles, value):
+    """Percentile rank of ``value`` within a cohort, from its stored 0th..100th percentiles"""
+    left = bisect_left(quantiles, value)
+    right = bisect_right(quantiles, value)
+    if left != right:
+        # Ties (typically many users at zero): place the value in the middle of them
+        return min((left + right - 1) / 2, 100)
+    if left == 0:
+        return 0
+    if left > 100:
+        return 100
+    low, high = quantiles[left - 1], quantiles[left]
+    return left - 1 + (value - low) / (high - low)
+
+
+def cohort_benchmark(user):
+    """Where the user's average monthly spend falls within their cohort.
+
+    Uses the user's own income bracket when that cohort is large enough, else
+    everyone with the same role. None until refresh_cohort_stats has run.
+    """
+    bracket = income_bracket(user.monthly_income)
+    cohorts = {}
+    for stats in CohortSpendingStats.objects.filter(role=user.role, income_bracket__in=[bracket, ALL_INCOMES]):
+        cohorts.setdefault(stats.income_bracket, {})[stats.category] = stats
+    cohort = cohorts.get(bracket) or cohorts.get(ALL_INCOMES)
+    if not cohort or TOTAL not in cohort:
+        return None
+
+    overall = cohort[TOTAL]
+    months = _month_count(overall.period_start, overall.period_end)
+    spend = category_totals(user, overall.period_start, overall.period_end)
+
+    def placement(stats, amount):
+        monthly = round(float(amount) / months, 2)
+        return {
+            'monthly_spend': monthly,
+            'percentile': round(percentile_of(stats.quantiles, monthly), 1),
+            'p25': float(stats.p25),
+            'p50': float(stats.p50),
+            'p75': float(stats.p75),
+            'p90': float(stats.p90)
+        }
+
+    return {
+        'role': user.role,
+        'income_bracket': overall.income_bracket,
+        'cohort_size': overall.user_count,
+        'period': {
+            'start_date': overall.period_start.strftime('%Y-%m-%d'),
+            'end_date': overall.period_end.strftime('%Y-%m-%d')
+        },
+        **placement(overall, sum((item['total'] for item in spend.values()), Decimal('0'))),
+        'categories': [
+            {'category': category, **placement(cohort[category], spend.get(category, {}).get('total', 0))}
+            for category in CATEGORIES
+            if category in cohort and (cohort[category].p90 > 0 or category in spend)
+        ]
+    }
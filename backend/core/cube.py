@@ -0,0 +1,268 @@
+import threading
+from collections import OrderedDict
+from datetime import date, timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from . import rollups
+from .models import Expense, User
+
+CATEGORIES = [choice[0] for choice in Expense.CATEGORY_CHOICES]
+CATEGORY_INDEX = {category: index for index, category in enumerate(CATEGORIES)}
+# Room for future-dated expenses before a write falls outside the cube
+FUTURE_DAYS = 62
+
+_cubes = OrderedDict()
+_lock = threading.Lock()
+_cached_bytes = 0
+
+
+def _paise(amount):
+    return int(Decimal(amount) * 100)
+
+
+def _rupees(paise):
+    return Decimal(int(paise)).scaleb(-2)
+
+
+class SpendingCube:
+    """One user's spending as day × category prefix sums, in integer paise.
+
+    Row ``k`` of ``amounts``/``counts`` holds the per-category totals of every day
+    before ``origin + k``, so any [start, end] window is
+    ``amounts[end + 1] - amounts[start]``: two row reads, whatever the range.
+    """
+
+    def __init__(self, origin, days, version):
+        self.origin = origin
+        self.days = days
+        self.version = version
+        self.amounts = np.zeros((days + 1, len(CATEGORIES)), dtype=np.int64)
+        self.counts = np.zeros((days + 1, len(CATEGORIES)), dtype=np.int64)
+
+    @property
+    def nbytes(self):
+        return self.amounts.nbytes + self.counts.nbytes
+
+    @staticmethod
+    def projected_nbytes(days):
+        """Size of a cube spanning ``days`` days, before anything is allocated"""
+        return 2 * (days + 1) * len(CATEGORIES) * np.dtype(np.int64).itemsize
+
+    @classmethod
+    def build(cls, user_id, today=None):
+        """Build from the daily rollups.
+
+        None if the user doesn't exist or the cube would exceed the memory cap,
+        e.g. when a far-past or far-future expense stretches the day span.
+        """
+        # One statement, so the version and the rollup rows come from the same snapshot
+        rows = list(User.objects.filter(pk=user_id).values_list(
+            'expense_version',
+            'daily_rollups__day',
+            'daily_rollups__category',
+            'daily_rollups__total',
+            'daily_rollups__count'
+        ))
+        if not rows:
+            return None
+
+        version = rows[0][0]
+        rows = [row for row in rows if row[1] is not None]
+        today = today or date.today()
+        origin = min((row[1] for row in rows), default=today)
+        last = max(max((row[1] for row in rows), default=today), today)
+        # Less room for future-dated writes near date.max rather than an OverflowError
+        last += timedelta(days=min(FUTURE_DAYS, (date.max - last).days))
+        days = (last - origin).days + 1
+        if cls.projected_nbytes(days) > _max_bytes():
+            return None
+        cube = cls(origin, days, version)
+
+        if rows:
+            index = (
+                np.array([(row[1] - origin).days + 1 for row in rows]),
+                np.array([CATEGORY_INDEX.get(row[2], CATEGORY_INDEX['other']) for row in rows])
+            )
+            np.add.at(cube.amounts, index, np.array([_paise(row[3]) for row in rows], dtype=np.int64))
+            np.add.at(cube.counts, index, np.array([row[4] for row in rows], dtype=np.int64))
+            np.cumsum(cube.amounts, axis=0, out=cube.amounts)
+            np.cumsum(cube.counts, axis=0, out=cube.counts)
+        return cube
+
+    def apply(self, row, sign):
+        """Patch in one added (+1) or removed (-1) ExpenseChange; False if it falls outside the cube"""
+        day = (row.date - self.origin).days
+        if day < 0 or day >= self.days:
+            return False
+        category = CATEGORY_INDEX.get(row.category, CATEGORY_INDEX['other'])
+        self.amounts[day + 1:, category] += sign * _paise(row.amount)
+        self.counts[day + 1:, category] += sign
+        return True
+
+    def totals(self, start, end):
+        """Per-category (amounts, counts) arrays over [start, end]"""
+        first = max((start - self.origin).days, 0)
+        last = min((end - self.origin).days, self.days - 1)
+        if first > last:
+            empty = np.zeros(len(CATEGORIES), dtype=np.int64)
+            return empty, empty
+        return self.amounts[last + 1] - self.amounts[first], self.counts[last + 1] - self.counts[first]
+
+    def daily(self, start, end):
+        """[(day, paise)] for the days in [start, end] with expenses"""
+        first = max((start - self.origin).days, 0)
+        last = min((end - self.origin).days, self.days - 1)
+        if first > last:
+            return []
+        amounts = np.diff(self.amounts[first:last + 2].sum(axis=1))
+        counts = np.diff(self.counts[first:last + 2].sum(axis=1))
+        return [
+            (self.origin + timedelta(days=first + int(offset)), amounts[offset])
+            for offset in np.flatnonzero(counts)
+        ]
+
+    def buckets(self, edges, end):
+        """Per-bucket, per-category (amounts, counts); bucket i runs from edges[i] to the next edge or ``end``"""
+        offsets = [(edge - self.origin).days for edge in edges] + [(end - self.origin).days + 1]
+        rows = np.clip(offsets, 0, self.days)
+        return np.diff(self.amounts[rows], axis=0), np.diff(self.counts[rows], axis=0)
+
+
+def _max_bytes():
+    return getattr(settings, 'SPENDING_CUBE_MAX_BYTES', 32 * 1024 * 1024)
+
+
+def _drop(user_id):
+    global _cached_bytes
+    cube = _cubes.pop(user_id, None)
+    if cube is not None:
+        _cached_bytes -= cube.nbytes
+
+
+def get_spending_cube(user):
+    """The user's cube, built on first use and rebuilt when their expenses changed elsewhere.
+
+    Returns None when the cube alone would exceed the memory cap; callers then
+    answer from the rollups.
+    """
+    global _cached_bytes
+    with _lock:
+        cube = _cubes.get(user.pk)
+        if cube is not None and cube.version == user.expense_version:
+            _cubes.move_to_end(user.pk)
+            return cube
+
+    cube = SpendingCube.build(user.pk)
+    if cube is None:
+        return None
+
+    with _lock:
+        _drop(user.pk)
+        _cubes[user.pk] = cube
+        _cached_bytes += cube.nbytes
+        while _cached_bytes > _max_bytes():
+            _drop(next(iter(_cubes)))
+    return cube
+
+
+def clear_spending_cube(user_id):
+    """Evict the user's cube from this process"""
+    with _lock:
+        _drop(user_id)
+
+
+def _breakdown(amounts, counts):
+    breakdown = {
+        category: {'total': _rupees(amounts[index]), 'count': int(counts[index])}
+        for index, category in enumerate(CATEGORIES)
+        if counts[index]
+    }
+    return dict(sorted(breakdown.items(), key=lambda item: item[1]['total'], reverse=True))
+
+
+def category_totals(user, start, end):
+    """Same result as rollups.category_totals, answered from the user's cube when it fits"""
+    cube = get_spending_cube(user)
+    if cube is None:
+        return rollups.category_totals(user, start, end)
+
+    with _lock:
+        amounts, counts = cube.totals(start, end)
+    return _breakdown(amounts, counts)
+
+
+def report_totals(user, start, end, previous_start, previous_end):
+    """Same result as rollups.report_totals; no queries at all once the cube is warm"""
+    cube = get_spending_cube(user)
+    if cube is None:
+        return rollups.report_totals(user, start, end, previous_start, previous_end)
+
+    with _lock:
+        amounts, counts = cube.totals(start, end)
+        previous_amounts, _ = cube.totals(previous_start, previous_end)
+        daily = cube.daily(start, end)
+    return {
+        'categories': _breakdown(amounts, counts),
+        'total': _rupees(amounts.sum()),
+        'count': int(counts.sum()),
+        'daily': [(day, _rupees(paise)) for day, paise in daily],
+        'previous_total': _rupees(previous_amounts.sum()),
+    }
+
+
+def bucketed_totals(user, ranges, granularity=None, categories=None):
+    """Same result as rollups.bucketed_totals, answered from the user's cube when it fits"""
+    cube = get_spending_cube(user)
+    if cube is None:
+        return rollups.bucketed_totals(user, ranges, granularity, categories)
+
+    with _lock:
+        matrices = [
+            (edges, *cube.buckets(edges, end))
+            for edges, end in ((rollups.bucket_edges(start, end, granularity), end) for start, end in ranges)
+        ]
+    if categories:
+        excluded = [index for category, index in CATEGORY_INDEX.items() if category not in categories]
+        for _, amounts, counts in matrices:
+            amounts[:, excluded] = 0
+            counts[:, excluded] = 0
+    return [
+        [(edge, _breakdown(amounts[row], counts[row])) for row, edge in enumerate(edges)]
+        for edges, amounts, counts in matrices
+    ]
+
+
+def schedule_patch(removed, added):
+    """Patch this process's cubes with an Expense write once its transaction commits.
+
+    Must run after the write bumped ``expense_version``. A cube is patched only if
+    it is exactly one version behind, i.e. it has seen every earlier write;
+    otherwise it is dropped and rebuilt on next use.
+    """
+    with _lock:
+        user_ids = {row.user_id for row in (*removed, *added) if row.user_id in _cubes}
+    if not user_ids:
+        return
+    versions = dict(User.objects.filter(pk__in=user_ids).values_list('pk', 'expense_version'))
+
+    def patch():
+        with _lock:
+            for user_id, version in versions.items():
+                cube = _cubes.get(user_id)
+                if cube is None:
+                    continue
+                if cube.version != version - 1:
+                    _drop(user_id)
+                    continue
+                rows = [(row, -1) for row in removed if row.user_id == user_id]
+                rows += [(row, 1) for row in added if row.user_id == user_id]
+                if all(cube.apply(row, sign) for row, sign in rows):
+                    cube.version = version
+                else:
+                    _drop(user_id)
+
+    transaction.on_commit(patch)
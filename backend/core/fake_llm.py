@@ -0,0 +1,250 @@
+"""Deterministic OpenAI-compatible stand-in for load and latency testing.
+
+Serves /v1/completions (what langchain_openai.OpenAI calls), /v1/chat/completions
+and /v1/models, including ``stream: true``. Response bodies depend only on the
+prompt, so runs are reproducible; latency and injected errors are drawn from a
+seeded RNG. Point FinanceAI at it with OPENAI_BASE_URL=http://127.0.0.1:8001/v1.
+"""
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CATEGORY_KEYWORDS = [
+    ('food', ['restaurant', 'food', 'meal', 'lunch', 'dinner', 'breakfast', 'cafe', 'coffee', 'pizza']),
+    ('transportation', ['uber', 'taxi', 'gas', 'fuel', 'transport', 'bus', 'metro', 'train']),
+    ('shopping', ['store', 'shopping', 'amazon', 'buy', 'mall', 'clothes']),
+    ('entertainment', ['movie', 'entertainment', 'game', 'concert', 'netflix', 'spotify']),
+    ('bills', ['bill', 'utility', 'electric', 'water', 'internet', 'phone', 'rent']),
+    ('healthcare', ['doctor', 'hospital', 'pharmacy', 'medical', 'medicine']),
+    ('education', ['school', 'education', 'course', 'book', 'tuition']),
+    ('travel', ['hotel', 'flight', 'travel', 'vacation', 'airbnb']),
+    ('groceries', ['grocery', 'supermarket', 'walmart', 'target', 'vegetables']),
+]
+
+RISK_LEVELS = ['Very Low', 'Low', 'Low to Moderate', 'Moderate']
+
+
+def _category(description):
+    description = description.lower()
+    for category, words in CATEGORY_KEYWORDS:
+        if any(word in description for word in words):
+            return category
+    return 'other'
+
+
+def _seed(prompt):
+    return int(hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:16], 16)
+
+
+def _field(prompt, label):
+    match = re.search(rf'{label}:\s*(.+)', prompt)
+    return match.group(1).strip() if match else ''
+
+
+def _instruction(prompt):
+    """The prompt's first line: fixed template text in every FinanceAI prompt, unlike
+    later lines, which carry the user's message and conversation summary"""
+    return prompt.strip().split('\n', 1)[0].strip()
+
+
+def complete(prompt):
+    """Deterministic, schema-valid completion for each FinanceAI prompt type"""
+    rng = random.Random(_seed(prompt))
+    instruction = _instruction(prompt)
+
+    if instruction.startswith('Categorize each of the following'):
+        block = prompt.split('Expense descriptions:', 1)[-1]
+        lines = re.findall(r'^\s*\d+\.\s*(.+)$', block, re.MULTILINE)
+        return json.dumps([_category(line) for line in lines])
+
+    if instruction.startswith('Categorize the following expense'):
+        return _category(_field(prompt, 'Expense description'))
+
+    if instruction.startswith('You are a financial advisor. Generate 3 personalized savings suggestions'):
+        role = _field(prompt, 'Role') or 'user'
+        return json.dumps([
+            {
+                'title': f'Savings idea {index + 1} for a {role}',
+                'description': f'Trim discretionary spending by {rng.randint(5, 20)}% and automate a transfer on payday.',
+                'estimated_savings': f'₹{rng.randint(5, 50) * 100}/month'
+            }
+            for index in range(3)
+        ], ensure_ascii=False)
+
+    if instruction.startswith('You are a financial advisor. Generate 3 safe, educational investment ideas'):
+        return json.dumps([
+            {
+                'title': f'Investment idea {index + 1}',
+                'description': 'A diversified, low-cost option suitable for beginners.',
+                'risk_level': rng.choice(RISK_LEVELS),
+                'min_investment': f'₹{rng.randint(1, 20) * 500}'
+            }
+            for index in range(3)
+        ], ensure_ascii=False)
+
+    if instruction.startswith('Generate a comprehensive financial report summary'):
+        total = _field(prompt, 'Total Expenses')
+        count = _field(prompt, 'Number of Transactions')
+        return (f"Spending overview: {count} transactions totaling {total}. "
+                f"Your largest categories drive most of the total; review them weekly "
+                f"and set a cap {rng.randint(5, 15)}% below this period's spend.")
+
+    if instruction.startswith('You are a helpful personal finance assistant. The user asked:'):
+        return _field(prompt, 'The exact answer from their records is')
+
+    question = _field(prompt, 'User Question') or prompt[-200:].strip()
+    return (f"Here's a practical take on \"{question[:80]}\": track every expense for "
+            f"{rng.randint(2, 4)} weeks, set a realistic monthly cap, and move "
+            f"{rng.randint(10, 25)}% of income to savings as soon as you're paid.")
+
+
+def _usage(prompt, text):
+    prompt_tokens = max(1, len(prompt) // 4)
+    completion_tokens = max(1, len(text) // 4)
+    return {
+        'prompt_tokens': prompt_tokens,
+        'completion_tokens': completion_tokens,
+        'total_tokens': prompt_tokens + completion_tokens,
+    }
+
+
+def _chunks(text, size=3):
+    """Split into word groups, keeping the whitespace so chunks concatenate back exactly"""
+    words = re.findall(r'\S+\s*|\s+', text)
+    for index in range(0, len(words), size):
+        yield ''.join(words[index:index + size])
+
+
+class FakeLLMConfig:
+    def __init__(self, latency_ms=300.0, latency_sigma=0.5, error_rate=0.0, seed=0):
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self):
+        """Return (latency seconds, should fail) from the seeded sequence"""
+        with self._lock:
+            if self.latency_ms <= 0:
+                latency = 0.0
+            elif self.latency_sigma > 0:
+                # Lognormal with the configured median
+                latency = self._rng.lognormvariate(0, self.latency_sigma) * self.latency_ms / 1000
+            else:
+                latency = self.latency_ms / 1000
+            return latency, self._rng.random() < self.error_rate
+
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    config = FakeLLMConfig()
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip('/').endswith('/models'):
+            return self._send_json(200, {'object': 'list', 'data': [
+                {'id': 'gpt-3.5-turbo-instruct', 'object': 'model', 'owned_by': 'fake-llm'},
+            ]})
+        self._send_json(404, {'error': {'message': 'Not found', 'type': 'invalid_request_error'}})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            return self._send_json(400, {'error': {'message': 'Invalid JSON', 'type': 'invalid_request_error'}})
+
+        chat = self.path.rstrip('/').endswith('/chat/completions')
+        if not chat and not self.path.rstrip('/').endswith('/completions'):
+            return self._send_json(404, {'error': {'message': 'Not found', 'type': 'invalid_request_error'}})
+
+        if chat:
+            prompts = ['\n'.join(str(message.get('content', '')) for message in body.get('messages', []))]
+        else:
+            prompts = body.get('prompt', '')
+            prompts = prompts if isinstance(prompts, list) else [prompts]
+
+        latency, fail = self.config.sample()
+        if fail:
+            time.sleep(latency)
+            return self._send_json(500, {'error': {'message': 'Injected failure', 'type': 'server_error'}})
+
+        model = body.get('model', 'gpt-3.5-turbo-instruct')
+        texts = [complete(prompt) for prompt in prompts]
+        if body.get('stream'):
+            return self._stream(chat, model, texts, latency)
+
+        time.sleep(latency)
+        response_id = f"{'chatcmpl' if chat else 'cmpl'}-{uuid.uuid4().hex[:24]}"
+        if chat:
+            choices = [{'index': 0, 'message': {'role': 'assistant', 'content': texts[0]}, 'finish_reason': 'stop'}]
+        else:
+            choices = [
+                {'index': index, 'text': text, 'logprobs': None, 'finish_reason': 'stop'}
+                for index, text in enumerate(texts)
+            ]
+        usage = _usage(''.join(prompts), ''.join(texts))
+        self._send_json(200, {
+            'id': response_id,
+            'object': 'chat.completion' if chat else 'text_completion',
+            'created': int(time.time()),
+            'model': model,
+            'choices': choices,
+            'usage': usage,
+        })
+
+    def _stream(self, chat, model, texts, latency):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+
+        response_id = f"{'chatcmpl' if chat else 'cmpl'}-{uuid.uuid4().hex[:24]}"
+        chunks = list(_chunks(texts[0]))
+        # A third of the latency before the first token, the rest spread over the stream
+        time.sleep(latency * 0.3)
+        per_chunk = latency * 0.7 / max(len(chunks), 1)
+
+        for index, chunk in enumerate(chunks + [None]):
+            if chat:
+                choice = {'index': 0, 'delta': {'content': chunk} if chunk is not None else {},
+                          'finish_reason': None if chunk is not None else 'stop'}
+            else:
+                choice = {'index': 0, 'text': chunk or '', 'logprobs': None,
+                          'finish_reason': None if chunk is not None else 'stop'}
+            event = {
+                'id': response_id,
+                'object': 'chat.completion.chunk' if chat else 'text_completion',
+                'created': int(time.time()),
+                'model': model,
+                'choices': [choice],
+            }
+            self.wfile.write(f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode('utf-8'))
+            self.wfile.flush()
+            if index:
+                time.sleep(per_chunk)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+def make_server(host='127.0.0.1', port=8001, config=None):
+    handler = type('ConfiguredFakeLLMHandler', (FakeLLMHandler,), {'config': config or FakeLLMConfig()})
+    return ThreadingHTTPServer((host, port), handler)
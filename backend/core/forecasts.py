@@ -0,0 +1,206 @@
+import calendar
+from datetime import date
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+
+from .models import Expense, ExpenseMonthlyRollup, SpendingForecast
+
+CATEGORIES = [choice[0] for choice in Expense.CATEGORY_CHOICES]
+TOTAL = 'total'
+# Two-sided 80% interval
+Z_80 = 1.2816
+# Relative error assumed until a user has two months of history to measure it on
+DEFAULT_RELATIVE_SIGMA = 0.5
+
+
+def _months_back(month, count):
+    index = month.year * 12 + month.month - 1 - count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _money(value):
+    return Decimal(str(round(float(value), 2)))
+
+
+def _remaining_fraction(today):
+    """Share of today's month still ahead, counting today as spent"""
+    days = calendar.monthrange(today.year, today.month)[1]
+    return (days - today.day) / days
+
+
+def fit_smoothing(history, active_from, alpha):
+    """Simple exponential smoothing of many series at once.
+
+    ``history`` is (users, months, series); each user's series start at month
+    ``active_from[user]`` (their first month with any spend) and later months
+    without spend count as zero. Returns the (users, series) level, i.e. the
+    forecast for the next month, and the RMS of the one-step-ahead errors.
+    """
+    users, months, series = history.shape
+    level = np.full((users, series), np.nan)
+    squared_errors = np.zeros((users, series))
+    error_count = np.zeros(users)
+    for month in range(months):
+        observed = history[:, month]
+        active = (month >= active_from)[:, None]
+        seen = ~np.isnan(level)
+        scored = active & seen
+        squared_errors += np.where(scored, (observed - np.nan_to_num(level)) ** 2, 0)
+        error_count += scored[:, 0]
+        level = np.where(active, np.where(seen, alpha * observed + (1 - alpha) * level, observed), level)
+
+    level = np.nan_to_num(level)
+    sigma = np.sqrt(squared_errors / np.maximum(error_count, 1)[:, None])
+    sigma = np.where((error_count >= 2)[:, None], sigma, level * DEFAULT_RELATIVE_SIGMA)
+    return level, sigma
+
+
+def project(month_to_date, level, sigma, remaining, alpha):
+    """Month-end and next-month (expected, low, high) arrays with 80% intervals"""
+    month_end = month_to_date + level * remaining
+    month_end_margin = Z_80 * sigma * np.sqrt(remaining)
+    # Two steps past the last complete month
+    next_margin = Z_80 * sigma * np.sqrt(1 + alpha ** 2)
+    return (
+        (month_end, np.maximum(month_end - month_end_margin, month_to_date), month_end + month_end_margin),
+        (level, np.maximum(level - next_margin, 0), level + next_margin)
+    )
+
+
+def _forecast_batch(rows, today, history_months, alpha):
+    """SpendingForecast objects for the users in ``rows`` of (user_id, month, category, total)"""
+    month = today.replace(day=1)
+    first = _months_back(month, history_months)
+    column = {category: index for index, category in enumerate(CATEGORIES)}
+
+    index, positions, amounts = {}, [], []
+    for user_id, row_month, category, total in rows:
+        offset = (row_month.year - first.year) * 12 + row_month.month - first.month
+        positions.append((index.setdefault(user_id, len(index)), offset, column.get(category, column['other'])))
+        amounts.append(float(total))
+    if not index:
+        return []
+
+    # Months 0..history_months-1 are complete; the last slot is the current month to date.
+    # The extra series is the all-category total, smoothed on its own so its error isn't
+    # the sum of the per-category errors
+    spend = np.zeros((len(index), history_months + 1, len(CATEGORIES) + 1))
+    np.add.at(spend, tuple(np.array(positions, dtype=np.intp).T), amounts)
+    spend[:, :, -1] = spend[:, :, :-1].sum(axis=2)
+    history, month_to_date = spend[:, :-1], spend[:, -1]
+
+    has_spend = history[:, :, -1] > 0
+    active_from = np.where(has_spend.any(axis=1), has_spend.argmax(axis=1), history_months)
+    level, sigma = fit_smoothing(history, active_from, alpha)
+
+    # No complete month yet: extrapolate the current month's run rate
+    remaining = _remaining_fraction(today)
+    new_users = active_from == history_months
+    run_rate = month_to_date / max(1 - remaining, 1e-6)
+    level = np.where(new_users[:, None], run_rate, level)
+    sigma = np.where(new_users[:, None], run_rate * DEFAULT_RELATIVE_SIGMA, sigma)
+
+    month_end, next_month = project(month_to_date, level, sigma, remaining, alpha)
+
+    forecasts = []
+    for user_id, row in index.items():
+        categories = {
+            category: {
+                'monthly_level': round(float(level[row, position]), 2),
+                'monthly_sigma': round(float(sigma[row, position]), 2),
+                'month_end': [round(float(values[row, position]), 2) for values in month_end],
+                'next_month': [round(float(values[row, position]), 2) for values in next_month],
+            }
+            for position, category in enumerate(CATEGORIES)
+            if level[row, position] or month_to_date[row, position]
+        }
+        forecasts.append(SpendingForecast(
+            user_id=user_id,
+            as_of=today,
+            month=month,
+            month_to_date=_money(month_to_date[row, -1]),
+            monthly_level=_money(level[row, -1]),
+            monthly_sigma=_money(sigma[row, -1]),
+            month_end_expected=_money(month_end[0][row, -1]),
+            month_end_low=_money(month_end[1][row, -1]),
+            month_end_high=_money(month_end[2][row, -1]),
+            next_month_expected=_money(next_month[0][row, -1]),
+            next_month_low=_money(next_month[1][row, -1]),
+            next_month_high=_money(next_month[2][row, -1]),
+            categories=categories
+        ))
+    return forecasts
+
+
+def refresh_forecasts(today=None, batch_size=2000):
+    """Refit every user with spending in the history window; returns the number of forecasts stored.
+
+    Users are processed in id-ordered batches, one rollup query and one
+    vectorized fit per batch, so memory stays bounded by the batch size.
+    """
+    today = today or date.today()
+    history_months = getattr(settings, 'FORECAST_HISTORY_MONTHS', 12)
+    alpha = getattr(settings, 'FORECAST_SMOOTHING', 0.4)
+    first = _months_back(today.replace(day=1), history_months)
+    window = ExpenseMonthlyRollup.objects.filter(month__gte=first, month__lte=today.replace(day=1)).order_by()
+
+    user_ids = list(window.values_list('user_id', flat=True).distinct().order_by('user_id'))
+    stored = 0
+    for start in range(0, len(user_ids), batch_size):
+        batch = user_ids[start:start + batch_size]
+        rows = window.filter(user_id__gte=batch[0], user_id__lte=batch[-1]).values_list(
+            'user_id', 'month', 'category', 'total'
+        )
+        forecasts = _forecast_batch(rows.iterator(chunk_size=5000), today, history_months, alpha)
+        SpendingForecast.objects.bulk_create(
+            forecasts,
+            update_conflicts=True,
+            unique_fields=['user'],
+            update_fields=[
+                field.name for field in SpendingForecast._meta.concrete_fields
+                if not field.primary_key and field.name != 'user'
+            ]
+        )
+        stored += len(forecasts)
+    return stored
+
+
+def _interval(expected, low, high):
+    return {'expected': round(float(expected), 2), 'low': round(float(low), 2), 'high': round(float(high), 2)}
+
+
+def dashboard_forecast(user, month_to_date, month_by_category, today=None):
+    """The stored forecast with its month-end projection redone against live month-to-date spend.
+
+    One row fetch; None if the user has no forecast for the current month yet.
+    """
+    today = today or date.today()
+    forecast = SpendingForecast.objects.filter(user=user, month=today.replace(day=1)).first()
+    if forecast is None:
+        return None
+
+    alpha = getattr(settings, 'FORECAST_SMOOTHING', 0.4)
+    remaining = _remaining_fraction(today)
+    month_end, next_month = project(
+        np.array([float(month_to_date)] + [float(month_by_category.get(category, {}).get('total', 0))
+                                           for category in forecast.categories]),
+        np.array([float(forecast.monthly_level)] + [item['monthly_level'] for item in forecast.categories.values()]),
+        np.array([float(forecast.monthly_sigma)] + [item['monthly_sigma'] for item in forecast.categories.values()]),
+        remaining,
+        alpha
+    )
+    return {
+        'as_of': forecast.as_of.strftime('%Y-%m-%d'),
+        'month_end': _interval(*(values[0] for values in month_end)),
+        'next_month': _interval(*(values[0] for values in next_month)),
+        'categories': [
+            {
+                'category': category,
+                'month_end': _interval(*(values[position] for values in month_end)),
+                'next_month': _interval(*(values[position] for values in next_month))
+            }
+            for position, category in enumerate(forecast.categories, start=1)
+        ]
+    }
@@ -0,0 +1,103 @@
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count, Sum
+from django.test.utils import CaptureQueriesContext
+
+from core import rollups
+from core.cube import clear_spending_cube
+from core.models import Expense, User
+from core.reports import TOP_EXPENSES, ReportGenerator
+
+
+def legacy_report(user, start_date, end_date):
+    """The original report aggregation: six sequential queries over raw Expense rows"""
+    expenses = Expense.objects.filter(user=user, date__gte=start_date, date__lte=end_date)
+    total = expenses.aggregate(total=Sum('amount'))['total'] or 0
+    count = expenses.count()
+    list(expenses.values('category').annotate(total=Sum('amount'), count=Count('id')).order_by('-total'))
+    list(expenses.values('date').annotate(total=Sum('amount')).order_by('date'))
+    list(expenses.order_by('-amount')[:TOP_EXPENSES].values('description', 'amount', 'category', 'date'))
+    previous_start = start_date - timedelta(days=(end_date - start_date).days + 1)
+    Expense.objects.filter(
+        user=user, date__gte=previous_start, date__lte=start_date - timedelta(days=1)
+    ).aggregate(total=Sum('amount'))
+    return float(total), count
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare query count and latency of report aggregation: the original six "
+        "raw-Expense queries against the single-pass engine (rollup scan, cold and "
+        "warm spending cube). AI summaries are not generated."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user-id', type=int, help='User to report on (default: the one with most expenses)')
+        parser.add_argument('--days', type=int, default=365, help='Report period length, ending today')
+        parser.add_argument('--runs', type=int, default=20)
+
+    def handle(self, *args, **options):
+        if options['user_id']:
+            user = User.objects.filter(pk=options['user_id']).first()
+        else:
+            user = User.objects.annotate(expense_total=Count('expenses')).order_by('-expense_total').first()
+        if user is None:
+            raise CommandError("No user to benchmark")
+
+        end_date = date.today()
+        start_date = end_date - timedelta(days=options['days'] - 1)
+        previous_start = start_date - timedelta(days=options['days'])
+        previous_end = start_date - timedelta(days=1)
+        generator = ReportGenerator()
+
+        def rollup_scan():
+            totals = rollups.report_totals(user, start_date, end_date, previous_start, previous_end)
+            list(Expense.objects.filter(
+                user=user, date__gte=start_date, date__lte=end_date
+            ).order_by('-amount')[:TOP_EXPENSES].values('description', 'amount', 'category', 'date'))
+            return totals
+
+        def cold_cube():
+            clear_spending_cube(user.pk)
+            return generator._compile_report(user, start_date, end_date)
+
+        implementations = [
+            ('legacy (6 queries)', lambda: legacy_report(user, start_date, end_date), None),
+            ('single pass, rollups', rollup_scan, None),
+            ('single pass, cold cube', cold_cube, None),
+            ('single pass, warm cube', lambda: generator._compile_report(user, start_date, end_date),
+             lambda: generator._compile_report(user, start_date, end_date)),
+        ]
+
+        self.stdout.write(
+            f"user {user.pk}, {start_date} to {end_date}, "
+            f"{Expense.objects.filter(user=user).count()} expenses, {options['runs']} runs"
+        )
+        self.stdout.write(f"{'implementation':<24} {'queries':>7} {'p50 ms':>8} {'p95 ms':>8}")
+        for name, run, warm_up in implementations:
+            if warm_up:
+                warm_up()
+            latencies = []
+            for _ in range(options['runs']):
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    run()
+                    latencies.append((time.perf_counter() - started) * 1000)
+            latencies.sort()
+            p50 = latencies[len(latencies) // 2]
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            self.stdout.write(f"{name:<24} {len(queries.captured_queries):>7} {p50:>8.2f} {p95:>8.2f}")
+
+        # The engines must agree with the raw rows
+        total, count = legacy_report(user, start_date, end_date)
+        report, _ = generator._compile_report(user, start_date, end_date)
+        summary = report['summary']
+        if round(summary['total_expenses'], 2) != round(total, 2) or summary['transaction_count'] != count:
+            raise CommandError(
+                f"Report totals disagree with raw rows: {summary['total_expenses']}/{summary['transaction_count']} "
+                f"vs {total}/{count}; run rebuild_expense_rollups"
+            )
+        self.stdout.write(self.style.SUCCESS("Single-pass totals match the raw Expense rows"))
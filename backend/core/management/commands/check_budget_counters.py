@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.budget import find_counter_drift, repair_counters
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare every user's month-to-date spend counters with this month's Expense rows "
+        "and, with --repair, reset the ones that drifted (e.g. after raw SQL writes)."
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--user-id', type=int, help='Check a single user (default: everyone)')
+        parser.add_argument('--repair', action='store_true', help='Reset drifted counters')
+    
+    def handle(self, *args, **options):
+        drift = find_counter_drift(options['user_id'])
+        for user_id, (total, count), (actual_total, actual_count) in drift:
+            self.stdout.write(
+                f"user {user_id}: counters {total}/{count}, expenses {actual_total}/{actual_count}"
+            )
+        if not drift:
+            self.stdout.write(self.style.SUCCESS("Month-to-date counters match the expenses"))
+            return
+        if not options['repair']:
+            raise CommandError(f"{len(drift)} users have drifted counters; rerun with --repair")
+        repair_counters([user_id for user_id, _, _ in drift])
+        self.stdout.write(self.style.SUCCESS(
+            f"Repaired {len(drift)} users. If the monthly rollups drifted too, run rebuild_expense_rollups"
+        ))
@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.archives import DEFAULT_CODEC, compact_chat_history
+
+
+class Command(BaseCommand):
+    help = (
+        "Move ChatMessages older than the retention window into compressed per-user "
+        "archive blobs, keeping only recent rows in the hot table."
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retention-days', type=int, default=getattr(settings, 'CHAT_RETENTION_DAYS', 180),
+            help='Keep chats newer than this many days in the ChatMessage table'
+        )
+        parser.add_argument('--codec', choices=['zstd', 'gzip'], default=DEFAULT_CODEC)
+        parser.add_argument('--batch-size', type=int, default=2000, help='Maximum messages per archive blob')
+    
+    def handle(self, *args, **options):
+        results = compact_chat_history(
+            options['retention_days'],
+            codec=options['codec'],
+            batch_size=options['batch_size']
+        )
+        
+        for user_id, count in results.items():
+            self.stdout.write(f"user {user_id}: archived {count} messages")
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {sum(results.values())} messages for {len(results)} users "
+            f"(older than {options['retention_days']} days, {options['codec']})"
+        ))
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.report_jobs import expire_artifacts
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete the rendered CSV/XLSX/PDF files of report jobs that finished longer ago "
+        "than the retention window; their downloads then answer 410 Gone."
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retention-days', type=int, default=getattr(settings, 'REPORT_ARTIFACT_RETENTION_DAYS', 7),
+            help='Keep the files of jobs that finished within this many days'
+        )
+    
+    def handle(self, *args, **options):
+        expired = expire_artifacts(options['retention_days'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Expired the files of {expired} report jobs (finished over {options['retention_days']} days ago)"
+        ))
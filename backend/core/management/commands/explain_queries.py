@@ -0,0 +1,123 @@
+import re
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Avg, Count, Max, Q, Sum
+from django.utils import timezone
+
+from core.models import (
+    ChatArchive, ChatMessage, CohortSpendingStats, Expense, ExpenseAnomaly, ExpenseCategoryStats,
+    ExpenseDailyRollup, ExpenseMonthlyRollup, User
+)
+from core.ai_ledger import quota_seed_calls
+
+# Plan lines that mean a table is read in full. SQLite reports "SCAN <table>",
+# also when it walks a whole index ("SCAN <table> USING [COVERING] INDEX ...";
+# an indexed lookup is "SEARCH"), and PostgreSQL "Seq Scan on <table>".
+FULL_SCAN_PATTERNS = [
+    re.compile(r'\bSCAN (?:TABLE )?(core_\w+)\b'),
+    re.compile(r'Seq Scan on (core_\w+)'),
+]
+
+
+def endpoint_queries(user_id):
+    """The hot per-user queries behind the API endpoints, keyed by a readable name"""
+    end = date.today()
+    start = end - timedelta(days=30)
+    expenses = Expense.objects.filter(user_id=user_id, date__gte=start, date__lte=end)
+    month_start = end.replace(day=1)
+
+    return {
+        'expenses list': Expense.objects.filter(user_id=user_id)[:50],
+        'expenses list (date range)': expenses[:50],
+        'expenses keyset page': Expense.objects.filter(user_id=user_id).filter(
+            Q(date__lt=end) | Q(date=end, created_at__lt=timezone.now())
+            | Q(date=end, created_at=timezone.now(), id__lt=1000)
+        ).order_by('-date', '-created_at', '-id')[:51],
+        'expenses export': Expense.objects.filter(user_id=user_id).order_by('date', 'created_at', 'id').values_list(
+            'id', 'date', 'description', 'category', 'amount', 'is_from_pdf', 'created_at'
+        ),
+        'expenses count (amount filter)': Expense.objects.filter(
+            user_id=user_id, amount__gte=100
+        ).order_by()[:10000].values('id'),
+        'rollup months by category': ExpenseMonthlyRollup.objects.filter(
+            user_id=user_id, month__gte=month_start.replace(month=1), month__lt=month_start
+        ).values('category').annotate(amount=Sum('total'), transactions=Sum('count')).order_by(),
+        'rollup days by category': ExpenseDailyRollup.objects.filter(
+            user_id=user_id, day__gte=start, day__lte=end
+        ).values('category').annotate(amount=Sum('total'), transactions=Sum('count')).order_by(),
+        'report single pass': ExpenseDailyRollup.objects.filter(
+            user_id=user_id, day__gte=start - timedelta(days=31), day__lte=end
+        ).order_by('day').values_list('day', 'category', 'total', 'count'),
+        'analytics buckets with comparison': ExpenseDailyRollup.objects.filter(
+            Q(day__gte=start, day__lte=end) | Q(day__gte=start - timedelta(days=365), day__lte=end - timedelta(days=365)),
+            user_id=user_id, category__in=['food', 'transportation']
+        ).values_list('day', 'category', 'total', 'count'),
+        'spending cube build': User.objects.filter(pk=user_id).values_list(
+            'expense_version', 'daily_rollups__day', 'daily_rollups__category',
+            'daily_rollups__total', 'daily_rollups__count'
+        ),
+        'report top expenses': expenses.order_by('-amount')[:10].values('description', 'amount', 'category', 'date'),
+        'dashboard snapshot': ExpenseDailyRollup.objects.filter(
+            user_id=user_id, day__gte=min(start, month_start)
+        ).values('category').annotate(
+            month_total=Sum('total', filter=Q(day__gte=month_start)),
+            month_count=Sum('count', filter=Q(day__gte=month_start))
+        ).order_by(),
+        'dashboard cohort benchmark': CohortSpendingStats.objects.filter(
+            role='student', income_bracket__in=['unknown', 'all']
+        ),
+        'dashboard anomalies': ExpenseAnomaly.objects.filter(user_id=user_id).select_related('expense')[:5],
+        'expense category stats': ExpenseCategoryStats.objects.filter(
+            user_id__in=[user_id], category__in=['food']
+        ).order_by('user_id', 'category'),
+        'dashboard recent transactions': Expense.objects.filter(
+            user_id=user_id, date__gte=month_start
+        ).order_by('-date', '-created_at')[:5].values('description', 'amount', 'category', 'date'),
+        'chat spending query': expenses.filter(category='food').values('user_id').annotate(
+            total=Sum('amount'), count=Count('id'), average=Avg('amount'), largest=Max('amount')
+        ),
+        'chat history': ChatMessage.objects.filter(user_id=user_id)[:20],
+        'chat archive': ChatArchive.objects.filter(user_id=user_id).order_by('-period_start').values_list('id', flat=True),
+        'llm quota seed': quota_seed_calls(user_id).order_by(),
+    }
+
+
+def full_scans(plan):
+    """Tables the plan reads in full"""
+    tables = []
+    for pattern in FULL_SCAN_PATTERNS:
+        tables.extend(pattern.findall(plan))
+    return tables
+
+
+class Command(BaseCommand):
+    help = (
+        "EXPLAIN the per-user queries behind the API endpoints and fail if any of "
+        "them falls back to a full table scan. Run after schema or query changes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user-id', type=int, help='User to plan for (default: the first user)')
+        parser.add_argument('--verbose-plans', action='store_true', help='Print every plan, not just regressions')
+
+    def handle(self, *args, **options):
+        user_id = options['user_id'] or User.objects.order_by('pk').values_list('pk', flat=True).first() or 1
+        self.stdout.write(f"EXPLAIN on {connection.vendor} for user {user_id}")
+
+        regressions = []
+        for name, queryset in endpoint_queries(user_id).items():
+            plan = queryset.explain()
+            scans = full_scans(plan)
+            if scans:
+                regressions.append(name)
+                self.stdout.write(self.style.ERROR(f"✗ {name}: full scan of {', '.join(sorted(set(scans)))}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"✓ {name}"))
+            if scans or options['verbose_plans']:
+                self.stdout.write('    ' + plan.replace('\n', '\n    '))
+
+        if regressions:
+            raise CommandError(f"{len(regressions)} queries regressed to a full table scan")
+        self.stdout.write(self.style.SUCCESS("All endpoint queries use an index"))
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from core.fake_llm import FakeLLMConfig, make_server
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a deterministic OpenAI-compatible LLM stand-in for load and latency "
+        "testing. Start the API with OPENAI_BASE_URL=http://<host>:<port>/v1."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8001)
+        parser.add_argument('--latency-ms', type=float, default=300.0, help='Median response latency')
+        parser.add_argument(
+            '--latency-sigma', type=float, default=0.5,
+            help='Lognormal spread of the latency (0 = constant latency)'
+        )
+        parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with HTTP 500')
+        parser.add_argument('--seed', type=int, default=0, help='Seed for the latency/error sequence')
+
+    def handle(self, *args, **options):
+        config = FakeLLMConfig(
+            latency_ms=options['latency_ms'],
+            latency_sigma=options['latency_sigma'],
+            error_rate=options['error_rate'],
+            seed=options['seed']
+        )
+        server = make_server(options['host'], options['port'], config)
+        self.stdout.write(self.style.SUCCESS(
+            f"Fake LLM listening on http://{options['host']}:{options['port']}/v1 "
+            f"(median {options['latency_ms']:.0f} ms, sigma {options['latency_sigma']}, "
+            f"error rate {options['error_rate']:.0%}, seed {options['seed']})"
+        ))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,98 @@
+import asyncio
+import time
+
+import httpx
+from django.core.management.base import BaseCommand, CommandError
+
+
+ENDPOINTS = {
+    # Open-ended, so the local intent router escalates it to the LLM instead of answering it
+    'chat': ('POST', '/chat/', {
+        'message': 'Walk me through the trade-offs of renting versus buying a home in my situation.'
+    }),
+    'dashboard': ('GET', '/dashboard/', None),
+    'reports': ('POST', '/reports/', {'start_date': '2025-01-01', 'end_date': '2025-01-31'}),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Fire concurrent requests at a running server and report throughput and latency "
+        "per concurrency level. Run it once against the WSGI server and once against "
+        "uvicorn (ASYNC_AI_VIEWS=True) to compare how many in-flight LLM waits each holds."
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000/api', help='API base URL')
+        parser.add_argument('--email', help='Login email (used to obtain an access token)')
+        parser.add_argument('--password', help='Login password')
+        parser.add_argument('--token', help='Access token, instead of --email/--password')
+        parser.add_argument('--endpoint', choices=sorted(ENDPOINTS), default='chat')
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 10, 50, 100, 200])
+        parser.add_argument('--requests', type=int, default=200, help='Requests per concurrency level')
+        parser.add_argument('--timeout', type=float, default=120.0)
+    
+    def handle(self, *args, **options):
+        asyncio.run(self._run(options))
+    
+    async def _run(self, options):
+        base_url = options['url'].rstrip('/')
+        limits = httpx.Limits(max_connections=max(options['concurrency']))
+        
+        async with httpx.AsyncClient(base_url=base_url, timeout=options['timeout'], limits=limits) as client:
+            token = options['token'] or await self._login(client, options)
+            client.headers['Authorization'] = f'Bearer {token}'
+            method, path, body = ENDPOINTS[options['endpoint']]
+            
+            self.stdout.write(f"{method} {base_url}{path}, {options['requests']} requests per level")
+            self.stdout.write(f"{'concurrency':>11} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'errors':>7}")
+            
+            for concurrency in options['concurrency']:
+                latencies, errors, elapsed = await self._level(
+                    client, method, path, body, concurrency, options['requests']
+                )
+                latencies.sort()
+                if latencies:
+                    p50 = latencies[len(latencies) // 2]
+                    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+                    worst = latencies[-1]
+                else:
+                    p50 = p95 = worst = 0.0
+                self.stdout.write(
+                    f"{concurrency:>11} {options['requests'] / elapsed:>8.1f} "
+                    f"{p50 * 1000:>8.0f} {p95 * 1000:>8.0f} {worst * 1000:>8.0f} {errors:>7}"
+                )
+    
+    async def _login(self, client, options):
+        if not options['email'] or not options['password']:
+            raise CommandError('Provide --token or both --email and --password')
+        response = await client.post('/auth/login/', json={
+            'email': options['email'],
+            'password': options['password']
+        })
+        if response.status_code != 200:
+            raise CommandError(f'Login failed: {response.status_code} {response.text}')
+        return response.json()['tokens']['access']
+    
+    async def _level(self, client, method, path, body, concurrency, total):
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies = []
+        errors = 0
+        
+        async def one():
+            nonlocal errors
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    response = await client.request(method, path, json=body)
+                    ok = response.status_code < 400
+                except httpx.HTTPError:
+                    ok = False
+                if ok:
+                    latencies.append(time.perf_counter() - started)
+                else:
+                    errors += 1
+        
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        return latencies, errors, time.perf_counter() - started
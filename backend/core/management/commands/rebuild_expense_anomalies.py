@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from core.anomalies import rebuild_anomalies
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the per-category expense statistics and re-flag unusual amounts and "
+        "duplicate charges across all historical expenses."
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--user-id', type=int, help='Rebuild a single user (default: everyone)')
+        parser.add_argument('--batch-size', type=int, default=1000)
+    
+    def handle(self, *args, **options):
+        stats, flags = rebuild_anomalies(options['user_id'], batch_size=options['batch_size'])
+        scope = f"user {options['user_id']}" if options['user_id'] else "all users"
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {stats} category statistics and {flags} anomaly flags for {scope}"
+        ))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.rollups import find_rollup_drift, rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the daily and monthly expense rollups from the raw Expense rows. "
+        "Only needed after writes that bypassed the ORM (raw SQL, fixtures); "
+        "--check only reports the rows that drifted."
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--user-id', type=int, help='Rebuild a single user (default: everyone)')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--check', action='store_true', help='Compare with the Expense rows without writing')
+    
+    def handle(self, *args, **options):
+        if options['check']:
+            drift = find_rollup_drift(options['user_id'])
+            for level, (user_id, period, category), (total, count), (actual_total, actual_count) in drift:
+                self.stdout.write(
+                    f"{level} user {user_id} {period} {category}: rollup {total}/{count}, "
+                    f"expenses {actual_total}/{actual_count}"
+                )
+            if drift:
+                raise CommandError(f"{len(drift)} rollup rows drifted; rerun without --check to rebuild")
+            self.stdout.write(self.style.SUCCESS("Rollups match the expenses"))
+            return
+        
+        daily, monthly = rebuild_rollups(options['user_id'], batch_size=options['batch_size'])
+        scope = f"user {options['user_id']}" if options['user_id'] else "all users"
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {daily} daily and {monthly} monthly rollup rows for {scope}"
+        ))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from core.cohorts import benchmark_window, refresh_cohort_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the per-role, per-income-bracket spending percentiles shown on the "
+        "dashboard. Run nightly (e.g. from cron)."
+    )
+    
+    def handle(self, *args, **options):
+        start, end = benchmark_window()
+        cohorts = refresh_cohort_stats()
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored spending percentiles for {cohorts} cohorts ({start} to {end})"
+        ))
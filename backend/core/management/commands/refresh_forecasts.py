@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from core.forecasts import refresh_forecasts
+
+
+class Command(BaseCommand):
+    help = (
+        "Refit every user's month-end and next-month spending forecast (per category, "
+        "with 80% intervals) shown on the dashboard. Run nightly (e.g. from cron)."
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000, help='Users fitted per query')
+    
+    def handle(self, *args, **options):
+        stored = refresh_forecasts(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Stored spending forecasts for {stored} users"))
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.report_jobs import requeue_stale_jobs, run_pending_jobs
+
+
+class Command(BaseCommand):
+    help = (
+        "Render queued report jobs to CSV/XLSX/PDF files. Use with "
+        "REPORT_JOBS_IN_PROCESS=False to keep rendering out of the web workers."
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Process the current queue and exit')
+        parser.add_argument('--poll-interval', type=float, default=2.0, help='Seconds between queue checks')
+        parser.add_argument(
+            '--stale-minutes', type=int, default=60,
+            help='Requeue jobs that have been running longer than this (their worker died)'
+        )
+    
+    def handle(self, *args, **options):
+        while True:
+            requeued = requeue_stale_jobs(options['stale_minutes'])
+            if requeued:
+                self.stdout.write(f"Requeued {requeued} stale jobs")
+            processed = run_pending_jobs()
+            if processed:
+                self.stdout.write(f"Processed {processed} report jobs")
+            if options['once']:
+                break
+            time.sleep(options['poll_interval'])
@@ -0,0 +1,161 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+
+from .models import ChatMessage, ConversationMemory
+
+# Turns kept verbatim for anti-repetition checks (matches the old last-5 lookup)
+MEMORY_TURNS = 5
+SNIPPET_LENGTH = 120
+RESPONSE_HEAD_LENGTH = 80
+
+# Topic flags the personalized responses vary on
+TOPIC_KEYWORDS = {
+    'savings': ['save', 'saving'],
+    'investing': ['invest'],
+    'budget': ['spend', 'budget'],
+}
+
+
+def _cache_key(user_id):
+    return f'conversation_memory:{user_id}'
+
+
+def _message_topics(message):
+    message_lower = message.lower()
+    return [topic for topic, words in TOPIC_KEYWORDS.items() if any(word in message_lower for word in words)]
+
+
+def _snippet(text, length):
+    text = ' '.join(text.split())
+    return text if len(text) <= length else text[:length - 1] + '…'
+
+
+def add_turn(memory, message, response):
+    """Fold one exchange into the memory; constant cost regardless of history length"""
+    topics = _message_topics(message)
+    for topic in topics:
+        memory.topic_counts[topic] = memory.topic_counts.get(topic, 0) + 1
+
+    memory.recent_turns = (memory.recent_turns + [{
+        'message': _snippet(message, SNIPPET_LENGTH),
+        'response_head': response[:RESPONSE_HEAD_LENGTH],
+        'topics': topics,
+    }])[-MEMORY_TURNS:]
+    memory.message_count += 1
+    memory.summary = build_summary(memory)
+
+
+def build_summary(memory):
+    """Compact text summary of the conversation for the LLM prompt"""
+    if not memory.message_count:
+        return ''
+    parts = [f"{memory.message_count} previous messages."]
+    if memory.topic_counts:
+        topics = sorted(memory.topic_counts.items(), key=lambda item: item[1], reverse=True)
+        parts.append("Topics discussed: " + ", ".join(f"{topic} ({count}x)" for topic, count in topics) + ".")
+    recent = [turn['message'] for turn in memory.recent_turns[-3:]]
+    if recent:
+        parts.append("Recent questions: " + " | ".join(f'"{message}"' for message in recent))
+    return ' '.join(parts)
+
+
+def asked_before(memory, topic):
+    """Whether the topic came up in the recent turns"""
+    return any(topic in turn['topics'] for turn in memory.recent_turns)
+
+
+def recent_response_heads(memory):
+    return [turn['response_head'] for turn in memory.recent_turns]
+
+
+def _seed(user, exclude_pk=None):
+    """An unsaved memory built from the user's existing chat history"""
+    memory = ConversationMemory(user=user)
+    history = ChatMessage.objects.filter(user=user)
+    if exclude_pk is not None:
+        history = history.exclude(pk=exclude_pk)
+    recent_chats = list(history.order_by('-created_at')[:MEMORY_TURNS])
+    for chat in reversed(recent_chats):
+        add_turn(memory, chat.message, chat.response)
+    if recent_chats:
+        memory.message_count = history.count()
+        memory.summary = build_summary(memory)
+    return memory
+
+
+def _create(memory):
+    """Insert a seeded memory; returns the row another request inserted first, if one did"""
+    try:
+        with transaction.atomic():
+            memory.save(force_insert=True)
+        return memory
+    except IntegrityError:
+        return ConversationMemory.objects.get(user_id=memory.user_id)
+
+
+def _load(user, exclude_pk=None):
+    memory = ConversationMemory.objects.filter(user=user).first()
+    if memory is not None:
+        return memory
+
+    # First use for this user: seed from the existing chat history once
+    memory = _seed(user, exclude_pk)
+    if memory.message_count:
+        memory = _create(memory)
+    return memory
+
+
+def _store(memory):
+    # Cache plain fields rather than the instance so the related user isn't pickled along
+    cache.set(_cache_key(memory.user_id), {
+        'pk': memory.pk,
+        'summary': memory.summary,
+        'topic_counts': memory.topic_counts,
+        'recent_turns': memory.recent_turns,
+        'message_count': memory.message_count,
+    }, getattr(settings, 'CONVERSATION_MEMORY_CACHE_TIMEOUT', 3600))
+
+
+def _get(user, exclude_pk=None):
+    data = cache.get(_cache_key(user.pk))
+    if data is None:
+        memory = _load(user, exclude_pk)
+        _store(memory)
+        return memory
+
+    memory = ConversationMemory(
+        pk=data['pk'],
+        user=user,
+        summary=data['summary'],
+        topic_counts=data['topic_counts'],
+        recent_turns=data['recent_turns'],
+        message_count=data['message_count']
+    )
+    memory._state.adding = data['pk'] is None
+    return memory
+
+
+def get_conversation_memory(user):
+    """Return the user's conversation memory from cache, falling back to the database.
+
+    Only for reads: the cache is per process by default, so it can lag turns that
+    another worker recorded until it expires.
+    """
+    return _get(user)
+
+
+def record_chat_message(chat_message):
+    """Update and persist the memory for a newly saved ChatMessage.
+
+    The turn is added to the locked database row, never to a cached copy, so turns
+    recorded concurrently by other requests or workers are not overwritten.
+    """
+    with transaction.atomic():
+        memory = ConversationMemory.objects.select_for_update().filter(user_id=chat_message.user_id).first()
+        if memory is None:
+            _create(_seed(chat_message.user, exclude_pk=chat_message.pk))
+            memory = ConversationMemory.objects.select_for_update().get(user_id=chat_message.user_id)
+        add_turn(memory, chat_message.message, chat_message.response)
+        memory.save()
+        transaction.on_commit(lambda: _store(memory))
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-19 09:12
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_alter_user_username'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConversationMemory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('summary', models.TextField(blank=True, default='')),
+                ('topic_counts', models.JSONField(default=dict)),
+                ('recent_turns', models.JSONField(default=list)),
+                ('message_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='conversation_memory', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:05
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_conversationmemory'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['user', '-created_at'], name='core_chat_user_created_idx'),
+        ),
+        migrations.CreateModel(
+            name='ChatArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period_start', models.DateTimeField()),
+                ('period_end', models.DateTimeField()),
+                ('message_count', models.PositiveIntegerField()),
+                ('codec', models.CharField(choices=[('zstd', 'Zstandard'), ('gzip', 'Gzip')], max_length=10)),
+                ('data', models.BinaryField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chat_archives', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-period_start'],
+                'indexes': [models.Index(fields=['user', '-period_start'], name='core_archive_user_period_idx')],
+            },
+        ),
+    ]
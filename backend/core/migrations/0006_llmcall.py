@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:20
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_chatarchive_chatmessage_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LLMCall',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('method', models.CharField(max_length=50)),
+                ('prompt_tokens', models.PositiveIntegerField(default=0)),
+                ('completion_tokens', models.PositiveIntegerField(default=0)),
+                ('latency_ms', models.PositiveIntegerField(default=0)),
+                ('outcome', models.CharField(choices=[('success', 'Success'), ('error', 'Error'), ('over_quota', 'Over Quota')], max_length=20)),
+                ('used_fallback', models.BooleanField(default=False)),
+                ('error', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='llm_calls', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['user', 'created_at'], name='core_llmcall_user_created_idx'), models.Index(fields=['method', 'created_at'], name='core_llmcall_method_idx')],
+            },
+        ),
+    ]
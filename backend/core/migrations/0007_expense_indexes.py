@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_llmcall'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['user', 'date', 'category', 'amount'], name='core_exp_user_date_cat_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['user', '-date', '-created_at'], name='core_exp_user_date_created_idx'),
+        ),
+    ]
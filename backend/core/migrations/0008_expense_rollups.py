@@ -0,0 +1,88 @@
+# Generated by Django 4.2.7 on 2026-10-19 12:10
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+import django.db.models.deletion
+
+
+def populate_rollups(apps, schema_editor):
+    Expense = apps.get_model('core', 'Expense')
+    ExpenseDailyRollup = apps.get_model('core', 'ExpenseDailyRollup')
+    ExpenseMonthlyRollup = apps.get_model('core', 'ExpenseMonthlyRollup')
+
+    daily = []
+    monthly = defaultdict(lambda: [Decimal('0'), 0])
+    for row in Expense.objects.order_by().values('user_id', 'date', 'category').annotate(
+        amount=Sum('amount'), transactions=Count('id')
+    ).iterator():
+        daily.append(ExpenseDailyRollup(
+            user_id=row['user_id'], day=row['date'], category=row['category'],
+            total=row['amount'], count=row['transactions']
+        ))
+        month = monthly[(row['user_id'], row['date'].replace(day=1), row['category'])]
+        month[0] += row['amount']
+        month[1] += row['transactions']
+
+    ExpenseDailyRollup.objects.bulk_create(daily, batch_size=1000)
+    ExpenseMonthlyRollup.objects.bulk_create([
+        ExpenseMonthlyRollup(user_id=user, month=month, category=category, total=total, count=count)
+        for (user, month, category), (total, count) in monthly.items()
+    ], batch_size=1000)
+
+
+CATEGORY_CHOICES = [
+    ('food', 'Food & Dining'), ('transportation', 'Transportation'), ('shopping', 'Shopping'),
+    ('entertainment', 'Entertainment'), ('bills', 'Bills & Utilities'), ('healthcare', 'Healthcare'),
+    ('education', 'Education'), ('travel', 'Travel'), ('groceries', 'Groceries'), ('other', 'Other'),
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_expense_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExpenseDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('category', models.CharField(choices=CATEGORY_CHOICES, max_length=20)),
+                ('total', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14)),
+                ('count', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-day'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ExpenseMonthlyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('category', models.CharField(choices=CATEGORY_CHOICES, max_length=20)),
+                ('total', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14)),
+                ('count', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-month'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='expensedailyrollup',
+            constraint=models.UniqueConstraint(fields=('user', 'day', 'category'), name='core_daily_rollup_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='expensemonthlyrollup',
+            constraint=models.UniqueConstraint(fields=('user', 'month', 'category'), name='core_monthly_rollup_unique'),
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 12:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_expense_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='expense_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
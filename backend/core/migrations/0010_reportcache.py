@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-19 13:25
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_user_expense_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField()),
+                ('schema_version', models.PositiveSmallIntegerField()),
+                ('data_version', models.PositiveIntegerField()),
+                ('report', models.JSONField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='report_cache', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='reportcache',
+            constraint=models.UniqueConstraint(fields=('user', 'start_date', 'end_date', 'schema_version'), name='core_report_cache_unique'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_reportjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CohortSpendingStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('role', models.CharField(choices=[('student', 'Student'), ('freelancer', 'Freelancer'), ('teacher', 'Teacher'), ('professional', 'IT Professional')], max_length=20)),
+                ('income_bracket', models.CharField(max_length=20)),
+                ('category', models.CharField(max_length=20)),
+                ('period_start', models.DateField()),
+                ('period_end', models.DateField()),
+                ('user_count', models.PositiveIntegerField()),
+                ('p25', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('p50', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('p75', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('p90', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('quantiles', models.JSONField(default=list)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='cohortspendingstats',
+            constraint=models.UniqueConstraint(fields=('role', 'income_bracket', 'category'), name='core_cohort_stats_unique'),
+        ),
+    ]
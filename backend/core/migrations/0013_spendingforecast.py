@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_cohortspendingstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpendingForecast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('as_of', models.DateField()),
+                ('month', models.DateField()),
+                ('month_to_date', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('monthly_level', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('monthly_sigma', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('month_end_expected', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('month_end_low', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('month_end_high', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('next_month_expected', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('next_month_low', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('next_month_high', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('categories', models.JSONField(default=dict)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='spending_forecast', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
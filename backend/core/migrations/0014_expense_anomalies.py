@@ -0,0 +1,53 @@
+# Generated by Django 4.2.7 on 2026-10-19 16:05
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_spendingforecast'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExpenseCategoryStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(choices=[('food', 'Food & Dining'), ('transportation', 'Transportation'), ('shopping', 'Shopping'), ('entertainment', 'Entertainment'), ('bills', 'Bills & Utilities'), ('healthcare', 'Healthcare'), ('education', 'Education'), ('travel', 'Travel'), ('groceries', 'Groceries'), ('other', 'Other')], max_length=20)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('mean', models.FloatField(default=0)),
+                ('m2', models.FloatField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='category_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ExpenseAnomaly',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('amount', 'Unusually Large Amount'), ('duplicate', 'Possible Duplicate Charge')], max_length=20)),
+                ('score', models.FloatField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('duplicate_of', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.expense')),
+                ('expense', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='anomalies', to='core.expense')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='expense_anomalies', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='expensecategorystats',
+            constraint=models.UniqueConstraint(fields=('user', 'category'), name='core_category_stats_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='expenseanomaly',
+            constraint=models.UniqueConstraint(fields=('expense', 'kind'), name='core_anomaly_unique'),
+        ),
+        migrations.AddIndex(
+            model_name='expenseanomaly',
+            index=models.Index(fields=['user', '-created_at'], name='core_anomaly_user_idx'),
+        ),
+    ]
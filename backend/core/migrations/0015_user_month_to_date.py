@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-19 16:30
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_expense_anomalies'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='mtd_month',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='mtd_total',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0'), editable=False, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='mtd_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-19 16:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_user_month_to_date'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['user', '-date', '-created_at', '-id'], name='core_exp_user_keyset_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='expense',
+            name='core_exp_user_date_created_idx',
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:40
+
+from datetime import timedelta
+
+from django.db import migrations, models
+
+
+def fill_depends_from(apps, schema_editor):
+    ReportCache = apps.get_model('core', 'ReportCache')
+    for entry in ReportCache.objects.only('start_date', 'end_date').iterator():
+        entry.depends_from = entry.start_date - timedelta(days=(entry.end_date - entry.start_date).days + 1)
+        entry.save(update_fields=['depends_from'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_expense_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reportcache',
+            name='depends_from',
+            field=models.DateField(null=True),
+        ),
+        migrations.RunPython(fill_depends_from, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='reportcache',
+            name='depends_from',
+            field=models.DateField(),
+        ),
+    ]
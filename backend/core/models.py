@@ -1,8 +1,21 @@
+from collections import namedtuple
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import models, transaction
 from django.core.validators import MinValueValidator
+from django.dispatch import Signal
 from decimal import Decimal
 
+# Sent inside the writing transaction whenever Expense rows are created, updated or
+# deleted, through any path (save, delete, bulk_create, bulk_update, queryset
+# update/delete). ``removed`` and ``added`` are lists of ExpenseChange rows: an
+# update removes the old values and adds the new ones. Receivers that raise roll
+# the write back, so derived data (rollups, counters) never drifts from Expense.
+expenses_changed = Signal()
+
+EXPENSE_CHANGE_FIELDS = ('id', 'user_id', 'date', 'category', 'amount')
+ExpenseChange = namedtuple('ExpenseChange', EXPENSE_CHANGE_FIELDS)
+EXPENSE_TRACKED_FIELDS = {'user', 'user_id', 'date', 'category', 'amount'}
+
 class User(AbstractUser):
     ROLE_CHOICES = [
         ('student', 'Student'),
@@ -24,14 +37,79 @@ class User(AbstractUser):
     )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Bumped in the same transaction as every Expense write; in-memory caches of the
+    # user's spending compare it with the version they were built from
+    expense_version = models.PositiveIntegerField(default=0, editable=False)
+    # Month-to-date spend, kept current with F() updates on every Expense write dated in
+    # ``mtd_month`` and rolled over on first use in a new month; see core/budget.py
+    mtd_month = models.DateField(null=True, blank=True, editable=False)
+    mtd_total = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'), editable=False)
+    mtd_count = models.IntegerField(default=0, editable=False)
 
     # Use email as the username field for authentication
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username']
 
+    # Only ever written with F() updates; see save()
+    COUNTER_FIELDS = ('expense_version', 'mtd_month', 'mtd_total', 'mtd_count')
+
     def __str__(self):
         return f"{self.email} ({self.role})"
 
+    def save(self, *args, **kwargs):
+        # A full save from a stale instance (e.g. a profile edit) must not roll the counters back
+        if not self._state.adding and self.pk is not None and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+class ExpenseQuerySet(models.QuerySet):
+    def change_rows(self):
+        return [ExpenseChange(*values) for values in self.order_by().values_list(*EXPENSE_CHANGE_FIELDS)]
+
+    def _send_changes(self, removed, added):
+        if removed or added:
+            expenses_changed.send(sender=self.model, removed=removed, added=added)
+
+    def bulk_create(self, objs, *args, **kwargs):
+        with transaction.atomic(using=self.db):
+            objs = super().bulk_create(objs, *args, **kwargs)
+            self._send_changes([], [obj.change_row() for obj in objs])
+        return objs
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = list(objs)
+        if not EXPENSE_TRACKED_FIELDS.intersection(fields):
+            return super().bulk_update(objs, fields, *args, **kwargs)
+        with transaction.atomic(using=self.db):
+            changed = self.model.objects.using(self.db).filter(pk__in=[obj.pk for obj in objs])
+            removed = changed.select_for_update().change_rows()
+            # Django runs each batch through filter().update(); on a plain QuerySet that
+            # skips update() above, so the whole call signals once instead of twice
+            rows = models.QuerySet(self.model, using=self.db).bulk_update(objs, fields, *args, **kwargs)
+            self._send_changes(removed, changed.change_rows())
+        return rows
+
+    def update(self, **kwargs):
+        if not EXPENSE_TRACKED_FIELDS.intersection(kwargs):
+            return super().update(**kwargs)
+        with transaction.atomic(using=self.db):
+            removed = self.select_for_update().change_rows()
+            rows = super().update(**kwargs)
+            changed = self.model.objects.using(self.db).filter(pk__in=[row.id for row in removed])
+            self._send_changes(removed, changed.change_rows())
+        return rows
+
+    def delete(self):
+        with transaction.atomic(using=self.db):
+            removed = self.change_rows()
+            result = super().delete()
+            self._send_changes(removed, [])
+        return result
+
+
 class Expense(models.Model):
     CATEGORY_CHOICES = [
         ('food', 'Food & Dining'),
@@ -59,12 +137,244 @@ class Expense(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ExpenseQuerySet.as_manager()
+
     class Meta:
         ordering = ['-date', '-created_at']
+        indexes = [
+            # Date-range aggregates by category; amount is a trailing key column so the
+            # index covers them on every backend (INCLUDE is PostgreSQL-only)
+            models.Index(fields=['user', 'date', 'category', 'amount'], name='core_exp_user_date_cat_idx'),
+            # Listing order within a user; id breaks ties for the expenses list's keyset cursor
+            models.Index(fields=['user', '-date', '-created_at', '-id'], name='core_exp_user_keyset_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.description} - ${self.amount}"
 
+    def change_row(self):
+        # Callers may assign strings (PDF import, request data); normalize like a DB round trip would
+        return ExpenseChange(
+            self.pk,
+            self.user_id,
+            self._meta.get_field('date').to_python(self.date),
+            self.category,
+            self._meta.get_field('amount').to_python(self.amount)
+        )
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            removed = []
+            if not self._state.adding and self.pk is not None:
+                removed = Expense.objects.filter(pk=self.pk).select_for_update().change_rows()
+            super().save(*args, **kwargs)
+            expenses_changed.send(sender=Expense, removed=removed, added=[self.change_row()])
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            removed = Expense.objects.filter(pk=self.pk).change_rows()
+            result = super().delete(*args, **kwargs)
+            expenses_changed.send(sender=Expense, removed=removed, added=[])
+        return result
+
+
+class ExpenseDailyRollup(models.Model):
+    """Per-user, per-day, per-category expense total, maintained on every Expense write"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_rollups')
+    day = models.DateField()
+    category = models.CharField(max_length=20, choices=Expense.CATEGORY_CHOICES)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'))
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['-day']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'day', 'category'], name='core_daily_rollup_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.day} - {self.category}: {self.total}"
+
+class ExpenseMonthlyRollup(models.Model):
+    """Per-user, per-month, per-category expense total; month is the first day of the month"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='monthly_rollups')
+    month = models.DateField()
+    category = models.CharField(max_length=20, choices=Expense.CATEGORY_CHOICES)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'))
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['-month']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'month', 'category'], name='core_monthly_rollup_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.month:%Y-%m} - {self.category}: {self.total}"
+
+class ExpenseCategoryStats(models.Model):
+    """Running count, mean and sum of squared deviations (Welford) of a user's amounts in one category.
+
+    Updated in the same transaction as every Expense write; the insert-time
+    anomaly check scores new amounts against it.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='category_stats')
+    category = models.CharField(max_length=20, choices=Expense.CATEGORY_CHOICES)
+    count = models.PositiveIntegerField(default=0)
+    mean = models.FloatField(default=0)
+    m2 = models.FloatField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'category'], name='core_category_stats_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.category}: mean {self.mean:.2f} over {self.count}"
+
+class ExpenseAnomaly(models.Model):
+    """An expense flagged as unusual for its user"""
+    KIND_CHOICES = [
+        ('amount', 'Unusually Large Amount'),
+        ('duplicate', 'Possible Duplicate Charge'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='expense_anomalies')
+    expense = models.ForeignKey(Expense, on_delete=models.CASCADE, related_name='anomalies')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    # z-score of the amount against the user's category history ('amount' flags)
+    score = models.FloatField(default=0)
+    duplicate_of = models.ForeignKey(
+        Expense, on_delete=models.CASCADE, null=True, blank=True, related_name='+'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['expense', 'kind'], name='core_anomaly_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='core_anomaly_user_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.kind}: expense {self.expense_id}"
+
+class CohortSpendingStats(models.Model):
+    """Distribution of average monthly spend across one role × income bracket cohort.
+
+    Recomputed in bulk by ``refresh_cohort_stats``; ``category`` is an Expense
+    category or 'total'. ``quantiles`` holds the 0th..100th percentiles so a
+    user's own percentile is a lookup, not a scan over everyone's expenses.
+    """
+    role = models.CharField(max_length=20, choices=User.ROLE_CHOICES)
+    income_bracket = models.CharField(max_length=20)
+    category = models.CharField(max_length=20)
+    period_start = models.DateField()
+    period_end = models.DateField()
+    user_count = models.PositiveIntegerField()
+    p25 = models.DecimalField(max_digits=14, decimal_places=2)
+    p50 = models.DecimalField(max_digits=14, decimal_places=2)
+    p75 = models.DecimalField(max_digits=14, decimal_places=2)
+    p90 = models.DecimalField(max_digits=14, decimal_places=2)
+    quantiles = models.JSONField(default=list)
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['role', 'income_bracket', 'category'], name='core_cohort_stats_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.role}/{self.income_bracket}/{self.category}: p50 {self.p50} ({self.user_count} users)"
+
+class SpendingForecast(models.Model):
+    """A user's projected spend for the rest of ``month`` and the month after.
+
+    Refreshed in batch by ``refresh_forecasts``. ``monthly_level`` and
+    ``monthly_sigma`` are the fitted full-month spend and its error, so the
+    month-end projection can be redone against the live month-to-date total;
+    ``categories`` holds the same figures per category.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='spending_forecast')
+    as_of = models.DateField()
+    month = models.DateField()
+    month_to_date = models.DecimalField(max_digits=14, decimal_places=2)
+    monthly_level = models.DecimalField(max_digits=14, decimal_places=2)
+    monthly_sigma = models.DecimalField(max_digits=14, decimal_places=2)
+    month_end_expected = models.DecimalField(max_digits=14, decimal_places=2)
+    month_end_low = models.DecimalField(max_digits=14, decimal_places=2)
+    month_end_high = models.DecimalField(max_digits=14, decimal_places=2)
+    next_month_expected = models.DecimalField(max_digits=14, decimal_places=2)
+    next_month_low = models.DecimalField(max_digits=14, decimal_places=2)
+    next_month_high = models.DecimalField(max_digits=14, decimal_places=2)
+    categories = models.JSONField(default=dict)
+    computed_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user.username} - {self.month:%Y-%m}: {self.month_end_expected}"
+
+class ReportCache(models.Model):
+    """A generated report (AI summary included) for a closed period.
+
+    Deleted in the same transaction as any Expense write dated from ``depends_from``
+    (the start of the previous period the trend compares with) to ``end_date``;
+    ``data_version`` is the user's expense_version the report was computed from.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='report_cache')
+    start_date = models.DateField()
+    end_date = models.DateField()
+    depends_from = models.DateField()
+    schema_version = models.PositiveSmallIntegerField()
+    data_version = models.PositiveIntegerField()
+    report = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'start_date', 'end_date', 'schema_version'],
+                name='core_report_cache_unique'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.start_date} to {self.end_date} (v{self.schema_version})"
+
+class ReportJob(models.Model):
+    """A long-range report rendered to downloadable files by the report worker"""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='report_jobs')
+    start_date = models.DateField()
+    end_date = models.DateField()
+    formats = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    rows_total = models.PositiveIntegerField(default=0)
+    rows_done = models.PositiveIntegerField(default=0)
+    # {format: {'path': ..., 'size': ...}}, filled in as the job finishes
+    artifacts = models.JSONField(default=dict)
+    error = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='core_reportjob_status_idx'),
+            models.Index(fields=['user', '-created_at'], name='core_reportjob_user_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.start_date} to {self.end_date} ({self.status})"
+
 class ChatMessage(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chat_messages')
     message = models.TextField()
@@ -73,6 +383,73 @@ class ChatMessage(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='core_chat_user_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.created_at.strftime('%Y-%m-%d %H:%M')}"
+
+class ChatArchive(models.Model):
+    """Compressed JSON-lines blob of ChatMessages moved out of the hot table"""
+    CODEC_CHOICES = [
+        ('zstd', 'Zstandard'),
+        ('gzip', 'Gzip'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chat_archives')
+    period_start = models.DateTimeField()
+    period_end = models.DateTimeField()
+    message_count = models.PositiveIntegerField()
+    codec = models.CharField(max_length=10, choices=CODEC_CHOICES)
+    data = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-period_start']
+        indexes = [
+            models.Index(fields=['user', '-period_start'], name='core_archive_user_period_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.message_count} messages from {self.period_start.strftime('%Y-%m-%d')}"
+
+class ConversationMemory(models.Model):
+    """Rolling per-user chat memory, updated as each ChatMessage is saved"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='conversation_memory')
+    summary = models.TextField(blank=True, default='')
+    topic_counts = models.JSONField(default=dict)
+    recent_turns = models.JSONField(default=list)
+    message_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user.username} - {self.message_count} messages"
+
+class LLMCall(models.Model):
+    """Ledger entry for one FinanceAI call to the LLM provider"""
+    OUTCOME_CHOICES = [
+        ('success', 'Success'),
+        ('error', 'Error'),
+        ('over_quota', 'Over Quota'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='llm_calls')
+    method = models.CharField(max_length=50)
+    prompt_tokens = models.PositiveIntegerField(default=0)
+    completion_tokens = models.PositiveIntegerField(default=0)
+    latency_ms = models.PositiveIntegerField(default=0)
+    outcome = models.CharField(max_length=20, choices=OUTCOME_CHOICES)
+    used_fallback = models.BooleanField(default=False)
+    error = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', 'created_at'], name='core_llmcall_user_created_idx'),
+            models.Index(fields=['method', 'created_at'], name='core_llmcall_method_idx'),
+        ]
 
     def __str__(self):
-        return f"{self.user.username} - {self.created_at.strftime('%Y-%m-%d %H:%M')}"
\ No newline at end of file
+        return f"{self.method} - {self.outcome} - {self.latency_ms}ms"
\ No newline at end of file
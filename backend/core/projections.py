@@ -0,0 +1,132 @@
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Illustrative (annual expected return, annual volatility) per risk level. These are
+# long-run ballpark figures for the product types FinanceAI suggests, not forecasts.
+RISK_TEMPLATES = {
+    'no_risk': (0.04, 0.0),
+    'very_low': (0.06, 0.01),
+    'low': (0.08, 0.05),
+    'low_moderate': (0.09, 0.09),
+    'moderate': (0.10, 0.14),
+    'moderate_high': (0.11, 0.18),
+    'high': (0.12, 0.25),
+}
+
+HORIZONS_MONTHS = {'1y': 12, '5y': 60, '10y': 120}
+PERCENTILES = (10, 50, 90)
+PATHS = 10000
+SEED = 20240101
+CACHE_SIZE = 512
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def risk_template(risk_level):
+    """Map a free-text risk level ("Low to Moderate", "High") to a template key"""
+    text = (risk_level or '').lower()
+    if 'no risk' in text or text == 'none':
+        return 'no_risk'
+    if 'very low' in text:
+        return 'very_low'
+    if 'low' in text and 'moderate' in text:
+        return 'low_moderate'
+    if 'moderate' in text and 'high' in text:
+        return 'moderate_high'
+    for key in ('high', 'moderate', 'low'):
+        if key in text:
+            return key
+    return 'moderate'
+
+
+def parse_amount(text):
+    """First rupee amount in strings like "₹2,000-4,000" or "₹500/month"; None if absent"""
+    match = re.search(r'(\d[\d,]*(?:\.\d+)?)', str(text or ''))
+    if not match:
+        return None
+    amount = float(match.group(1).replace(',', ''))
+    return amount if amount > 0 else None
+
+
+def simulate(templates, monthly_amounts, paths=PATHS, seed=SEED):
+    """Monte Carlo balances for monthly contributions, all ideas and horizons in one pass.
+
+    Returns an array of shape (len(templates), len(HORIZONS_MONTHS), len(PERCENTILES)).
+    Monthly log-returns are drawn once and shared across ideas (common random
+    numbers), so ideas are compared on the same market paths. The balance after
+    T months of contributing C at the start of each month is
+    C * G_T * sum_{s<T} 1/G_s, where G_t is the cumulative growth factor, which
+    turns the contribution recursion into two cumulative sums.
+    """
+    months = max(HORIZONS_MONTHS.values())
+    mu = np.array([RISK_TEMPLATES[template][0] for template in templates])
+    sigma = np.array([RISK_TEMPLATES[template][1] for template in templates])
+    amounts = np.asarray(monthly_amounts, dtype=np.float64)
+
+    # Lognormal monthly returns with the template's annual mean and volatility.
+    # Cumulative log-growth is drift * t + sigma * W_t, where the random walk W is
+    # shared by every idea, so only one set of shocks is drawn and summed.
+    monthly_sigma = (sigma / np.sqrt(12)).astype(np.float32)
+    monthly_drift = (np.log1p(mu) / 12).astype(np.float32) - monthly_sigma ** 2 / 2
+    shocks = np.random.default_rng(seed).standard_normal((paths, months), dtype=np.float32)
+    walk = np.cumsum(shocks, axis=1)
+    elapsed = np.arange(1, months + 1, dtype=np.float32)
+
+    log_growth = (monthly_drift[:, None, None] * elapsed[None, None, :]
+                  + monthly_sigma[:, None, None] * walk[None, :, :])   # log G_1..G_T
+    inverse_prior = np.empty_like(log_growth)                         # 1/G_0..1/G_{T-1}
+    inverse_prior[:, :, 0] = 1.0
+    np.exp(-log_growth[:, :, :-1], out=inverse_prior[:, :, 1:])
+    horizon_index = np.array(list(HORIZONS_MONTHS.values())) - 1
+    balances = (
+        amounts[:, None, None]
+        * np.exp(log_growth[:, :, horizon_index], dtype=np.float64)
+        * np.cumsum(inverse_prior, axis=2, dtype=np.float64)[:, :, horizon_index]
+    )                                                                 # (ideas, paths, horizons)
+
+    return np.percentile(balances, PERCENTILES, axis=1).transpose(1, 2, 0)
+
+
+def project_ideas(ideas, default_monthly_amount):
+    """Attach a p10/p50/p90 projection to each investment idea (in place) and return them.
+
+    Results are cached per (risk template, monthly amount); only uncached
+    combinations are simulated, together in a single array computation.
+    """
+    keys = []
+    for idea in ideas:
+        amount = parse_amount(idea.get('min_investment')) or default_monthly_amount
+        keys.append((risk_template(idea.get('risk_level')), round(float(amount or 0), 2)))
+
+    with _cache_lock:
+        missing = [key for key in dict.fromkeys(keys) if key not in _cache and key[1] > 0]
+    if missing:
+        results = simulate([key[0] for key in missing], [key[1] for key in missing])
+        with _cache_lock:
+            for key, result in zip(missing, results):
+                _cache[key] = {
+                    horizon: {
+                        f'p{percentile}': round(float(result[h][p]), 2)
+                        for p, percentile in enumerate(PERCENTILES)
+                    }
+                    for h, horizon in enumerate(HORIZONS_MONTHS)
+                }
+                while len(_cache) > CACHE_SIZE:
+                    _cache.popitem(last=False)
+
+    with _cache_lock:
+        for idea, (template, amount) in zip(ideas, keys):
+            projection = _cache.get((template, amount))
+            if projection is not None:
+                _cache.move_to_end((template, amount))
+                idea['projection'] = {
+                    'monthly_amount': amount,
+                    'risk_template': template,
+                    'expected_annual_return': RISK_TEMPLATES[template][0],
+                    'balances': projection,
+                }
+    return ideas
@@ -0,0 +1,91 @@
+from collections import defaultdict
+from datetime import date, timedelta
+
+from django.db import transaction
+from django.db.models import Q
+
+from .models import ReportCache, User
+
+# Bump whenever the report layout changes, so older cached reports stop matching
+REPORT_SCHEMA_VERSION = 1
+# Past this many distinct dates in one write, invalidate the envelope instead
+MAX_INVALIDATION_DATES = 50
+
+
+def is_cacheable(end_date):
+    """Only closed periods are deterministic; today's report can still change"""
+    return end_date < date.today()
+
+
+def previous_period_start(start_date, end_date):
+    """Start of the same-length period before a report's, which its spending trend compares
+    with; the earliest expense date the report reads"""
+    return start_date - timedelta(days=(end_date - start_date).days + 1)
+
+
+def _profile(user):
+    return {
+        'role': user.role,
+        'monthly_income': float(user.monthly_income) if user.monthly_income else None
+    }
+
+
+def get_cached_report(user, start_date, end_date):
+    entry = ReportCache.objects.filter(
+        user=user,
+        start_date=start_date,
+        end_date=end_date,
+        schema_version=REPORT_SCHEMA_VERSION
+    ).values_list('report', flat=True).first()
+    # The profile feeds the AI summary too, so a changed profile is a miss
+    if entry is None or entry.get('user_profile') != _profile(user):
+        return None
+    return entry
+
+
+def store_report(user, start_date, end_date, data_version, report):
+    """Cache the report unless the user's expenses changed while it was computed.
+
+    ``data_version`` is the expense_version read before computing. Expense writes
+    bump it while holding the user row lock taken here, so either the write
+    committed first (the version differs and nothing is stored) or it commits
+    afterwards and its invalidation deletes this entry.
+    """
+    with transaction.atomic():
+        current = User.objects.select_for_update().filter(pk=user.pk).values_list(
+            'expense_version', flat=True
+        ).first()
+        if current != data_version:
+            return False
+        ReportCache.objects.update_or_create(
+            user=user,
+            start_date=start_date,
+            end_date=end_date,
+            schema_version=REPORT_SCHEMA_VERSION,
+            defaults={
+                'depends_from': previous_period_start(start_date, end_date),
+                'data_version': data_version,
+                'report': report
+            }
+        )
+        ReportCache.objects.filter(
+            user=user, start_date=start_date, end_date=end_date
+        ).exclude(schema_version=REPORT_SCHEMA_VERSION).delete()
+    return True
+
+
+def invalidate_reports(removed, added):
+    """Delete the cached reports whose period, or the previous period it compares with,
+    contains any changed expense date"""
+    dates = defaultdict(set)
+    for row in (*removed, *added):
+        dates[row.user_id].add(row.date)
+
+    for user_id, user_dates in dates.items():
+        if len(user_dates) > MAX_INVALIDATION_DATES:
+            touched = Q(depends_from__lte=max(user_dates), end_date__gte=min(user_dates))
+        else:
+            touched = Q()
+            for day in user_dates:
+                touched |= Q(depends_from__lte=day, end_date__gte=day)
+        ReportCache.objects.filter(touched, user_id=user_id).delete()
@@ -0,0 +1,291 @@
+import csv
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .cube import report_totals
+from .models import Expense, ReportJob
+
+try:
+    import openpyxl
+except ImportError:  # XLSX export is optional
+    openpyxl = None
+
+try:
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+except ImportError:  # PDF export is optional
+    canvas = None
+
+CHUNK_SIZE = 2000
+COLUMNS = ['Date', 'Description', 'Category', 'Amount', 'From PDF']
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'pdf': 'application/pdf',
+}
+
+
+def available_formats():
+    formats = ['csv']
+    if openpyxl is not None:
+        formats.append('xlsx')
+    if canvas is not None:
+        formats.append('pdf')
+    return formats
+
+
+def artifact_path(job, fmt):
+    return os.path.join(settings.REPORT_EXPORT_ROOT, str(job.user_id), f'report-{job.pk}.{fmt}')
+
+
+def _summary_lines(job, totals):
+    lines = [
+        ('Period', f'{job.start_date} to {job.end_date}'),
+        ('Total Expenses', f"{totals['total']:.2f}"),
+        ('Transactions', str(totals['count'])),
+        ('Previous Period Total', f"{totals['previous_total']:.2f}"),
+    ]
+    for category, item in totals['categories'].items():
+        lines.append((f'Category: {category}', f"{item['total']:.2f} ({item['count']} transactions)"))
+    return lines
+
+
+class CSVArtifact:
+    def __init__(self, path, job, totals):
+        self.file = open(path, 'w', newline='', encoding='utf-8')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(COLUMNS)
+
+    def write(self, row):
+        self.writer.writerow(row)
+
+    def close(self):
+        self.file.close()
+
+
+class XLSXArtifact:
+    def __init__(self, path, job, totals):
+        self.path = path
+        # Write-only sheets stream rows to a temp file instead of holding them in memory
+        self.workbook = openpyxl.Workbook(write_only=True)
+        summary = self.workbook.create_sheet('Summary')
+        for line in _summary_lines(job, totals):
+            summary.append(line)
+        self.sheet = self.workbook.create_sheet('Expenses')
+        self.sheet.append(COLUMNS)
+
+    def write(self, row):
+        self.sheet.append(row)
+
+    def close(self):
+        self.workbook.save(self.path)
+
+
+class PDFArtifact:
+    """Report PDF with at most REPORT_PDF_MAX_ROWS expense rows.
+
+    reportlab keeps every finished page in memory until save() (roughly 0.3 KB
+    per row), so the row list is cut off at the cap with a pointer to the CSV
+    and XLSX files, which stream every row.
+    """
+    MARGIN = 40
+    LINE_HEIGHT = 13
+    COLUMN_X = [40, 110, 360, 460, 540]
+
+    def __init__(self, path, job, totals):
+        self.max_rows = getattr(settings, 'REPORT_PDF_MAX_ROWS', 50000)
+        self.rows = 0
+        self.canvas = canvas.Canvas(path, pagesize=A4, pageCompression=1)
+        self.width, self.height = A4
+        self.canvas.setFont('Helvetica-Bold', 14)
+        self.canvas.drawString(self.MARGIN, self.height - self.MARGIN, 'Financial Report')
+        self.y = self.height - self.MARGIN - 2 * self.LINE_HEIGHT
+        self.canvas.setFont('Helvetica', 9)
+        for label, value in _summary_lines(job, totals):
+            self.canvas.drawString(self.MARGIN, self.y, f'{label}: {value}')
+            self.y -= self.LINE_HEIGHT
+        self.y -= self.LINE_HEIGHT
+        self._header()
+
+    def _header(self):
+        self.canvas.setFont('Helvetica-Bold', 9)
+        self._line(COLUMNS)
+        self.canvas.setFont('Helvetica', 9)
+
+    def _line(self, values):
+        for x, value in zip(self.COLUMN_X, values):
+            self.canvas.drawString(x, self.y, str(value)[:45])
+        self.y -= self.LINE_HEIGHT
+
+    def _new_page_if_full(self):
+        if self.y < self.MARGIN:
+            self.canvas.showPage()
+            self.y = self.height - self.MARGIN
+            self._header()
+
+    def _truncated(self):
+        return self.max_rows and self.rows > self.max_rows
+
+    def write(self, row):
+        self.rows += 1
+        if self._truncated():
+            return
+        self._new_page_if_full()
+        self._line(row)
+
+    def close(self):
+        if self._truncated():
+            self._new_page_if_full()
+            self.canvas.drawString(
+                self.MARGIN, self.y,
+                f'{self.rows - self.max_rows} more rows not shown; download the CSV or XLSX report for all of them'
+            )
+        self.canvas.save()
+
+
+ARTIFACTS = {'csv': CSVArtifact, 'xlsx': XLSXArtifact, 'pdf': PDFArtifact}
+
+
+def _remove_artifacts(job):
+    for fmt in job.formats:
+        try:
+            os.remove(artifact_path(job, fmt))
+        except OSError:
+            pass
+
+
+def expire_artifacts(retention_days, user=None):
+    """Delete the files of jobs that finished more than ``retention_days`` ago; returns the jobs expired.
+
+    The jobs themselves stay listed, without download links; their download
+    URLs answer 410 Gone.
+    """
+    jobs = ReportJob.objects.filter(
+        status='done', finished_at__lt=timezone.now() - timedelta(days=retention_days)
+    ).exclude(artifacts={})
+    if user is not None:
+        jobs = jobs.filter(user=user)
+    expired = 0
+    for job in jobs:
+        _remove_artifacts(job)
+        expired += ReportJob.objects.filter(pk=job.pk).update(artifacts={})
+    return expired
+
+
+def expire_user_artifacts(user):
+    """Expire the user's old report files per REPORT_ARTIFACT_RETENTION_DAYS (0 keeps them)"""
+    retention_days = getattr(settings, 'REPORT_ARTIFACT_RETENTION_DAYS', 7)
+    if retention_days:
+        expire_artifacts(retention_days, user)
+
+
+def run_job(job_id):
+    """Render one queued job; returns False if another worker already claimed it"""
+    close_old_connections()
+    try:
+        claimed = ReportJob.objects.filter(pk=job_id, status='queued').update(
+            status='running', started_at=timezone.now()
+        )
+        if not claimed:
+            return False
+
+        job = ReportJob.objects.select_related('user').get(pk=job_id)
+        artifacts = {}
+        try:
+            os.makedirs(os.path.dirname(artifact_path(job, 'csv')), exist_ok=True)
+            previous_start = job.start_date - timedelta(days=(job.end_date - job.start_date).days + 1)
+            totals = report_totals(
+                job.user, job.start_date, job.end_date, previous_start, job.start_date - timedelta(days=1)
+            )
+            ReportJob.objects.filter(pk=job.pk).update(rows_total=totals['count'])
+
+            for fmt in job.formats:
+                artifacts[fmt] = ARTIFACTS[fmt](artifact_path(job, fmt), job, totals)
+            rows = Expense.objects.filter(
+                user_id=job.user_id,
+                date__gte=job.start_date,
+                date__lte=job.end_date
+            ).order_by('date', 'created_at').values_list(
+                'date', 'description', 'category', 'amount', 'is_from_pdf'
+            ).iterator(chunk_size=CHUNK_SIZE)
+
+            done = 0
+            for row in rows:
+                for artifact in artifacts.values():
+                    artifact.write(row)
+                done += 1
+                if done % CHUNK_SIZE == 0:
+                    ReportJob.objects.filter(pk=job.pk).update(rows_done=done)
+
+            for artifact in artifacts.values():
+                artifact.close()
+            ReportJob.objects.filter(pk=job.pk).update(
+                status='done',
+                rows_done=done,
+                artifacts={
+                    fmt: {'path': artifact_path(job, fmt), 'size': os.path.getsize(artifact_path(job, fmt))}
+                    for fmt in artifacts
+                },
+                finished_at=timezone.now()
+            )
+        except Exception as e:
+            print(f"Report job {job_id} failed: {e}")
+            for artifact in artifacts.values():
+                try:
+                    artifact.close()
+                except Exception:
+                    pass
+            _remove_artifacts(job)
+            ReportJob.objects.filter(pk=job.pk).update(
+                status='failed', error=str(e)[:255], finished_at=timezone.now()
+            )
+        return True
+    finally:
+        close_old_connections()
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_report_executor():
+    """Process-wide thread pool for report jobs queued by this process"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'REPORT_JOB_WORKERS', 2),
+                    thread_name_prefix='report-job'
+                )
+    return _executor
+
+
+def enqueue_report_job(user, start_date, end_date, formats):
+    job = ReportJob.objects.create(user=user, start_date=start_date, end_date=end_date, formats=formats)
+    if getattr(settings, 'REPORT_JOBS_IN_PROCESS', True):
+        transaction.on_commit(lambda: get_report_executor().submit(run_job, job.pk))
+    return job
+
+
+def requeue_stale_jobs(minutes):
+    """Put jobs whose worker died mid-run back in the queue"""
+    cutoff = timezone.now() - timedelta(minutes=minutes)
+    return ReportJob.objects.filter(status='running', started_at__lt=cutoff).update(
+        status='queued', rows_done=0, started_at=None
+    )
+
+
+def run_pending_jobs():
+    """Run every queued job, oldest first; returns the number this call processed"""
+    processed = 0
+    for job_id in list(ReportJob.objects.filter(status='queued').order_by('created_at').values_list('id', flat=True)):
+        if run_job(job_id):
+            processed += 1
+    return processed
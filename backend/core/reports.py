@@ -1,7 +1,16 @@
-from django.db.models import Sum, Count
+from asgiref.sync import sync_to_async
 from datetime import datetime, timedelta
 from .models import Expense
+from .cube import report_totals
+from .anomalies import recent_anomalies
+from .budget import budget_status
+from .cohorts import cohort_benchmark
+from .forecasts import dashboard_forecast
+from .report_cache import get_cached_report, is_cacheable, previous_period_start, store_report
 from .ai_langchain import FinanceAI
+from .snapshots import get_spending_snapshot
+
+TOP_EXPENSES = 10
 
 class ReportGenerator:
     def __init__(self):
@@ -10,171 +19,211 @@ class ReportGenerator:
     def generate_financial_report(self, user, start_date, end_date):
         """Generate comprehensive financial report for user"""
         try:
-            # Parse dates
-            if isinstance(start_date, str):
-                start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
-            if isinstance(end_date, str):
-                end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
-            
-            # Get expenses in date range
-            expenses = Expense.objects.filter(
-                user=user,
-                date__gte=start_date,
-                date__lte=end_date
-            )
-            
-            # Calculate totals
-            total_expenses = expenses.aggregate(total=Sum('amount'))['total'] or 0
-            transaction_count = expenses.count()
+            start_date, end_date = self._parse_period(start_date, end_date)
+            cacheable = is_cacheable(end_date)
+            if cacheable:
+                cached = get_cached_report(user, start_date, end_date)
+                if cached is not None:
+                    return cached
+            data_version = user.expense_version
             
-            # Category breakdown
-            category_breakdown = {}
-            category_data = expenses.values('category').annotate(
-                total=Sum('amount'),
-                count=Count('id')
-            ).order_by('-total')
-            
-            for item in category_data:
-                category_breakdown[item['category']] = {
-                    'amount': float(item['total']),
-                    'count': item['count'],
-                    'percentage': (float(item['total']) / float(total_expenses) * 100) if total_expenses > 0 else 0
-                }
-            
-            # Daily spending pattern
-            daily_spending = {}
-            daily_data = expenses.values('date').annotate(
-                total=Sum('amount')
-            ).order_by('date')
-            
-            for item in daily_data:
-                daily_spending[item['date'].strftime('%Y-%m-%d')] = float(item['total'])
-            
-            # Average daily spending
-            days_in_period = (end_date - start_date).days + 1
-            avg_daily_spending = float(total_expenses) / days_in_period if days_in_period > 0 else 0
-            
-            # Top expenses
-            top_expenses = list(expenses.order_by('-amount')[:10].values(
-                'description', 'amount', 'category', 'date'
-            ))
-            
-            # Convert Decimal to float for JSON serialization
-            for expense in top_expenses:
-                expense['amount'] = float(expense['amount'])
-                expense['date'] = expense['date'].strftime('%Y-%m-%d')
-            
-            # Spending trends (compare with previous period)
-            previous_start = start_date - timedelta(days=(end_date - start_date).days + 1)
-            previous_end = start_date - timedelta(days=1)
-            
-            previous_expenses = Expense.objects.filter(
-                user=user,
-                date__gte=previous_start,
-                date__lte=previous_end
-            ).aggregate(total=Sum('amount'))['total'] or 0
-            
-            spending_change = 0
-            if previous_expenses > 0:
-                spending_change = ((float(total_expenses) - float(previous_expenses)) / float(previous_expenses)) * 100
-            
-            # Compile report data
-            report_data = {
-                'period': {
-                    'start_date': start_date.strftime('%Y-%m-%d'),
-                    'end_date': end_date.strftime('%Y-%m-%d'),
-                    'days': days_in_period
-                },
-                'summary': {
-                    'total_expenses': float(total_expenses),
-                    'transaction_count': transaction_count,
-                    'avg_daily_spending': round(avg_daily_spending, 2),
-                    'spending_change_percentage': round(spending_change, 2)
-                },
-                'category_breakdown': category_breakdown,
-                'daily_spending': daily_spending,
-                'top_expenses': top_expenses,
-                'user_profile': {
-                    'role': user.role,
-                    'monthly_income': float(user.monthly_income) if user.monthly_income else None
-                }
-            }
+            report_data, summary_data = self._compile_report(user, start_date, end_date)
             
             # Generate AI summary
-            ai_summary = self.ai.generate_report_summary(
-                user, 
-                start_date.strftime('%Y-%m-%d'), 
-                end_date.strftime('%Y-%m-%d'),
-                {
-                    'total_expenses': float(total_expenses),
-                    'category_breakdown': {k: v['amount'] for k, v in category_breakdown.items()},
-                    'transaction_count': transaction_count
-                }
+            report_data['ai_summary'] = self.ai.generate_report_summary(
+                user,
+                report_data['period']['start_date'],
+                report_data['period']['end_date'],
+                summary_data
             )
             
-            report_data['ai_summary'] = ai_summary
-            
+            if cacheable and self._has_ai_summary(report_data, summary_data):
+                store_report(user, start_date, end_date, data_version, report_data)
             return report_data
             
         except Exception as e:
             raise Exception(f"Error generating report: {str(e)}")
     
-    def get_dashboard_insights(self, user):
-        """Generate insights for dashboard"""
+    async def agenerate_financial_report(self, user, start_date, end_date):
+        """Async variant of generate_financial_report for ASGI views"""
         try:
-            # Get current month expenses
-            now = datetime.now()
-            start_of_month = now.replace(day=1).date()
-            
-            current_month_expenses = Expense.objects.filter(
-                user=user,
-                date__gte=start_of_month
+            start_date, end_date = self._parse_period(start_date, end_date)
+            cacheable = is_cacheable(end_date)
+            if cacheable:
+                cached = await sync_to_async(get_cached_report)(user, start_date, end_date)
+                if cached is not None:
+                    return cached
+            data_version = user.expense_version
+            
+            report_data, summary_data = await sync_to_async(self._compile_report)(user, start_date, end_date)
+            
+            report_data['ai_summary'] = await self.ai.agenerate_report_summary(
+                user,
+                report_data['period']['start_date'],
+                report_data['period']['end_date'],
+                summary_data
             )
             
-            total_this_month = current_month_expenses.aggregate(total=Sum('amount'))['total'] or 0
+            if cacheable and self._has_ai_summary(report_data, summary_data):
+                await sync_to_async(store_report)(user, start_date, end_date, data_version, report_data)
+            return report_data
             
-            # Category breakdown for current month
-            category_data = current_month_expenses.values('category').annotate(
-                total=Sum('amount')
-            ).order_by('-total')
+        except Exception as e:
+            raise Exception(f"Error generating report: {str(e)}")
+    
+    def _parse_period(self, start_date, end_date):
+        if isinstance(start_date, str):
+            start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
+        if isinstance(end_date, str):
+            end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
+        return start_date, end_date
+    
+    def _has_ai_summary(self, report_data, summary_data):
+        """Don't cache the local fallback summary; the next request may reach the LLM"""
+        return report_data['ai_summary'] != self.ai._fallback_report_summary(
+            report_data['period']['start_date'],
+            report_data['period']['end_date'],
+            summary_data
+        )
+    
+    def _compile_report(self, user, start_date, end_date):
+        """Run the report queries; returns the report data and the AI summary input"""
+        start_date, end_date = self._parse_period(start_date, end_date)
+        
+        # Previous period of the same length, for the spending trend
+        previous_start = previous_period_start(start_date, end_date)
+        previous_end = start_date - timedelta(days=1)
+        
+        # Totals, categories, the daily series and the previous-period total in a
+        # single pass (spending cube, or one rollup query); top expenses are the
+        # only other query
+        totals = report_totals(user, start_date, end_date, previous_start, previous_end)
+        total_expenses = totals['total']
+        transaction_count = totals['count']
+        previous_expenses = totals['previous_total']
+        
+        # Category breakdown
+        category_breakdown = {}
+        for category, item in totals['categories'].items():
+            category_breakdown[category] = {
+                'amount': float(item['total']),
+                'count': item['count'],
+                'percentage': (float(item['total']) / float(total_expenses) * 100) if total_expenses > 0 else 0
+            }
+        
+        # Daily spending pattern
+        daily_spending = {}
+        for day, total in totals['daily']:
+            daily_spending[day.strftime('%Y-%m-%d')] = float(total)
+        
+        # Average daily spending
+        days_in_period = (end_date - start_date).days + 1
+        avg_daily_spending = float(total_expenses) / days_in_period if days_in_period > 0 else 0
+        
+        # Top expenses
+        top_expenses = list(Expense.objects.filter(
+            user=user,
+            date__gte=start_date,
+            date__lte=end_date
+        ).order_by('-amount')[:TOP_EXPENSES].values(
+            'description', 'amount', 'category', 'date'
+        ))
+        
+        # Convert Decimal to float for JSON serialization
+        for expense in top_expenses:
+            expense['amount'] = float(expense['amount'])
+            expense['date'] = expense['date'].strftime('%Y-%m-%d')
+        
+        spending_change = 0
+        if previous_expenses > 0:
+            spending_change = ((float(total_expenses) - float(previous_expenses)) / float(previous_expenses)) * 100
+        
+        # Compile report data
+        report_data = {
+            'period': {
+                'start_date': start_date.strftime('%Y-%m-%d'),
+                'end_date': end_date.strftime('%Y-%m-%d'),
+                'days': days_in_period
+            },
+            'summary': {
+                'total_expenses': float(total_expenses),
+                'transaction_count': transaction_count,
+                'avg_daily_spending': round(avg_daily_spending, 2),
+                'spending_change_percentage': round(spending_change, 2)
+            },
+            'category_breakdown': category_breakdown,
+            'daily_spending': daily_spending,
+            'top_expenses': top_expenses,
+            'user_profile': {
+                'role': user.role,
+                'monthly_income': float(user.monthly_income) if user.monthly_income else None
+            }
+        }
+        
+        summary_data = {
+            'total_expenses': float(total_expenses),
+            'category_breakdown': {k: v['amount'] for k, v in category_breakdown.items()},
+            'transaction_count': transaction_count
+        }
+        
+        return report_data, summary_data
+    
+    def get_dashboard_insights(self, user, snapshot=None):
+        """Generate insights for dashboard"""
+        try:
+            # Current month figures come from the request's spending snapshot
+            snapshot = snapshot or get_spending_snapshot(user)
+            total_this_month = snapshot.month_total
             
+            # Category breakdown for current month
             categories = []
-            for item in category_data:
+            for category, item in snapshot.month_by_category.items():
                 categories.append({
-                    'category': item['category'],
+                    'category': category,
                     'amount': float(item['total']),
                     'percentage': (float(item['total']) / float(total_this_month) * 100) if total_this_month > 0 else 0
                 })
             
             # Recent transactions
-            recent_transactions = list(current_month_expenses.order_by('-date', '-created_at')[:5].values(
-                'description', 'amount', 'category', 'date'
-            ))
+            recent_transactions = [dict(transaction) for transaction in snapshot.recent_transactions]
             
             for transaction in recent_transactions:
                 transaction['amount'] = float(transaction['amount'])
                 transaction['date'] = transaction['date'].strftime('%Y-%m-%d')
             
-            # Budget analysis (if user has income)
-            budget_analysis = None
-            if user.monthly_income:
-                remaining_budget = float(user.monthly_income) - float(total_this_month)
-                budget_percentage = (float(total_this_month) / float(user.monthly_income)) * 100
-                
-                budget_analysis = {
-                    'monthly_income': float(user.monthly_income),
-                    'spent_this_month': float(total_this_month),
-                    'remaining_budget': remaining_budget,
-                    'budget_percentage': round(budget_percentage, 2),
-                    'is_over_budget': remaining_budget < 0
-                }
+            # Latest flagged expenses (unusual amounts, duplicate charges)
+            anomalies = recent_anomalies(user)
+            
+            # Projected month-end and next-month spend from the nightly forecast
+            try:
+                forecast = dashboard_forecast(user, total_this_month, snapshot.month_by_category, snapshot.as_of)
+            except Exception as e:
+                print(f"Spending forecast failed: {e}")
+                forecast = None
+            
+            # Budget analysis (if user has income), off the month-to-date counters on the user row
+            budget_analysis = budget_status(user)
+            if budget_analysis and forecast:
+                budget_analysis['projected_month_end'] = forecast['month_end']['expected']
+                budget_analysis['projected_over_budget'] = forecast['month_end']['expected'] > float(user.monthly_income)
+                budget_analysis['may_exceed_budget'] = forecast['month_end']['high'] > float(user.monthly_income)
+            
+            # How the user compares with others of the same role (precomputed nightly)
+            try:
+                benchmark = cohort_benchmark(user)
+            except Exception as e:
+                print(f"Cohort benchmark failed: {e}")
+                benchmark = None
             
             return {
                 'total_this_month': float(total_this_month),
                 'categories': categories,
                 'recent_transactions': recent_transactions,
                 'budget_analysis': budget_analysis,
-                'transaction_count': current_month_expenses.count()
+                'transaction_count': snapshot.month_count,
+                'cohort_benchmark': benchmark,
+                'forecast': forecast,
+                'anomalies': anomalies
             }
             
         except Exception as e:
@@ -0,0 +1,283 @@
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+
+from .models import Expense, ExpenseDailyRollup, ExpenseMonthlyRollup
+
+ZERO = Decimal('0')
+CENT = Decimal('0.01')
+GRANULARITIES = ('day', 'week', 'month')
+
+
+def _month(day):
+    return day.replace(day=1)
+
+
+def apply_changes(removed, added):
+    """Fold Expense changes into the daily and monthly rollups.
+
+    Runs inside the transaction of the Expense write (see ``expenses_changed``),
+    so the rollups commit or roll back together with the rows they summarize.
+    """
+    daily = defaultdict(lambda: [ZERO, 0])
+    monthly = defaultdict(lambda: [ZERO, 0])
+    for sign, rows in ((-1, removed), (1, added)):
+        for row in rows:
+            for deltas, period in ((daily, row.date), (monthly, _month(row.date))):
+                delta = deltas[(row.user_id, period, row.category)]
+                delta[0] += sign * row.amount
+                delta[1] += sign
+
+    _apply(ExpenseDailyRollup, 'day', daily)
+    _apply(ExpenseMonthlyRollup, 'month', monthly)
+
+
+def _apply(model, period_field, deltas):
+    # Sorted so concurrent writers lock rollup rows in the same order
+    for (user_id, period, category), (amount, count) in sorted(deltas.items(), key=lambda item: item[0]):
+        if not amount and not count:
+            continue
+        rows = model.objects.filter(user_id=user_id, category=category, **{period_field: period})
+        if rows.update(total=F('total') + amount, count=F('count') + count):
+            if count < 0:
+                rows.filter(count__lte=0).delete()
+            continue
+        if count <= 0:
+            # Nothing to subtract from: the rollups predate this row (rebuild_expense_rollups fixes that)
+            continue
+        try:
+            with transaction.atomic():
+                model.objects.create(
+                    user_id=user_id, category=category, total=amount, count=count, **{period_field: period}
+                )
+        except IntegrityError:
+            # A concurrent writer created the row first
+            rows.update(total=F('total') + amount, count=F('count') + count)
+
+
+def _split_range(start, end):
+    """Split [start, end] into whole months and the leftover day ranges at either edge"""
+    if start.day == 1:
+        first_full = start
+    elif _month(start) == _month(date.max):
+        # No whole month follows
+        first_full = date.max
+    else:
+        first_full = _month(_month(start) + timedelta(days=32))
+    if end < date.max and (end + timedelta(days=1)).day == 1:
+        after_last_full = end + timedelta(days=1)
+    else:
+        # Also for ranges ending on date.max, whose following month can't be the exclusive bound
+        after_last_full = _month(end)
+    if first_full >= after_last_full:
+        return None, [(start, end)]
+
+    day_ranges = []
+    if start < first_full:
+        day_ranges.append((start, first_full - timedelta(days=1)))
+    if after_last_full <= end:
+        day_ranges.append((after_last_full, end))
+    return (first_full, after_last_full), day_ranges
+
+
+def category_totals(user, start, end):
+    """{category: {'total', 'count'}} over [start, end], largest first.
+
+    Whole months are read from the monthly rollup and only the partial months at
+    the edges from the daily one, so a one-year range touches ~12 rows per category.
+    """
+    months, day_ranges = _split_range(start, end)
+    sources = []
+    if months:
+        sources.append(ExpenseMonthlyRollup.objects.filter(
+            user=user, month__gte=months[0], month__lt=months[1]
+        ))
+    if day_ranges:
+        in_ranges = Q()
+        for range_start, range_end in day_ranges:
+            in_ranges |= Q(day__gte=range_start, day__lte=range_end)
+        sources.append(ExpenseDailyRollup.objects.filter(in_ranges, user=user))
+
+    totals = defaultdict(lambda: {'total': ZERO, 'count': 0})
+    for rows in sources:
+        for row in rows.values('category').annotate(amount=Sum('total'), transactions=Sum('count')).order_by():
+            totals[row['category']]['total'] += row['amount']
+            totals[row['category']]['count'] += row['transactions']
+    return _sorted_breakdown(totals)
+
+
+def _sorted_breakdown(totals):
+    return dict(sorted(
+        ((category, item) for category, item in totals.items() if item['count']),
+        key=lambda item: item[1]['total'],
+        reverse=True
+    ))
+
+
+def report_totals(user, start, end, previous_start, previous_end):
+    """Category breakdown, daily series and previous-period total in one pass.
+
+    Reads the daily rollup rows of both periods with a single query and folds
+    them here. Returns {'categories', 'total', 'count', 'daily', 'previous_total'};
+    ``daily`` is [(day, total)] for the days with expenses, in date order.
+    """
+    rows = ExpenseDailyRollup.objects.filter(
+        user=user,
+        day__gte=min(start, previous_start),
+        day__lte=max(end, previous_end)
+    ).order_by('day').values_list('day', 'category', 'total', 'count')
+
+    categories = defaultdict(lambda: {'total': ZERO, 'count': 0})
+    daily = {}
+    previous_total = ZERO
+    for day, category, total, count in rows:
+        if start <= day <= end:
+            categories[category]['total'] += total
+            categories[category]['count'] += count
+            daily[day] = daily.get(day, ZERO) + total
+        if previous_start <= day <= previous_end:
+            previous_total += total
+
+    categories = _sorted_breakdown(categories)
+    return {
+        'categories': categories,
+        'total': sum((item['total'] for item in categories.values()), ZERO),
+        'count': sum(item['count'] for item in categories.values()),
+        'daily': list(daily.items()),
+        'previous_total': previous_total,
+    }
+
+
+def _next_bucket(day, granularity):
+    if granularity == 'month':
+        return _month(day + timedelta(days=32))
+    return day + timedelta(days=7 if granularity == 'week' else 1)
+
+
+def bucket_edges(start, end, granularity=None, limit=None):
+    """Start dates of the day/week/month buckets covering [start, end].
+
+    Weeks start on Monday, as with TruncWeek. The first bucket is clipped to
+    ``start``; with no granularity the whole range is a single bucket. With a
+    ``limit``, stops once there are more edges than that.
+    """
+    edges = [start]
+    if granularity is None:
+        return edges
+    day = start - timedelta(days=start.weekday()) if granularity == 'week' else start
+    day = _month(day) if granularity == 'month' else day
+    while limit is None or len(edges) <= limit:
+        try:
+            day = _next_bucket(day, granularity)
+        except OverflowError:
+            # No bucket starts after date.max
+            return edges
+        if day > end:
+            return edges
+        edges.append(day)
+    return edges
+
+
+def bucketed_totals(user, ranges, granularity=None, categories=None):
+    """Category totals per day/week/month bucket for several ranges, with a single query.
+
+    Returns one list per range of (bucket start, {category: {'total', 'count'}}),
+    optionally restricted to ``categories``.
+    """
+    in_ranges = Q()
+    for start, end in ranges:
+        in_ranges |= Q(day__gte=start, day__lte=end)
+    rows = ExpenseDailyRollup.objects.filter(in_ranges, user=user)
+    if categories:
+        rows = rows.filter(category__in=categories)
+    rows = list(rows.values_list('day', 'category', 'total', 'count'))
+
+    results = []
+    for start, end in ranges:
+        edges = bucket_edges(start, end, granularity)
+        buckets = [defaultdict(lambda: {'total': ZERO, 'count': 0}) for _ in edges]
+        for day, category, total, count in rows:
+            if start <= day <= end:
+                item = buckets[bisect_right(edges, day) - 1][category]
+                item['total'] += total
+                item['count'] += count
+        results.append([(edge, _sorted_breakdown(bucket)) for edge, bucket in zip(edges, buckets)])
+    return results
+
+
+def _expected_rollups(user_id=None):
+    """The daily and monthly rollups as the raw Expense rows define them.
+
+    Returns two {(user_id, day or month, category): (total, count)} dicts.
+    """
+    expenses = Expense.objects.order_by()
+    if user_id is not None:
+        expenses = expenses.filter(user_id=user_id)
+
+    daily = {}
+    monthly = defaultdict(lambda: [ZERO, 0])
+    for row in expenses.values('user_id', 'date', 'category').annotate(
+        amount=Sum('amount'), transactions=Count('id')
+    ).iterator():
+        # SQLite sums decimals as floats
+        amount = row['amount'].quantize(CENT)
+        daily[(row['user_id'], row['date'], row['category'])] = (amount, row['transactions'])
+        month = monthly[(row['user_id'], _month(row['date']), row['category'])]
+        month[0] += amount
+        month[1] += row['transactions']
+    return daily, {key: tuple(value) for key, value in monthly.items()}
+
+
+def rebuild_rollups(user_id=None, batch_size=1000):
+    """Recompute the rollups from the raw Expense rows; returns (daily rows, monthly rows)"""
+    daily_rollups = ExpenseDailyRollup.objects.all()
+    monthly_rollups = ExpenseMonthlyRollup.objects.all()
+    if user_id is not None:
+        daily_rollups = daily_rollups.filter(user_id=user_id)
+        monthly_rollups = monthly_rollups.filter(user_id=user_id)
+
+    with transaction.atomic():
+        daily_rollups.delete()
+        monthly_rollups.delete()
+        daily, monthly = _expected_rollups(user_id)
+        ExpenseDailyRollup.objects.bulk_create([
+            ExpenseDailyRollup(user_id=user, day=day, category=category, total=total, count=count)
+            for (user, day, category), (total, count) in daily.items()
+        ], batch_size=batch_size)
+        ExpenseMonthlyRollup.objects.bulk_create([
+            ExpenseMonthlyRollup(user_id=user, month=month, category=category, total=total, count=count)
+            for (user, month, category), (total, count) in monthly.items()
+        ], batch_size=batch_size)
+    return len(daily), len(monthly)
+
+
+def find_rollup_drift(user_id=None):
+    """Rollup rows that disagree with the Expense rows: [(level, key, stored, expected)].
+
+    ``level`` is 'daily' or 'monthly', ``key`` is (user_id, day or month, category)
+    and missing rows read as (0, 0).
+    """
+    expected_daily, expected_monthly = _expected_rollups(user_id)
+    drift = []
+    for level, model, period_field, expected in (
+        ('daily', ExpenseDailyRollup, 'day', expected_daily),
+        ('monthly', ExpenseMonthlyRollup, 'month', expected_monthly),
+    ):
+        rollups = model.objects.order_by()
+        if user_id is not None:
+            rollups = rollups.filter(user_id=user_id)
+        stored = {
+            (user, period, category): (total, count)
+            for user, period, category, total, count in rollups.values_list(
+                'user_id', period_field, 'category', 'total', 'count'
+            ).iterator()
+        }
+        for key in sorted(stored.keys() | expected.keys()):
+            values = stored.get(key, (ZERO, 0))
+            if values != expected.get(key, (ZERO, 0)):
+                drift.append((level, key, values, expected.get(key, (ZERO, 0))))
+    return drift
@@ -1,6 +1,7 @@
 from rest_framework import serializers
+from django.urls import reverse
 from django.contrib.auth import authenticate
-from .models import User, Expense, ChatMessage
+from .models import User, Expense, ChatMessage, ReportJob
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, min_length=8)
@@ -59,10 +60,23 @@ class ExpenseSerializer(serializers.ModelSerializer):
         fields = ('id', 'amount', 'description', 'category', 'date', 'is_from_pdf', 'created_at')
         read_only_fields = ('id', 'is_from_pdf', 'created_at')
     
+    def __init__(self, *args, **kwargs):
+        # Optional sparse fieldset, e.g. ExpenseSerializer(expenses, many=True, fields=['id', 'amount'])
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+    
     def create(self, validated_data):
         validated_data['user'] = self.context['request'].user
         return super().create(validated_data)
 
+class BulkExpenseSerializer(ExpenseSerializer):
+    """An expense in a bulk request; a missing category is filled in by batched categorization"""
+    class Meta(ExpenseSerializer.Meta):
+        extra_kwargs = {'category': {'required': False}}
+
 class ChatMessageSerializer(serializers.ModelSerializer):
     class Meta:
         model = ChatMessage
@@ -71,4 +85,30 @@ class ChatMessageSerializer(serializers.ModelSerializer):
     
     def create(self, validated_data):
         validated_data['user'] = self.context['request'].user
-        return super().create(validated_data)
\ No newline at end of file
+        return super().create(validated_data)
+
+class ReportJobSerializer(serializers.ModelSerializer):
+    progress = serializers.SerializerMethodField()
+    downloads = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = ReportJob
+        fields = ('id', 'start_date', 'end_date', 'formats', 'status', 'rows_total', 'rows_done',
+                  'progress', 'downloads', 'error', 'created_at', 'started_at', 'finished_at')
+        read_only_fields = fields
+    
+    def get_progress(self, obj):
+        if obj.status == 'done':
+            return 100.0
+        return round(obj.rows_done / obj.rows_total * 100, 1) if obj.rows_total else 0.0
+    
+    def get_downloads(self, obj):
+        request = self.context.get('request')
+        downloads = {}
+        for fmt, artifact in obj.artifacts.items():
+            url = reverse('report_job_download', args=[obj.pk, fmt])
+            downloads[fmt] = {
+                'url': request.build_absolute_uri(url) if request else url,
+                'size': artifact['size']
+            }
+        return downloads
@@ -0,0 +1,60 @@
+from django.db.models import F
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import ChatMessage, User, expenses_changed
+
+
+@receiver(post_save, sender=ChatMessage)
+def update_conversation_memory(sender, instance, created, **kwargs):
+    """Fold each new chat exchange into the user's conversation memory"""
+    if not created:
+        return
+    try:
+        from .memory import record_chat_message
+        record_chat_message(instance)
+    except Exception as e:
+        # Memory is an optimization; never fail the chat over it
+        print(f"Conversation memory update failed: {e}")
+
+
+@receiver(expenses_changed)
+def update_expense_rollups(sender, removed, added, **kwargs):
+    """Keep the daily/monthly rollups in step with Expense, in the same transaction"""
+    from .rollups import apply_changes
+    apply_changes(removed, added)
+
+
+@receiver(expenses_changed)
+def bump_expense_version(sender, removed, added, **kwargs):
+    """Mark the users' spending as changed for the in-memory caches of other processes"""
+    user_ids = {row.user_id for row in (*removed, *added)}
+    User.objects.filter(pk__in=user_ids).update(expense_version=F('expense_version') + 1)
+
+
+@receiver(expenses_changed)
+def patch_spending_cubes(sender, removed, added, **kwargs):
+    """Patch this process's spending cubes once the write commits"""
+    from .cube import schedule_patch
+    schedule_patch(removed, added)
+
+
+@receiver(expenses_changed)
+def invalidate_cached_reports(sender, removed, added, **kwargs):
+    """Drop cached reports whose period the write touched, in the same transaction"""
+    from .report_cache import invalidate_reports
+    invalidate_reports(removed, added)
+
+
+@receiver(expenses_changed)
+def flag_expense_anomalies(sender, removed, added, **kwargs):
+    """Update the per-category running stats and flag unusual new expenses, in the same transaction"""
+    from .anomalies import apply_changes
+    apply_changes(removed, added)
+
+
+@receiver(expenses_changed)
+def update_month_to_date(sender, removed, added, **kwargs):
+    """Keep the users' month-to-date spend counters current; must run after update_expense_rollups"""
+    from .budget import apply_changes
+    apply_changes(removed, added)
@@ -0,0 +1,96 @@
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from django.db.models import Q, Sum
+
+from .models import Expense, ExpenseDailyRollup
+
+RECENT_DAYS = 30
+RECENT_TRANSACTIONS = 5
+
+
+@dataclass
+class UserSpendingSnapshot:
+    """Aggregated view of a user's spending, shared by everything that serves one request.
+
+    ``recent_*`` covers the last 30 days (the window FinanceAI prompts use) and
+    ``month_*`` the current month to date (the dashboard window). Both come from a
+    single grouped aggregate over the daily rollups; the recent-transactions slice
+    is a second query on Expense.
+    """
+    as_of: date
+    recent_start: date
+    month_start: date
+    recent_total: Decimal = Decimal('0')
+    recent_count: int = 0
+    recent_by_category: dict = field(default_factory=dict)
+    month_total: Decimal = Decimal('0')
+    month_count: int = 0
+    month_by_category: dict = field(default_factory=dict)
+    recent_transactions: list = field(default_factory=list)
+
+    @classmethod
+    def build(cls, user, today=None):
+        today = today or datetime.now().date()
+        snapshot = cls(
+            as_of=today,
+            recent_start=today - timedelta(days=RECENT_DAYS),
+            month_start=today.replace(day=1),
+        )
+
+        in_recent = Q(day__gte=snapshot.recent_start)
+        in_month = Q(day__gte=snapshot.month_start)
+        rows = ExpenseDailyRollup.objects.filter(
+            user=user,
+            day__gte=min(snapshot.recent_start, snapshot.month_start)
+        ).values('category').annotate(
+            recent_total=Sum('total', filter=in_recent),
+            recent_count=Sum('count', filter=in_recent),
+            month_total=Sum('total', filter=in_month),
+            month_count=Sum('count', filter=in_month)
+        ).order_by()
+
+        for row in rows:
+            if row['recent_count']:
+                snapshot.recent_by_category[row['category']] = row['recent_total']
+                snapshot.recent_total += row['recent_total']
+                snapshot.recent_count += row['recent_count']
+            if row['month_count']:
+                snapshot.month_by_category[row['category']] = {
+                    'total': row['month_total'],
+                    'count': row['month_count']
+                }
+                snapshot.month_total += row['month_total']
+                snapshot.month_count += row['month_count']
+
+        # Largest categories first, as the per-query breakdowns used to be ordered
+        snapshot.recent_by_category = dict(
+            sorted(snapshot.recent_by_category.items(), key=lambda item: item[1], reverse=True)
+        )
+        snapshot.month_by_category = dict(
+            sorted(snapshot.month_by_category.items(), key=lambda item: item[1]['total'], reverse=True)
+        )
+
+        if snapshot.month_count:
+            snapshot.recent_transactions = list(Expense.objects.filter(
+                user=user,
+                date__gte=snapshot.month_start
+            ).order_by('-date', '-created_at')[:RECENT_TRANSACTIONS].values(
+                'description', 'amount', 'category', 'date'
+            ))
+        return snapshot
+
+
+def get_spending_snapshot(user):
+    """Return the user's spending snapshot, built once per request.
+
+    The snapshot is memoized on the user instance, which DRF and the async views
+    create fresh for every request, so all FinanceAI/ReportGenerator calls made
+    while serving one request share it.
+    """
+    snapshot = getattr(user, '_spending_snapshot', None)
+    if snapshot is None or snapshot.as_of != datetime.now().date():
+        snapshot = UserSpendingSnapshot.build(user)
+        user._spending_snapshot = snapshot
+    return snapshot
@@ -0,0 +1,30 @@
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+
+
+async def aiter_chunks(chunks):
+    """Drive a sync chunk generator from the event loop, one chunk at a time.
+
+    Django's ASGI handler reads a sync iterator into memory in full before
+    sending it; stepping it through sync_to_async keeps the stream incremental.
+    thread_sensitive keeps every step (and the database cursor) on one thread.
+    """
+    done = object()
+    step = sync_to_async(next, thread_sensitive=True)
+    chunks = iter(chunks)
+    while True:
+        chunk = await step(chunks, done)
+        if chunk is done:
+            return
+        yield chunk
+
+
+def streaming_response(request, chunks, **kwargs):
+    """StreamingHttpResponse that stays incremental under ASGI as well as WSGI.
+
+    ``request`` may be a DRF Request or a Django HttpRequest.
+    """
+    if isinstance(getattr(request, '_request', request), ASGIRequest):
+        chunks = aiter_chunks(chunks)
+    return StreamingHttpResponse(chunks, **kwargs)
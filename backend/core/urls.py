@@ -1,7 +1,15 @@
+from django.conf import settings
 from django.urls import path
 from rest_framework_simplejwt.views import TokenRefreshView
 from . import views
 
+# Under ASGI the LLM-bound endpoints are served by async views so a single
+# worker can hold many in-flight LLM calls
+if settings.ASYNC_AI_VIEWS:
+    from . import async_views as ai_views
+else:
+    ai_views = views
+
 urlpatterns = [
     # Authentication
     path('auth/register/', views.register, name='register'),
@@ -11,21 +19,33 @@ urlpatterns = [
     
     # User Profile
     path('profile/', views.user_profile, name='user_profile'),
+    path('budget/', views.budget, name='budget'),
     
     # Expenses
     path('expenses/', views.expenses, name='expenses'),
+    path('expenses/bulk/', views.bulk_expenses, name='bulk_expenses'),
+    path('expenses/export/', views.export_expenses, name='export_expenses'),
     path('expenses/upload-pdf/', views.upload_pdf_expenses, name='upload_pdf_expenses'),
     
     # Dashboard
-    path('dashboard/', views.dashboard, name='dashboard'),
+    path('dashboard/', ai_views.dashboard, name='dashboard'),
     
     # Chat
-    path('chat/', views.chat, name='chat'),
+    path('chat/', ai_views.chat, name='chat'),
+    path('chat/stream/', views.chat_stream, name='chat_stream'),
     path('chat/history/', views.chat_history, name='chat_history'),
+    path('chat/archive/', views.chat_archive, name='chat_archive'),
+    path('chat/routing-stats/', views.chat_routing_stats, name='chat_routing_stats'),
     
     # Reports
-    path('reports/', views.generate_report, name='generate_report'),
+    path('reports/', ai_views.generate_report, name='generate_report'),
+    path('reports/jobs/', views.report_jobs, name='report_jobs'),
+    path('reports/jobs/<int:job_id>/', views.report_job_detail, name='report_job_detail'),
+    path('reports/jobs/<int:job_id>/download/<str:fmt>/', views.report_job_download, name='report_job_download'),
     
     # Analytics
     path('analytics/', views.expense_analytics, name='expense_analytics'),
+    
+    # LLM usage
+    path('llm/stats/', views.llm_stats, name='llm_stats'),
 ]
\ No newline at end of file
@@ -1,23 +1,40 @@
 from rest_framework import status, generics
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken
+from django.conf import settings
 from django.contrib.auth import authenticate
-from django.db.models import Sum
-from datetime import datetime, timedelta
+from django.http import HttpResponse
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from collections import Counter
+from datetime import date, datetime, timedelta
+from decimal import Decimal, InvalidOperation
+import base64
+import binascii
 import json
+import os
+import re
 
-from .models import User, Expense, ChatMessage
+from .models import User, Expense, ChatMessage, ChatArchive, ReportJob
 from .serializers import (
     UserRegistrationSerializer, 
     UserLoginSerializer, 
     UserSerializer,
     ExpenseSerializer,
-    ChatMessageSerializer
+    ChatMessageSerializer,
+    ReportJobSerializer,
+    BulkExpenseSerializer
 )
 # Lazy import heavy AI modules inside endpoints to avoid blocking server startup
 from .reports import ReportGenerator
+from .budget import budget_status
+from .cube import bucketed_totals, category_totals
+from .rollups import GRANULARITIES, bucket_edges
+from .snapshots import get_spending_snapshot
+from .streaming import streaming_response
 
 # Authentication Views
 @api_view(['POST'])
@@ -86,25 +103,133 @@ def user_profile(request):
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def budget(request):
+    """Month-to-date spend against income, read off the user's counters"""
+    status_data = budget_status(request.user)
+    if status_data is None:
+        return Response({'error': 'Set a monthly income in your profile to track a budget'}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(status_data)
+
 # Expense Views
+EXPENSE_PAGE_SIZE = 50
+MAX_EXPENSE_PAGE_SIZE = 200
+# Counts that the rollups can't answer stop here, so a heavy user's count costs the same as anyone's
+EXPENSE_COUNT_CAP = 10000
+
+def _encode_cursor(expense):
+    position = [expense.date.isoformat(), expense.created_at.isoformat(), expense.pk]
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+def _decode_cursor(cursor):
+    """(date, created_at, id) of the last expense on the previous page; ValueError if malformed"""
+    try:
+        day, created_at, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.strptime(day, '%Y-%m-%d').date(), datetime.fromisoformat(created_at), int(pk)
+    except (TypeError, binascii.Error, json.JSONDecodeError) as e:
+        raise ValueError(str(e))
+
+def _list_expenses(request):
+    """One page of the user's expenses, newest first, with a keyset cursor for the next page"""
+    try:
+        start_date = request.GET.get('start_date')
+        end_date = request.GET.get('end_date')
+        start_date = datetime.strptime(start_date, '%Y-%m-%d').date() if start_date else None
+        end_date = datetime.strptime(end_date, '%Y-%m-%d').date() if end_date else None
+        min_amount = Decimal(request.GET['min_amount']) if request.GET.get('min_amount') else None
+        max_amount = Decimal(request.GET['max_amount']) if request.GET.get('max_amount') else None
+        limit = min(int(request.GET.get('limit', EXPENSE_PAGE_SIZE)), MAX_EXPENSE_PAGE_SIZE)
+        cursor = _decode_cursor(request.GET['cursor']) if request.GET.get('cursor') else None
+    except (ValueError, InvalidOperation):
+        return Response({
+            'error': 'Invalid parameter: dates are YYYY-MM-DD, amounts and limit are numbers, cursor comes from next_cursor'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    if limit < 1:
+        return Response({'error': 'limit must be positive'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    categories = [category for category in request.GET.get('category', '').split(',') if category]
+    unknown = sorted(set(categories) - {choice[0] for choice in Expense.CATEGORY_CHOICES})
+    if unknown:
+        return Response({'error': f"Unknown categories: {', '.join(unknown)}"}, status=status.HTTP_400_BAD_REQUEST)
+    
+    is_from_pdf = request.GET.get('is_from_pdf', '').lower()
+    if is_from_pdf not in ('', 'true', 'false'):
+        return Response({'error': 'is_from_pdf must be true or false'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    fields = None
+    if request.GET.get('fields'):
+        fields = request.GET['fields'].split(',')
+        unknown = sorted(set(fields) - set(ExpenseSerializer.Meta.fields))
+        if unknown:
+            return Response({
+                'error': f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(ExpenseSerializer.Meta.fields)}"
+            }, status=status.HTTP_400_BAD_REQUEST)
+    
+    user_expenses = Expense.objects.filter(user=request.user)
+    if start_date:
+        user_expenses = user_expenses.filter(date__gte=start_date)
+    if end_date:
+        user_expenses = user_expenses.filter(date__lte=end_date)
+    if categories:
+        user_expenses = user_expenses.filter(category__in=categories)
+    if min_amount is not None:
+        user_expenses = user_expenses.filter(amount__gte=min_amount)
+    if max_amount is not None:
+        user_expenses = user_expenses.filter(amount__lte=max_amount)
+    if is_from_pdf:
+        user_expenses = user_expenses.filter(is_from_pdf=is_from_pdf == 'true')
+    
+    # Total for the filters: exact from the spending cube when only dates and categories are
+    # filtered, otherwise (or if that fails) an index count capped at EXPENSE_COUNT_CAP
+    count = None
+    if min_amount is None and max_amount is None and not is_from_pdf:
+        try:
+            totals = category_totals(request.user, start_date or date.min, end_date or date.max)
+            count = sum(item['count'] for category, item in totals.items() if not categories or category in categories)
+            count_is_exact = True
+        except Exception as e:
+            print(f"Expense count from rollups failed: {e}")
+    if count is None:
+        count = user_expenses.order_by()[:EXPENSE_COUNT_CAP].count()
+        count_is_exact = count < EXPENSE_COUNT_CAP
+    
+    # Keyset pagination on the (user, -date, -created_at, -id) index: the page after the cursor,
+    # fetched directly however deep it is
+    page = user_expenses.order_by('-date', '-created_at', '-id')
+    if cursor:
+        day, created_at, pk = cursor
+        page = page.filter(
+            Q(date__lt=day)
+            | Q(date=day, created_at__lt=created_at)
+            | Q(date=day, created_at=created_at, id__lt=pk)
+        )
+    if fields:
+        page = page.only(*set(fields) | {'id', 'date', 'created_at'})
+    page = list(page[:limit + 1])
+    
+    return Response({
+        'results': ExpenseSerializer(page[:limit], many=True, fields=fields).data,
+        'next_cursor': _encode_cursor(page[limit - 1]) if len(page) > limit else None,
+        'count': count,
+        'count_is_exact': count_is_exact
+    })
+
+def _keyword_category(description):
+    """Simple keyword categorization for when the ML libraries aren't available"""
+    description_lower = description.lower()
+    if any(word in description_lower for word in ['restaurant', 'food', 'meal', 'lunch', 'dinner', 'breakfast']):
+        return 'food'
+    elif any(word in description_lower for word in ['uber', 'taxi', 'gas', 'fuel', 'transport']):
+        return 'transportation'
+    return 'other'
+
 @api_view(['GET', 'POST'])
 @permission_classes([IsAuthenticated])
 def expenses(request):
-    """Get user expenses or create new expense"""
+    """List the user's expenses a page at a time, or create a new expense"""
     if request.method == 'GET':
-        user_expenses = Expense.objects.filter(user=request.user)
-        
-        # Filter by date range if provided
-        start_date = request.GET.get('start_date')
-        end_date = request.GET.get('end_date')
-        
-        if start_date:
-            user_expenses = user_expenses.filter(date__gte=start_date)
-        if end_date:
-            user_expenses = user_expenses.filter(date__lte=end_date)
-        
-        serializer = ExpenseSerializer(user_expenses, many=True)
-        return Response(serializer.data)
+        return _list_expenses(request)
     
     elif request.method == 'POST':
         serializer = ExpenseSerializer(data=request.data, context={'request': request})
@@ -112,18 +237,13 @@ def expenses(request):
             # Use AI to categorize if category not provided
             if not serializer.validated_data.get('category'):
                 try:
-                    from .ai_langchain import FinanceAI
-                    ai = FinanceAI()
-                    category = ai.categorize_expense(serializer.validated_data['description'])
+                    from .ai_langchain import get_categorization_batcher
+                    category = get_categorization_batcher().categorize(
+                        serializer.validated_data['description'], request.user
+                    )
                 except Exception:
                     # Fallback simple categorization if ML libs not available
-                    description_lower = serializer.validated_data['description'].lower()
-                    if any(word in description_lower for word in ['restaurant', 'food', 'meal', 'lunch', 'dinner', 'breakfast']):
-                        category = 'food'
-                    elif any(word in description_lower for word in ['uber', 'taxi', 'gas', 'fuel', 'transport']):
-                        category = 'transportation'
-                    else:
-                        category = 'other'
+                    category = _keyword_category(serializer.validated_data['description'])
                 serializer.validated_data['category'] = category
             
             expense = serializer.save()
@@ -131,6 +251,188 @@ def expenses(request):
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+MAX_BULK_OPERATIONS = 10000
+BULK_BATCH_SIZE = 1000
+
+def _categorize_descriptions(descriptions, user):
+    """{description: category} for the distinct descriptions, categorized in shared LLM batches.
+    
+    Only the first BULK_CATEGORIZATION_LLM_LIMIT distinct descriptions go to the LLM, so a
+    large import costs a bounded number of prompts (and of the user's daily budget) inside
+    the request; the rest are categorized by keyword.
+    """
+    distinct = list(dict.fromkeys(descriptions))
+    limit = getattr(settings, 'BULK_CATEGORIZATION_LLM_LIMIT', 100)
+    categories = {description: _keyword_category(description) for description in distinct[limit:]}
+    try:
+        from .ai_langchain import get_categorization_batcher
+        categories.update(zip(distinct[:limit], get_categorization_batcher().categorize_many(distinct[:limit], user)))
+    except Exception:
+        categories.update((description, _keyword_category(description)) for description in distinct[:limit])
+    return categories
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def bulk_expenses(request):
+    """Create, update and delete many expenses in one transaction, with a result per item.
+    
+    Body: {"create": [expense, ...], "update": [{"id": ..., field: value}, ...], "delete": [id, ...]}.
+    Invalid items are reported and skipped unless "all_or_nothing" is true, in which
+    case any error rejects the whole request.
+    """
+    if not isinstance(request.data, dict):
+        return Response({'error': 'Body must be an object with create, update and delete lists'}, status=status.HTTP_400_BAD_REQUEST)
+    creates = request.data.get('create') or []
+    updates = request.data.get('update') or []
+    deletes = request.data.get('delete') or []
+    if not all(isinstance(items, list) for items in (creates, updates, deletes)):
+        return Response({'error': 'create, update and delete must be lists'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(creates) + len(updates) + len(deletes) > MAX_BULK_OPERATIONS:
+        return Response({
+            'error': f'At most {MAX_BULK_OPERATIONS} operations per request'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    created, updated, deleted = [], [], []
+    
+    # Creates: validated as a list
+    new_expenses = []
+    serializer = BulkExpenseSerializer(data=creates, many=True)
+    all_valid = serializer.is_valid()
+    for index, item in enumerate(creates):
+        errors = {} if all_valid else serializer.errors[index]
+        if errors:
+            created.append({'index': index, 'status': 'invalid', 'errors': errors})
+            continue
+        data = serializer.validated_data[index] if all_valid else serializer.child.run_validation(item)
+        new_expenses.append((index, Expense(user=request.user, **data)))
+    
+    # Updates and deletes: every id is looked up with one query, and may appear only once
+    def expense_id(value):
+        # true/1.9 would otherwise pass int() as ids 1 and 1
+        if isinstance(value, (bool, float)):
+            return None
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
+    
+    update_ids = [expense_id(item.get('id')) if isinstance(item, dict) else None for item in updates]
+    delete_ids = [expense_id(value) for value in deletes]
+    requested_ids = [pk for pk in update_ids + delete_ids if pk is not None]
+    repeated = {pk for pk, times in Counter(requested_ids).items() if times > 1}
+    owned = Expense.objects.filter(user=request.user, pk__in=set(requested_ids)).in_bulk() if requested_ids else {}
+    
+    # bulk_update skips auto_now, so the timestamp is set by hand
+    now = timezone.now()
+    changed_expenses, changed_fields = [], {'updated_at'}
+    for index, (item, pk) in enumerate(zip(updates, update_ids)):
+        if pk is None:
+            updated.append({'index': index, 'status': 'invalid', 'errors': {'id': ['A valid expense id is required.']}})
+        elif pk in repeated:
+            updated.append({'index': index, 'id': pk, 'status': 'invalid', 'errors': {'id': ['Appears more than once.']}})
+        elif pk not in owned:
+            updated.append({'index': index, 'id': pk, 'status': 'not_found'})
+        else:
+            fields = {key: value for key, value in item.items() if key != 'id'}
+            item_serializer = BulkExpenseSerializer(owned[pk], data=fields, partial=True)
+            if not item_serializer.is_valid():
+                updated.append({'index': index, 'id': pk, 'status': 'invalid', 'errors': item_serializer.errors})
+                continue
+            for field, value in item_serializer.validated_data.items():
+                setattr(owned[pk], field, value)
+                changed_fields.add(field)
+            owned[pk].updated_at = now
+            changed_expenses.append((index, owned[pk]))
+    
+    deleting = []
+    for index, pk in enumerate(delete_ids):
+        if pk is None:
+            deleted.append({'index': index, 'status': 'invalid', 'errors': {'id': ['A valid expense id is required.']}})
+        elif pk in repeated:
+            deleted.append({'index': index, 'id': pk, 'status': 'invalid', 'errors': {'id': ['Appears more than once.']}})
+        elif pk not in owned:
+            deleted.append({'index': index, 'id': pk, 'status': 'not_found'})
+        else:
+            deleting.append((index, pk))
+    
+    failed = len(created) + len(updated) + len(deleted)
+    if failed and request.data.get('all_or_nothing'):
+        return Response({
+            'error': f'{failed} operations failed; nothing was applied',
+            'created': created,
+            'updated': updated,
+            'deleted': deleted
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    # Uncategorized creates share one deduplicated round of LLM batches
+    uncategorized = [expense.description for _, expense in new_expenses if not expense.category]
+    if uncategorized:
+        categories = _categorize_descriptions(uncategorized, request.user)
+        for _, expense in new_expenses:
+            if not expense.category:
+                expense.category = categories[expense.description]
+    
+    # Apply: the insert, the update and the delete each send expenses_changed once, which
+    # folds all of their rows into the rollups and month-to-date counters together
+    with transaction.atomic():
+        Expense.objects.bulk_create([expense for _, expense in new_expenses], batch_size=BULK_BATCH_SIZE)
+        if changed_expenses:
+            Expense.objects.bulk_update(
+                [expense for _, expense in changed_expenses], sorted(changed_fields), batch_size=BULK_BATCH_SIZE
+            )
+        if deleting:
+            Expense.objects.filter(user=request.user, pk__in=[pk for _, pk in deleting]).delete()
+    
+    created += [
+        {'index': index, 'status': 'created', 'id': expense.pk, 'category': expense.category}
+        for index, expense in new_expenses
+    ]
+    updated += [{'index': index, 'id': expense.pk, 'status': 'updated'} for index, expense in changed_expenses]
+    deleted += [{'index': index, 'id': pk, 'status': 'deleted'} for index, pk in deleting]
+    for results in (created, updated, deleted):
+        results.sort(key=lambda result: result['index'])
+    
+    return Response({
+        'summary': {
+            'created': len(new_expenses),
+            'updated': len(changed_expenses),
+            'deleted': len(deleting),
+            'failed': failed
+        },
+        'created': created,
+        'updated': updated,
+        'deleted': deleted
+    })
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export_expenses(request):
+    """Stream the user's full expense history as CSV or NDJSON, optionally gzipped"""
+    from .exports import CONTENT_TYPES, FORMATS, export_chunks
+    
+    export_type = request.GET.get('type', 'csv')
+    if export_type not in FORMATS:
+        return Response({'error': f"type must be one of: {', '.join(FORMATS)}"}, status=status.HTTP_400_BAD_REQUEST)
+    compress = request.GET.get('gzip', '').lower() in ('1', 'true')
+    
+    try:
+        start_date = request.GET.get('start_date')
+        end_date = request.GET.get('end_date')
+        start_date = datetime.strptime(start_date, '%Y-%m-%d').date() if start_date else None
+        end_date = datetime.strptime(end_date, '%Y-%m-%d').date() if end_date else None
+    except ValueError:
+        return Response({'error': 'Invalid date format. Use YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    chunks = export_chunks(request.user, export_type, compress, start_date, end_date)
+    filename = f"expenses.{export_type}" + ('.gz' if compress else '')
+    response = streaming_response(
+        request, chunks, content_type='application/gzip' if compress else CONTENT_TYPES[export_type]
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    # Stop nginx-style proxies from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def upload_pdf_expenses(request):
@@ -183,14 +485,15 @@ def upload_pdf_expenses(request):
 def dashboard(request):
     """Get dashboard data with insights"""
     try:
+        snapshot = get_spending_snapshot(request.user)
         report_generator = ReportGenerator()
-        insights = report_generator.get_dashboard_insights(request.user)
+        insights = report_generator.get_dashboard_insights(request.user, snapshot)
         
         # Generate AI suggestions (lazy import)
         try:
             from .ai_langchain import FinanceAI
             ai = FinanceAI()
-            savings_suggestions = ai.generate_savings_suggestions(request.user)
+            savings_suggestions = ai.generate_savings_suggestions(request.user, snapshot)
             investment_ideas = ai.generate_investment_ideas(request.user)
         except Exception:
             savings_suggestions = []
@@ -240,6 +543,57 @@ def chat(request):
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+def _sse_event(event, data):
+    """Format a single Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def chat_stream(request):
+    """AI chatbot endpoint streaming tokens as Server-Sent Events"""
+    message = request.data.get('message', '').strip()
+    if not message:
+        return Response({'error': 'Message is required'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    user = request.user
+    
+    def event_stream():
+        chunks = []
+        try:
+            from .ai_langchain import FinanceAI
+            ai = FinanceAI()
+            for chunk in ai.stream_chat_response(user, message):
+                chunks.append(chunk)
+                yield _sse_event('token', {'token': chunk})
+        except Exception:
+            if not chunks:
+                chunks.append("AI service unavailable. Please try later.")
+                yield _sse_event('token', {'token': chunks[0]})
+        
+        # Persist once the full response is known
+        response = ''.join(chunks).strip()
+        try:
+            chat_message = ChatMessage.objects.create(
+                user=user,
+                message=message,
+                response=response
+            )
+        except Exception as e:
+            yield _sse_event('error', {'error': str(e)})
+            return
+        
+        yield _sse_event('done', {
+            'message': message,
+            'response': response,
+            'timestamp': chat_message.created_at
+        })
+    
+    response = streaming_response(request, event_stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx-style proxies from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def chat_history(request):
@@ -248,6 +602,56 @@ def chat_history(request):
     serializer = ChatMessageSerializer(messages, many=True)
     return Response(serializer.data)
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def chat_archive(request):
+    """Stream archived chat history (older than the retention window) as NDJSON, newest first"""
+    archives = ChatArchive.objects.filter(user=request.user)
+    
+    # Optional date bounds, matched against each archive's period
+    try:
+        if request.GET.get('start_date'):
+            start_date = datetime.strptime(request.GET['start_date'], '%Y-%m-%d').date()
+            archives = archives.filter(period_end__date__gte=start_date)
+        if request.GET.get('end_date'):
+            end_date = datetime.strptime(request.GET['end_date'], '%Y-%m-%d').date()
+            archives = archives.filter(period_start__date__lte=end_date)
+    except ValueError:
+        return Response({
+            'error': 'Invalid date format. Use YYYY-MM-DD'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    archive_ids = list(archives.order_by('-period_start').values_list('id', flat=True))
+    
+    def stream():
+        from .archives import iter_archive_messages
+        # Load one blob at a time so memory is bounded by the largest archive
+        for archive_id in archive_ids:
+            archive = ChatArchive.objects.get(pk=archive_id)
+            for chat in iter_archive_messages(archive):
+                yield json.dumps(chat, ensure_ascii=False) + '\n'
+    
+    return streaming_response(request, stream(), content_type='application/x-ndjson')
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def llm_stats(request):
+    """LLM call ledger: per-method outcomes, tokens and latency histograms"""
+    try:
+        days = int(request.GET.get('days', 7))
+    except ValueError:
+        return Response({'error': 'days must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    from .ai_ledger import get_llm_stats
+    return Response(get_llm_stats(days))
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def chat_routing_stats(request):
+    """Fraction of chats answered by the local intent router instead of the LLM"""
+    from .ai_intents import get_routing_stats
+    return Response(get_routing_stats())
+
 # Report Views
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -282,11 +686,167 @@ def generate_report(request):
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+@api_view(['GET', 'POST'])
+@permission_classes([IsAuthenticated])
+def report_jobs(request):
+    """List recent report jobs, or queue a report to be rendered to CSV/XLSX/PDF in the background"""
+    from .report_jobs import available_formats, enqueue_report_job, expire_user_artifacts
+    
+    if request.method == 'GET':
+        expire_user_artifacts(request.user)
+        jobs = ReportJob.objects.filter(user=request.user)[:20]
+        return Response(ReportJobSerializer(jobs, many=True, context={'request': request}).data)
+    
+    start_date = request.data.get('start_date')
+    end_date = request.data.get('end_date')
+    if not start_date or not end_date:
+        return Response({
+            'error': 'Both start_date and end_date are required'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
+        end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
+    except ValueError:
+        return Response({
+            'error': 'Invalid date format. Use YYYY-MM-DD'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    if start_date > end_date:
+        return Response({'error': 'start_date must not be after end_date'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    formats = request.data.get('formats') or ['csv']
+    if isinstance(formats, str):
+        formats = [formats]
+    unsupported = sorted(set(formats) - set(available_formats()))
+    if unsupported:
+        return Response({
+            'error': f"Unsupported formats: {', '.join(unsupported)}. Available: {', '.join(available_formats())}"
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    job = enqueue_report_job(request.user, start_date, end_date, list(dict.fromkeys(formats)))
+    return Response(ReportJobSerializer(job, context={'request': request}).data, status=status.HTTP_202_ACCEPTED)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def report_job_detail(request, job_id):
+    """Status and progress of one report job, with download links once it is done"""
+    from .report_jobs import expire_user_artifacts
+    
+    expire_user_artifacts(request.user)
+    job = ReportJob.objects.filter(pk=job_id, user=request.user).first()
+    if job is None:
+        return Response({'error': 'Report job not found'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(ReportJobSerializer(job, context={'request': request}).data)
+
+def _ranged_file_response(request, path, content_type, filename):
+    """Stream a file, honouring a single-range "Range: bytes=..." header"""
+    size = os.path.getsize(path)
+    start, end = 0, size - 1
+    partial = False
+    
+    match = re.fullmatch(r'bytes=(\d*)-(\d*)', request.META.get('HTTP_RANGE', '').strip())
+    if match and (match.group(1) or match.group(2)):
+        if match.group(1):
+            start = int(match.group(1))
+            end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+        else:
+            # Suffix range: the last N bytes
+            start = max(size - int(match.group(2)), 0)
+        if start >= size or start > end:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+        partial = True
+    
+    def stream():
+        with open(path, 'rb') as artifact:
+            artifact.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = artifact.read(min(64 * 1024, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+    
+    response = streaming_response(request, stream(), status=206 if partial else 200, content_type=content_type)
+    response['Content-Length'] = str(end - start + 1)
+    response['Accept-Ranges'] = 'bytes'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    if partial:
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return response
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def report_job_download(request, job_id, fmt):
+    """Download a finished report artifact; supports range requests for resumable downloads"""
+    from .report_jobs import CONTENT_TYPES, expire_user_artifacts
+    
+    expire_user_artifacts(request.user)
+    job = ReportJob.objects.filter(pk=job_id, user=request.user).first()
+    if job is None or fmt not in job.formats:
+        return Response({'error': 'Report file not found'}, status=status.HTTP_404_NOT_FOUND)
+    if job.status != 'done':
+        return Response({'error': f'Report job is {job.status}'}, status=status.HTTP_409_CONFLICT)
+    
+    path = job.artifacts.get(fmt, {}).get('path')
+    if path is None or not os.path.exists(path):
+        return Response({'error': 'Report file has expired'}, status=status.HTTP_410_GONE)
+    
+    filename = f"report-{job.start_date}-to-{job.end_date}.{fmt}"
+    return _ranged_file_response(request, path, CONTENT_TYPES[fmt], filename)
+
 # Analytics Views
+MAX_ANALYTICS_COMPARISONS = 6
+MAX_ANALYTICS_BUCKETS = 1000
+
+def _category_rows(breakdown):
+    """Flatten a {category: {'total', 'count'}} breakdown into the analytics category list"""
+    total_expenses = sum(item['total'] for item in breakdown.values())
+    return total_expenses, [
+        {
+            'category': category,
+            'amount': float(item['total']),
+            'percentage': (float(item['total']) / float(total_expenses) * 100) if total_expenses > 0 else 0
+        }
+        for category, item in breakdown.items()
+    ]
+
+def _analytics_period(start_date, end_date, buckets, granularity):
+    """One period of the analytics response: totals, category breakdown and optional series"""
+    merged = {}
+    for _, breakdown in buckets:
+        for category, item in breakdown.items():
+            entry = merged.setdefault(category, {'total': 0, 'count': 0})
+            entry['total'] += item['total']
+            entry['count'] += item['count']
+    merged = dict(sorted(merged.items(), key=lambda item: item[1]['total'], reverse=True))
+    total_expenses, categories = _category_rows(merged)
+    
+    period = {
+        'period': {
+            'start_date': start_date.strftime('%Y-%m-%d'),
+            'end_date': end_date.strftime('%Y-%m-%d')
+        },
+        'total_expenses': float(total_expenses),
+        'categories': categories
+    }
+    if granularity:
+        period['series'] = [
+            {
+                'start_date': bucket_start.strftime('%Y-%m-%d'),
+                'total': float(sum(item['total'] for item in breakdown.values())),
+                'categories': {category: float(item['total']) for category, item in breakdown.items()}
+            }
+            for bucket_start, breakdown in buckets
+        ]
+    return period
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def expense_analytics(request):
-    """Get expense analytics data"""
+    """Get expense analytics data, optionally bucketed by day/week/month with comparison periods"""
     try:
         # Get date range (default to last 30 days)
         end_date = datetime.now().date()
@@ -297,35 +857,68 @@ def expense_analytics(request):
         if request.GET.get('end_date'):
             end_date = datetime.strptime(request.GET.get('end_date'), '%Y-%m-%d').date()
         
-        expenses = Expense.objects.filter(
-            user=request.user,
-            date__gte=start_date,
-            date__lte=end_date
-        )
+        granularity = request.GET.get('granularity') or None
+        if granularity and granularity not in GRANULARITIES:
+            return Response({
+                'error': f"granularity must be one of: {', '.join(GRANULARITIES)}"
+            }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Category breakdown
-        category_data = expenses.values('category').annotate(
-            total=Sum('amount')
-        ).order_by('-total')
+        categories = [category for category in request.GET.get('categories', '').split(',') if category]
+        unknown = sorted(set(categories) - {choice[0] for choice in Expense.CATEGORY_CHOICES})
+        if unknown:
+            return Response({'error': f"Unknown categories: {', '.join(unknown)}"}, status=status.HTTP_400_BAD_REQUEST)
         
-        total_expenses = sum(item['total'] for item in category_data)
+        # Comparison periods: ?compare=2026-01-01:2026-01-31 (repeatable)
+        ranges = [(start_date, end_date)]
+        try:
+            for compare in request.GET.getlist('compare'):
+                compare_start, compare_end = compare.split(':')
+                ranges.append((
+                    datetime.strptime(compare_start, '%Y-%m-%d').date(),
+                    datetime.strptime(compare_end, '%Y-%m-%d').date()
+                ))
+        except ValueError:
+            return Response({
+                'error': 'compare must be START:END with dates as YYYY-MM-DD'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if len(ranges) - 1 > MAX_ANALYTICS_COMPARISONS:
+            return Response({
+                'error': f'At most {MAX_ANALYTICS_COMPARISONS} comparison periods are allowed'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if any(start > end for start, end in ranges):
+            return Response({'error': 'start_date must not be after end_date'}, status=status.HTTP_400_BAD_REQUEST)
+        if granularity and sum(
+            len(bucket_edges(start, end, granularity, limit=MAX_ANALYTICS_BUCKETS)) for start, end in ranges
+        ) > MAX_ANALYTICS_BUCKETS:
+            return Response({
+                'error': f'Too many {granularity} buckets; use a coarser granularity or a shorter range'
+            }, status=status.HTTP_400_BAD_REQUEST)
         
-        categories = []
-        for item in category_data:
-            categories.append({
-                'category': item['category'],
-                'amount': float(item['total']),
-                'percentage': (float(item['total']) / float(total_expenses) * 100) if total_expenses > 0 else 0
+        if not granularity and not categories and len(ranges) == 1:
+            # Category breakdown from the in-memory spending cube (rollup tables when it doesn't fit)
+            total_expenses, category_rows = _category_rows(category_totals(request.user, start_date, end_date))
+            return Response({
+                'period': {
+                    'start_date': start_date.strftime('%Y-%m-%d'),
+                    'end_date': end_date.strftime('%Y-%m-%d')
+                },
+                'total_expenses': float(total_expenses),
+                'categories': category_rows
             })
         
-        return Response({
-            'period': {
-                'start_date': start_date.strftime('%Y-%m-%d'),
-                'end_date': end_date.strftime('%Y-%m-%d')
-            },
-            'total_expenses': float(total_expenses),
-            'categories': categories
-        })
+        # Every period and bucket comes out of the spending cube, or one rollup query when it doesn't fit
+        periods = [
+            _analytics_period(start, end, buckets, granularity)
+            for (start, end), buckets in zip(ranges, bucketed_totals(request.user, ranges, granularity, categories))
+        ]
+        response = periods[0]
+        if granularity:
+            response['granularity'] = granularity
+        if categories:
+            response['filters'] = {'categories': categories}
+        if len(periods) > 1:
+            response['comparisons'] = periods[1:]
+        return Response(response)
         
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
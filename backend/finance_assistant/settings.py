@@ -55,6 +55,12 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'finance_assistant.wsgi.application'
+ASGI_APPLICATION = 'finance_assistant.asgi.application'
+
+# Route chat, dashboard and reports to the async views in core/async_views.py.
+# Enable when serving with an ASGI server, e.g.
+#   ASYNC_AI_VIEWS=True uvicorn finance_assistant.asgi:application
+ASYNC_AI_VIEWS = os.getenv('ASYNC_AI_VIEWS', 'False').lower() == 'true'
 
 DATABASES = {
     'default': {
@@ -137,4 +143,74 @@ CORS_ALLOWED_ORIGINS = [
 CORS_ALLOW_CREDENTIALS = True
 
 # OpenAI API Key
-OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
\ No newline at end of file
+OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+# Optional OpenAI-compatible endpoint, e.g. the deterministic stand-in started by
+# `python manage.py fake_llm_server` (http://127.0.0.1:8001/v1) for load tests
+OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL') or None
+
+# Expense categorization batching: requests arriving within the window (seconds)
+# share one LLM prompt, up to the batch size
+AI_CATEGORIZATION_BATCH_WINDOW = float(os.getenv('AI_CATEGORIZATION_BATCH_WINDOW', '0.05'))
+AI_CATEGORIZATION_BATCH_SIZE = int(os.getenv('AI_CATEGORIZATION_BATCH_SIZE', '20'))
+# Bulk categorization (categorize_many) runs up to this many batch prompts at once
+AI_CATEGORIZATION_MAX_CONCURRENCY = int(os.getenv('AI_CATEGORIZATION_MAX_CONCURRENCY', '4'))
+# A bulk expense request sends at most this many distinct uncategorized descriptions
+# to the LLM; the rest are categorized by keyword
+BULK_CATEGORIZATION_LLM_LIMIT = int(os.getenv('BULK_CATEGORIZATION_LLM_LIMIT', '100'))
+
+# Local chat intent routing: messages classified above the threshold are answered
+# from user data without calling the LLM. Embedding similarity (sentence-transformers)
+# is an optional second opinion for messages the keyword patterns are unsure about.
+CHAT_LOCAL_INTENT_THRESHOLD = float(os.getenv('CHAT_LOCAL_INTENT_THRESHOLD', '0.8'))
+CHAT_INTENT_EMBEDDINGS = os.getenv('CHAT_INTENT_EMBEDDINGS', 'False').lower() == 'true'
+CHAT_INTENT_SIMILARITY_THRESHOLD = float(os.getenv('CHAT_INTENT_SIMILARITY_THRESHOLD', '0.6'))
+
+# Spending questions ("how much did I spend on food last month?") are answered
+# from a single Expense aggregate; optionally let the LLM reword the templated answer
+CHAT_QUERY_LLM_PHRASING = os.getenv('CHAT_QUERY_LLM_PHRASING', 'False').lower() == 'true'
+
+# Per-user conversation memory (rolling summary + topic flags) is cached for this
+# many seconds on top of its database row. The cache only serves reads (turns are
+# written to the locked row), so with the default per-process cache another worker's
+# turns can take this long to show up in prompts
+CONVERSATION_MEMORY_CACHE_TIMEOUT = int(os.getenv('CONVERSATION_MEMORY_CACHE_TIMEOUT', '3600'))
+
+# Chats older than this are moved into compressed ChatArchive blobs by
+# `python manage.py compact_chat_history` and served from /api/chat/archive/
+CHAT_RETENTION_DAYS = int(os.getenv('CHAT_RETENTION_DAYS', '180'))
+
+# Daily LLM call budget per user (0 = unlimited), covering chat, advice, reports and
+# expense categorization. Over-budget users get the local fallback answers; every
+# call is recorded in the LLMCall ledger either way.
+LLM_DAILY_CALL_BUDGET = int(os.getenv('LLM_DAILY_CALL_BUDGET', '200'))
+# Per-user spending cubes (day x category prefix sums) answering analytics and report
+# ranges in memory; least recently used cubes are evicted above this many bytes
+SPENDING_CUBE_MAX_BYTES = int(os.getenv('SPENDING_CUBE_MAX_BYTES', str(32 * 1024 * 1024)))
+
+# Long-range report jobs (POST /api/reports/jobs/) render CSV/XLSX/PDF files here.
+# Jobs run on an in-process thread pool; set REPORT_JOBS_IN_PROCESS=False to leave
+# them to `python manage.py report_worker` instead
+REPORT_EXPORT_ROOT = os.getenv('REPORT_EXPORT_ROOT', os.path.join(MEDIA_ROOT, 'report_exports'))
+REPORT_JOB_WORKERS = int(os.getenv('REPORT_JOB_WORKERS', '2'))
+REPORT_JOBS_IN_PROCESS = os.getenv('REPORT_JOBS_IN_PROCESS', 'True').lower() == 'true'
+# Rendered files are deleted this many days after their job finishes (0 = keep them);
+# run `python manage.py expire_report_artifacts` from cron, listing jobs also sweeps
+REPORT_ARTIFACT_RETENTION_DAYS = int(os.getenv('REPORT_ARTIFACT_RETENTION_DAYS', '7'))
+# reportlab holds a whole PDF in memory until it is saved (~0.3 KB per row), so PDF
+# reports stop listing rows after this many (0 = no limit); CSV/XLSX list them all
+REPORT_PDF_MAX_ROWS = int(os.getenv('REPORT_PDF_MAX_ROWS', '50000'))
+
+# Cohort spending benchmarks (python manage.py refresh_cohort_stats, nightly): average
+# monthly spend over the last N complete months, and the smallest cohort published
+COHORT_WINDOW_MONTHS = int(os.getenv('COHORT_WINDOW_MONTHS', '3'))
+COHORT_MIN_USERS = int(os.getenv('COHORT_MIN_USERS', '5'))
+
+# Spending forecasts (python manage.py refresh_forecasts, nightly): exponential smoothing
+# over the last N complete months, with this smoothing factor (0-1, higher = more reactive)
+FORECAST_HISTORY_MONTHS = int(os.getenv('FORECAST_HISTORY_MONTHS', '12'))
+FORECAST_SMOOTHING = float(os.getenv('FORECAST_SMOOTHING', '0.4'))
+
+# Expense anomaly flags: an amount this many standard deviations above the user's
+# category mean, once the category has at least ANOMALY_MIN_SAMPLES expenses
+ANOMALY_Z_THRESHOLD = float(os.getenv('ANOMALY_Z_THRESHOLD', '3.0'))
+ANOMALY_MIN_SAMPLES = int(os.getenv('ANOMALY_MIN_SAMPLES', '5'))